@@ -1,25 +1,112 @@
 from django.contrib import admin
-from .models import Supplier, Product, Order, OrderItem
+from django.db.models import Q
+from .models import OutboxEvent, StockMovement, Supplier, Product, Order, OrderItem
+from .pagination import EstimatedCountPaginator
+from .search import search_ids
 
 
 admin.site.site_header = "Wholesale Admin"
-admin.site.site_title = "Wholesale Admin Portal"  
+admin.site.site_title = "Wholesale Admin Portal"
 admin.site.index_title = "Welcome to the Wholesale Admin Portal"
 
+# The order and product changelists are sized for millions of rows: counts
+# past ESTIMATED_COUNT_THRESHOLD come from planner statistics, foreign keys
+# are joined in the page query or picked with autocomplete widgets, and
+# searches only hit indexed columns (or the product search index).
 
- 
 
 # Register your models here.
-admin.site.register(Supplier)
-admin.site.register(Product)
+@admin.register(Supplier)
+class SupplierAdmin(admin.ModelAdmin):
+    list_display = ('name', 'contact_email')
+    search_fields = ('name',)
+
+
+@admin.register(Product)
+class ProductAdmin(admin.ModelAdmin):
+    list_display = ('name', 'sku', 'supplier', 'price', 'stock', 'updated_at')
+    list_select_related = ('supplier',)
+    autocomplete_fields = ('supplier',)
+    search_fields = ('name',)
+    search_help_text = 'SKU, or words from the name, description or supplier.'
+    paginator = EstimatedCountPaginator
+    show_full_result_count = False
+
+    def get_search_results(self, request, queryset, search_term):
+        term = search_term.strip()
+        if not term:
+            return queryset, False
+        ids = search_ids(term, limit=200)
+        if ids is None:
+            return super().get_search_results(request, queryset, search_term)
+        return queryset.filter(Q(sku=term) | Q(id__in=ids)), False
+
+
+class OrderItemInline(admin.TabularInline):
+    model = OrderItem
+    extra = 0
+    # a product select would render every product in the catalog
+    autocomplete_fields = ('product',)
+
+    def get_queryset(self, request):
+        # each row's title is OrderItem.__str__, which reads product.name
+        return super().get_queryset(request).select_related('product')
+
 
 @admin.register(Order)
 class OrderAdmin(admin.ModelAdmin):
     list_display = ('id', 'buyer_name', 'status', 'total_price', 'created_at')
     list_filter = ('status', 'created_at')
-    search_fields = ('buyer_name', 'buyer_email')
+    search_fields = ('buyer_email',)
+    search_help_text = 'Order number or exact buyer email.'
+    date_hierarchy = 'created_at'
+    inlines = (OrderItemInline,)
+    paginator = EstimatedCountPaginator
+    show_full_result_count = False
+
+    def get_search_results(self, request, queryset, search_term):
+        # icontains over buyer_name/buyer_email scans the whole table; match
+        # the order id or the (indexed) email exactly instead
+        term = search_term.strip()
+        if not term:
+            return queryset, False
+        if term.lstrip('#').isdigit():
+            return queryset.filter(pk=int(term.lstrip('#'))), False
+        # checkout stores emails lowercased
+        return queryset.filter(buyer_email=term.lower()), False
+
 
 @admin.register(OrderItem)
 class OrderItemAdmin(admin.ModelAdmin):
     list_display = ('order', 'product', 'quantity', 'price')
     list_filter = ('order__created_at',)
+    list_select_related = ('order', 'product')
+    autocomplete_fields = ('order', 'product')
+    paginator = EstimatedCountPaginator
+    show_full_result_count = False
+
+
+@admin.register(OutboxEvent)
+class OutboxEventAdmin(admin.ModelAdmin):
+    list_display = ('id', 'topic', 'created_at', 'available_at', 'attempts', 'failed_at')
+    list_filter = ('topic', ('failed_at', admin.EmptyFieldListFilter))
+    readonly_fields = ('created_at', 'last_error')
+
+
+@admin.register(StockMovement)
+class StockMovementAdmin(admin.ModelAdmin):
+    """The stock ledger is append-only: movements are listed, never edited."""
+    list_display = ('id', 'product', 'kind', 'quantity', 'reference', 'order', 'created_at')
+    list_filter = ('kind',)
+    list_select_related = ('product', 'order')
+    paginator = EstimatedCountPaginator
+    show_full_result_count = False
+
+    def has_add_permission(self, request):
+        return False
+
+    def has_change_permission(self, request, obj=None):
+        return False
+
+    def has_delete_permission(self, request, obj=None):
+        return False
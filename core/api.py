@@ -0,0 +1,224 @@
+import hashlib
+from dataclasses import dataclass
+from datetime import timedelta
+
+from django.conf import settings
+from django.db.models import Max
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+
+from .models import Product, Supplier, Tombstone
+from .pagination import decode_cursor, keyset_paginate
+
+# Read-only JSON catalog API (/api/v1/...).
+#
+# Lists are keyset-paginated in catalog order (name, id). With
+# ``changed_since`` they become a delta feed instead: rows whose updated_at is
+# later than the given time, oldest change first, plus the ids deleted since
+# then (from Tombstone rows). Every page carries a strong ETag and a
+# Last-Modified derived from the rows' updated_at, so a client re-polling an
+# unchanged page gets a 304 without the body being built.
+
+API_VERSION = 1
+CATALOG_ORDERING = ('name', 'id')
+CHANGES_ORDERING = ('updated_at', 'id')
+
+
+class ApiError(Exception):
+    def __init__(self, message, status=400):
+        super().__init__(message)
+        self.status = status
+
+
+@dataclass(frozen=True)
+class Resource:
+    kind: str
+    model: type
+    # public field name -> the values() columns it is built from
+    fields: dict
+    default_fields: tuple
+
+    def columns(self, fields):
+        columns = ['id', 'updated_at']
+        for name in fields:
+            columns.extend(column for column in self.fields[name] if column not in columns)
+        return columns
+
+
+PRODUCTS = Resource(
+    kind='product',
+    model=Product,
+    fields={
+        'id': ('id',),
+        'sku': ('sku',),
+        'name': ('name',),
+        'description': ('description',),
+        'price': ('price',),
+        'stock': ('stock',),
+        'supplier': ('supplier_id', 'supplier__name'),
+        'updated_at': ('updated_at',),
+    },
+    default_fields=('id', 'sku', 'name', 'price', 'stock', 'supplier', 'updated_at'),
+)
+
+SUPPLIERS = Resource(
+    kind='supplier',
+    model=Supplier,
+    fields={
+        'id': ('id',),
+        'name': ('name',),
+        'contact_email': ('contact_email',),
+        'updated_at': ('updated_at',),
+    },
+    default_fields=('id', 'name', 'contact_email', 'updated_at'),
+)
+
+
+@dataclass
+class ApiPage:
+    results: list
+    next_cursor: str = None
+    deleted: list = None
+    etag: str = ''
+    last_modified: object = None
+    sync_token: str = None
+
+
+def page_size(raw):
+    default = getattr(settings, 'API_PAGE_SIZE', 100)
+    limit = getattr(settings, 'API_MAX_PAGE_SIZE', 500)
+    if raw in (None, ''):
+        return default
+    try:
+        size = int(raw)
+    except ValueError:
+        raise ApiError('limit must be a whole number.')
+    return max(1, min(size, limit))
+
+
+def parse_fields(resource, raw):
+    if not raw:
+        return resource.default_fields
+    fields = tuple(dict.fromkeys(name.strip() for name in raw.split(',') if name.strip()))
+    unknown = [name for name in fields if name not in resource.fields]
+    if unknown:
+        raise ApiError(f'Unknown fields: {", ".join(unknown)}. Choose from {", ".join(resource.fields)}.')
+    return fields
+
+
+def parse_since(raw):
+    since = parse_datetime(raw.replace(' ', '+')) if raw else None
+    if since is None:
+        raise ApiError('changed_since must be an ISO 8601 timestamp.')
+    if timezone.is_naive(since):
+        since = timezone.make_aware(since, timezone.UTC)
+    retention = getattr(settings, 'TOMBSTONE_RETENTION_DAYS', 30)
+    if since < timezone.now() - timedelta(days=retention):
+        # deletions that old are pruned; only a full sync is correct now
+        raise ApiError(f'changed_since is older than {retention} days; do a full sync.', status=410)
+    return since
+
+
+def _serialize(resource, row, fields):
+    item = {}
+    for name in fields:
+        if name == 'supplier':
+            item['supplier'] = {'id': row['supplier_id'], 'name': row['supplier__name']}
+        elif name == 'price':
+            item['price'] = str(row['price'])
+        else:
+            item[name] = row[resource.fields[name][0]]
+    return item
+
+
+def _etag(*parts):
+    digest = hashlib.sha256()
+    for part in parts:
+        digest.update(repr(part).encode())
+        digest.update(b'\0')
+    return f'"{digest.hexdigest()[:32]}"'
+
+
+def _latest_deletion(resource):
+    return Tombstone.objects.filter(kind=resource.kind).aggregate(latest=Max('deleted_at'))['latest']
+
+
+def list_page(resource, fields, cursor=None, size=100):
+    """One page of the resource in catalog order."""
+    queryset = resource.model.objects.values(*resource.columns(fields))
+    page = keyset_paginate(queryset, CATALOG_ORDERING, cursor=cursor, page_size=size)
+    versions = [(row['id'], row['updated_at']) for row in page.items]
+    # a deletion can shift rows into this page without any of them changing
+    latest_deletion = _latest_deletion(resource)
+    stamps = [stamp for _, stamp in versions] + ([latest_deletion] if latest_deletion else [])
+    return ApiPage(
+        results=page.items,
+        next_cursor=page.next_cursor,
+        etag=_etag(API_VERSION, resource.kind, fields, versions, page.next_cursor, latest_deletion),
+        last_modified=max(stamps) if stamps else None,
+    )
+
+
+def changes_page(resource, fields, since, cursor=None, size=100):
+    """One page of the delta feed: rows changed after ``since``, oldest first.
+
+    Rows younger than API_SYNC_SETTLE_SECONDS are held back, so a transaction
+    that committed late with an earlier updated_at is not skipped over. The
+    last page carries a ``sync_token`` to pass as the next changed_since.
+    """
+    lower = since
+    if cursor:
+        values = decode_cursor(cursor, len(CHANGES_ORDERING))
+        lower = parse_datetime(str(values[0])) if values else None
+        if lower is None:
+            raise ApiError('Invalid cursor.')
+    horizon = timezone.now() - timedelta(seconds=getattr(settings, 'API_SYNC_SETTLE_SECONDS', 2))
+    queryset = resource.model.objects.filter(
+        updated_at__gt=since, updated_at__lte=horizon,
+    ).values(*resource.columns(fields))
+    page = keyset_paginate(queryset, CHANGES_ORDERING, cursor=cursor, page_size=size)
+    until = page.items[-1]['updated_at'] if page.has_next else horizon
+    tombstones = list(
+        Tombstone.objects.filter(kind=resource.kind, deleted_at__gt=lower, deleted_at__lte=until)
+        .order_by('deleted_at', 'object_id').values_list('object_id', 'deleted_at')
+    )
+    versions = [(row['id'], row['updated_at']) for row in page.items]
+    stamps = [stamp for _, stamp in versions] + [stamp for _, stamp in tombstones]
+    last_modified = max(stamps, default=None)
+    sync_token = None
+    if not page.has_next:
+        # the newest change delivered, so an unchanged feed keeps its ETag
+        sync_token = max(last_modified or since, since).isoformat()
+    deleted = list(dict.fromkeys(object_id for object_id, _ in tombstones))
+    return ApiPage(
+        results=page.items,
+        next_cursor=page.next_cursor,
+        deleted=deleted,
+        # ids and timestamps fully determine this page's body
+        etag=_etag(API_VERSION, resource.kind, fields, since, versions, page.next_cursor, deleted, sync_token),
+        last_modified=last_modified,
+        sync_token=sync_token,
+    )
+
+
+def render_page(resource, fields, page):
+    data = {'results': [_serialize(resource, row, fields) for row in page.results]}
+    if page.deleted is not None:
+        data['deleted'] = page.deleted
+    if page.sync_token is not None:
+        data['sync_token'] = page.sync_token
+    return data
+
+
+def record_tombstone(resource, object_id):
+    Tombstone.objects.create(kind=resource.kind, object_id=object_id)
+
+
+def prune_tombstones(now=None):
+    cutoff = (now or timezone.now()) - timedelta(days=getattr(settings, 'TOMBSTONE_RETENTION_DAYS', 30))
+    return Tombstone.objects.filter(deleted_at__lt=cutoff).delete()[0]
+
+
+def touch_supplier_products(supplier_id):
+    """Products embed their supplier's name, so they change when it does."""
+    Product.objects.filter(supplier_id=supplier_id).update(updated_at=timezone.now())
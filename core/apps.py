@@ -3,3 +3,11 @@ from django.apps import AppConfig
 
 class CoreConfig(AppConfig):
     name = 'core'
+
+    def ready(self):
+        from django.conf import settings
+
+        from . import consumers, signals  # noqa: F401
+        if settings.TEMPLATE_PROFILING:
+            from . import template_profile
+            template_profile.install()
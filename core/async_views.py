@@ -0,0 +1,93 @@
+from asgiref.sync import sync_to_async
+from django.contrib.auth.decorators import login_required
+from django.http import Http404, JsonResponse
+from django.shortcuts import render
+from django.utils.safestring import mark_safe
+from django.views.decorators.http import require_POST
+
+from . import cart_store
+from .cart import parse_positive_int
+from .catalog import arender_catalog_page
+from .models import Product
+from .product_cache import aget_product_detail
+from .reservations import HoldRejected, set_hold
+from .roles import aget_group_names
+from .routers import replica_reads
+from .templatetags.fragments import aload_site_nav
+
+# Async versions of the hot catalog and cart views, used when ASYNC_VIEWS is
+# on and the site runs under ASGI (wholeseller.asgi).
+#
+# They read through the async ORM, cache and session APIs, so a request that
+# waits on the database does not hold a worker thread. Templates cannot await,
+# so everything base.html looks at (the user, their groups and the cached
+# navbar) and the cached product cards are loaded before rendering. The stock hold keeps its sync, transactional code and is
+# the one place these views hop to a thread on purpose.
+
+
+async def _load_user(request):
+    user = await request.auser()
+    request.user = user
+    await aget_group_names(user)
+    await aload_site_nav(request)
+    return user
+
+
+@replica_reads
+async def product_list(request):
+    await _load_user(request)
+    cursor = request.GET.get('after')
+    product_grid, _ = await arender_catalog_page(cursor)
+    return render(request, 'product_list.html', {
+        'product_grid': mark_safe(product_grid),
+        'cursor': cursor,
+    })
+
+
+@replica_reads
+async def product_detail(request, pk):
+    await _load_user(request)
+    product = await aget_product_detail(pk)
+    if product is None:
+        raise Http404('No Product matches the given query.')
+    return render(request, 'product_detail.html', {'product': product})
+
+
+def _hold_and_store(user, product, cart_id, quantity):
+    set_hold(user, product, quantity)
+    cart_store.set_quantity(cart_id, product.id, quantity)
+
+
+@require_POST
+@login_required
+async def add_to_cart(request, product_id):
+    """Add product to cart (AJAX)"""
+    user = await request.auser()
+    try:
+        product = await Product.objects.aget(id=product_id)
+    except Product.DoesNotExist:
+        raise Http404('No Product matches the given query.')
+    quantity = parse_positive_int(request.POST.get('quantity'), default=0)
+
+    if quantity <= 0:
+        return JsonResponse({'success': False, 'message': 'Quantity must be greater than 0.'}, status=400)
+
+    cart_id = await cart_store.aget_cart_id(request, user)
+    new_quantity = await cart_store.aget_quantity(cart_id, product_id) + quantity
+
+    try:
+        await sync_to_async(_hold_and_store)(user, product, cart_id, new_quantity)
+    except HoldRejected:
+        return JsonResponse({'success': False, 'message': 'Insufficient stock'}, status=400)
+
+    return JsonResponse({
+        'success': True,
+        'message': f'{product.name} added to cart!',
+        'cart_count': await cart_store.aitem_count(cart_id)
+    })
+
+
+@login_required
+async def cart_count(request):
+    cart_id = await cart_store.aget_cart_id(request, await request.auser())
+    return JsonResponse({'cart_count': await cart_store.aitem_count(cart_id)})
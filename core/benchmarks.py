@@ -0,0 +1,94 @@
+import statistics
+import time
+from dataclasses import asdict, dataclass
+
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+
+# Small timing helpers shared by the benchmark management commands.
+
+
+@dataclass
+class Measurement:
+    label: str
+    runs: int
+    queries: int
+    p50_ms: float
+    p95_ms: float
+    max_ms: float
+
+    def as_dict(self):
+        return asdict(self)
+
+
+def percentile(samples, fraction):
+    ordered = sorted(samples)
+    if not ordered:
+        return 0.0
+    index = min(len(ordered) - 1, max(0, round(fraction * (len(ordered) - 1))))
+    return ordered[index]
+
+
+def measure(label, func, repeat=10, warmup=1, setup=None, teardown=None):
+    """Call func ``repeat`` times and return its latency and query count.
+
+    ``setup``/``teardown`` run around every call but are neither timed nor
+    counted. The query count is taken from the last run so warm caches are
+    reflected.
+    """
+    def run_once():
+        if setup:
+            setup()
+        try:
+            with CaptureQueriesContext(connection) as captured:
+                started = time.perf_counter()
+                func()
+                elapsed = (time.perf_counter() - started) * 1000
+        finally:
+            if teardown:
+                teardown()
+        return elapsed, len(captured.captured_queries)
+
+    for _ in range(warmup):
+        run_once()
+
+    samples = []
+    queries = 0
+    for _ in range(repeat):
+        elapsed, queries = run_once()
+        samples.append(elapsed)
+
+    return Measurement(
+        label=label,
+        runs=repeat,
+        queries=queries,
+        p50_ms=round(statistics.median(samples), 3),
+        p95_ms=round(percentile(samples, 0.95), 3),
+        max_ms=round(max(samples), 3),
+    )
+
+
+def format_table(measurements):
+    header = f'{"case":<28}{"runs":>6}{"queries":>9}{"p50 ms":>10}{"p95 ms":>10}{"max ms":>10}'
+    rows = [header, '-' * len(header)]
+    for m in measurements:
+        rows.append(f'{m.label:<28}{m.runs:>6}{m.queries:>9}{m.p50_ms:>10.2f}{m.p95_ms:>10.2f}{m.max_ms:>10.2f}')
+    return '\n'.join(rows)
+
+
+def peak_memory_kb(func):
+    """Return the peak traced Python memory, in KiB, of a single call."""
+    import tracemalloc
+
+    already_tracing = tracemalloc.is_tracing()
+    if not already_tracing:
+        tracemalloc.start()
+    tracemalloc.reset_peak()
+    baseline, _ = tracemalloc.get_traced_memory()
+    try:
+        func()
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        if not already_tracing:
+            tracemalloc.stop()
+    return round((peak - baseline) / 1024, 1)
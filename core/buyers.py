@@ -0,0 +1,81 @@
+from django.db import IntegrityError, transaction
+from django.db.models import Count, F, Max, OuterRef, Subquery, Sum
+
+from .models import Buyer, Order
+
+# Buyer directory: a denormalised per-email summary of orders so the buyer
+# pages read one indexed row per buyer instead of scanning Order.
+
+
+def record_order(order):
+    """Fold a newly placed order into its buyer's summary row."""
+    changes = {
+        'name': order.buyer_name,
+        'phone': order.buyer_phone,
+        'order_count': F('order_count') + 1,
+        'lifetime_value': F('lifetime_value') + order.total_price,
+        'last_order_at': order.created_at,
+    }
+    if Buyer.objects.filter(email=order.buyer_email).update(**changes):
+        return
+    try:
+        with transaction.atomic():
+            Buyer.objects.create(
+                email=order.buyer_email,
+                name=order.buyer_name,
+                phone=order.buyer_phone,
+                order_count=1,
+                lifetime_value=order.total_price,
+                last_order_at=order.created_at,
+            )
+    except IntegrityError:
+        # a concurrent checkout created the row first
+        Buyer.objects.filter(email=order.buyer_email).update(**changes)
+
+
+def rebuild_buyers(batch_size=1000):
+    """Recompute every Buyer row from the Order table; returns rows written.
+
+    Runs as one grouped pass over Order (using the buyer_email index) and
+    upserts in batches, so it is safe to re-run at any time.
+    """
+    latest = Order.objects.filter(buyer_email=OuterRef('buyer_email')).order_by('-created_at', '-id')
+    summaries = (
+        Order.objects.values('buyer_email')
+        .annotate(
+            order_count=Count('id'),
+            lifetime_value=Sum('total_price'),
+            last_order_at=Max('created_at'),
+            latest_name=Subquery(latest.values('buyer_name')[:1]),
+            latest_phone=Subquery(latest.values('buyer_phone')[:1]),
+        )
+        .order_by('buyer_email')
+    )
+
+    written = 0
+    batch = []
+    for row in summaries.iterator(chunk_size=batch_size):
+        batch.append(Buyer(
+            email=row['buyer_email'],
+            name=row['latest_name'],
+            phone=row['latest_phone'] or '',
+            order_count=row['order_count'],
+            lifetime_value=row['lifetime_value'] or 0,
+            last_order_at=row['last_order_at'],
+        ))
+        if len(batch) >= batch_size:
+            written += _upsert(batch)
+            batch = []
+    if batch:
+        written += _upsert(batch)
+    return written
+
+
+def _upsert(buyers):
+    Buyer.objects.bulk_create(
+        buyers,
+        update_conflicts=True,
+        unique_fields=['email'],
+        update_fields=['name', 'phone', 'order_count', 'lifetime_value', 'last_order_at'],
+    )
+    return len(buyers)
@@ -0,0 +1,102 @@
+from dataclasses import dataclass, field
+from decimal import Decimal
+
+from .models import Product
+
+# Cart snapshot: resolves the raw {product_id: quantity} cart into priced lines
+# with a single query, capping quantities to the stock that is on hand.
+
+CART_PRODUCT_FIELDS = ('id', 'name', 'price', 'stock')
+
+
+def parse_positive_int(raw_value, default=1):
+    try:
+        value = int(raw_value)
+    except (TypeError, ValueError):
+        return default
+    return value if value > 0 else default
+
+
+@dataclass(frozen=True, slots=True)
+class CartLine:
+    product: Product
+    quantity: int
+    requested: int
+    subtotal: Decimal
+
+    @property
+    def capped(self):
+        return self.quantity < self.requested
+
+
+@dataclass(slots=True)
+class CartSnapshot:
+    lines: list = field(default_factory=list)
+    total_price: Decimal = Decimal('0')
+    normalized: dict = field(default_factory=dict)
+    missing: list = field(default_factory=list)
+
+    def __bool__(self):
+        return bool(self.lines)
+
+    @property
+    def count(self):
+        return sum(self.normalized.values())
+
+    @property
+    def products_by_id(self):
+        return {line.product.id: line.product for line in self.lines}
+
+    @property
+    def capped_lines(self):
+        return [line for line in self.lines if line.capped]
+
+
+def requested_quantities(cart_items):
+    requested = {}
+    for product_id, raw_quantity in cart_items.items():
+        quantity = parse_positive_int(raw_quantity, default=0)
+        if quantity <= 0:
+            continue
+        try:
+            requested[int(product_id)] = quantity
+        except (TypeError, ValueError):
+            continue
+    return requested
+
+
+def build_cart_snapshot(cart_items, for_update=False):
+    """Price every line of a {product_id: quantity} cart with one product query.
+
+    Lines keep the cart's insertion order. Quantities are capped to the
+    product's stock and lines with no stock are dropped; ``missing`` lists
+    product ids that no longer exist. With ``for_update`` the product rows
+    are locked, so the snapshot can be reused inside the checkout
+    transaction instead of querying the products a second time.
+    """
+    snapshot = CartSnapshot()
+    requested = requested_quantities(cart_items)
+    if not requested:
+        return snapshot
+
+    queryset = Product.objects.only(*CART_PRODUCT_FIELDS).filter(id__in=list(requested))
+    if for_update:
+        queryset = queryset.select_for_update().order_by('id')
+    products = {product.id: product for product in queryset}
+
+    total_price = Decimal('0')
+    for product_id, quantity in requested.items():
+        product = products.get(product_id)
+        if product is None:
+            snapshot.missing.append(product_id)
+            continue
+        capped_quantity = min(quantity, max(product.stock, 0))
+        if capped_quantity <= 0:
+            continue
+        subtotal = product.price * capped_quantity
+        snapshot.normalized[str(product_id)] = capped_quantity
+        snapshot.lines.append(CartLine(product, capped_quantity, quantity, subtotal))
+        total_price += subtotal
+
+    snapshot.total_price = total_price
+    return snapshot
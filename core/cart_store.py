@@ -0,0 +1,117 @@
+from asgiref.sync import sync_to_async
+from django.db.models import Sum
+
+from .cart import requested_quantities
+from .models import Cart, CartItem, Product
+
+# Database-backed carts.
+#
+# A cart is one Cart row per user and one CartItem row per product, so adding,
+# changing or removing a line writes that one row instead of re-saving the
+# whole session, and the cart follows the user across devices. The session
+# only keeps the cart id. Carts still stored in the session under the old
+# 'cart' key are moved into the store at login or on first access.
+
+SESSION_KEY = 'cart_id'
+LEGACY_SESSION_KEY = 'cart'
+
+
+def get_cart_id(request, user=None):
+    """Return the id of the logged-in user's cart, creating it on first use."""
+    cart_id = request.session.get(SESSION_KEY)
+    if cart_id is None:
+        cart_id = Cart.objects.get_or_create(user=user or request.user)[0].pk
+        request.session[SESSION_KEY] = cart_id
+    if LEGACY_SESSION_KEY in request.session:
+        adopt_session_cart(request, cart_id)
+    return cart_id
+
+
+async def aget_cart_id(request, user):
+    """Async get_cart_id; ``user`` is the already resolved ``await request.auser()``."""
+    cart_id = await request.session.aget(SESSION_KEY)
+    if cart_id is None:
+        cart_id = (await Cart.objects.aget_or_create(user=user))[0].pk
+        await request.session.aset(SESSION_KEY, cart_id)
+    if await request.session.ahas_key(LEGACY_SESSION_KEY):
+        # one-off per user, so the sync adoption code is fine here
+        await sync_to_async(adopt_session_cart)(request, cart_id)
+    return cart_id
+
+
+def adopt_session_cart(request, cart_id):
+    """Move a session-stored {product_id: quantity} cart into the store."""
+    requested = requested_quantities(request.session.pop(LEGACY_SESSION_KEY, None) or {})
+    if not requested:
+        return
+    existing = dict(
+        CartItem.objects.filter(cart_id=cart_id, product_id__in=list(requested)).values_list('product_id', 'quantity')
+    )
+    live = Product.objects.filter(id__in=list(requested)).values_list('id', flat=True)
+    # the same cart may already be in the store from another device
+    set_quantities(cart_id, {product_id: max(requested[product_id], existing.get(product_id, 0)) for product_id in live})
+
+
+def load_items(cart_id):
+    """Return the cart as {product_id (str): quantity}, oldest line first."""
+    rows = CartItem.objects.filter(cart_id=cart_id).order_by('id').values_list('product_id', 'quantity')
+    return {str(product_id): quantity for product_id, quantity in rows}
+
+
+def get_quantity(cart_id, product_id):
+    return CartItem.objects.filter(cart_id=cart_id, product_id=product_id).values_list('quantity', flat=True).first() or 0
+
+
+def item_count(cart_id):
+    return CartItem.objects.filter(cart_id=cart_id).aggregate(total=Sum('quantity'))['total'] or 0
+
+
+async def aget_quantity(cart_id, product_id):
+    return await CartItem.objects.filter(
+        cart_id=cart_id, product_id=product_id
+    ).values_list('quantity', flat=True).afirst() or 0
+
+
+async def aitem_count(cart_id):
+    return (await CartItem.objects.filter(cart_id=cart_id).aaggregate(total=Sum('quantity')))['total'] or 0
+
+
+def set_quantities(cart_id, quantities):
+    """Insert or update {product_id: quantity} lines in one statement."""
+    if not quantities:
+        return
+    CartItem.objects.bulk_create(
+        [
+            CartItem(cart_id=cart_id, product_id=int(product_id), quantity=quantity)
+            for product_id, quantity in quantities.items()
+        ],
+        update_conflicts=True,
+        unique_fields=['cart', 'product'],
+        update_fields=['quantity'],
+    )
+
+
+def set_quantity(cart_id, product_id, quantity):
+    set_quantities(cart_id, {product_id: quantity})
+
+
+def remove_lines(cart_id, product_ids):
+    product_ids = [int(product_id) for product_id in product_ids]
+    if product_ids:
+        CartItem.objects.filter(cart_id=cart_id, product_id__in=product_ids).delete()
+
+
+def clear(cart_id):
+    CartItem.objects.filter(cart_id=cart_id).delete()
+
+
+def save_normalized(cart_id, cart_items, snapshot):
+    """Write back the lines build_cart_snapshot dropped or capped."""
+    if snapshot.normalized == cart_items:
+        return
+    remove_lines(cart_id, [product_id for product_id in cart_items if product_id not in snapshot.normalized])
+    set_quantities(cart_id, {
+        product_id: quantity
+        for product_id, quantity in snapshot.normalized.items()
+        if cart_items.get(product_id) != quantity
+    })
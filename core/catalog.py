@@ -0,0 +1,224 @@
+import hashlib
+import json
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db.models import Count, DecimalField, ExpressionWrapper, F, Max, Min, Sum
+from django.template import Context, Engine
+from django.template.loader import render_to_string
+
+from .models import Product, Supplier
+from .pagination import akeyset_paginate, decode_cursor, keyset_paginate
+
+# Catalog read path: keyset pages over (name, id) with the supplier joined in
+# the same query, and a rendered-fragment cache keyed by a global catalog
+# version that is bumped whenever a Product or Supplier changes.
+
+CATALOG_ORDERING = ('name', 'id')
+SUPPLIER_ORDERING = ('name', 'id')
+CATALOG_VERSION_KEY = 'catalog:version'
+CATALOG_CARD_FIELDS = (
+    'id', 'name', 'description', 'price', 'stock', 'updated_at',
+    'supplier__id', 'supplier__name',
+)
+CARD_TEMPLATE = 'includes/product_card.html'
+
+
+def catalog_page_size():
+    return getattr(settings, 'CATALOG_PAGE_SIZE', 24)
+
+
+def catalog_queryset():
+    return Product.objects.select_related('supplier').only(*CATALOG_CARD_FIELDS)
+
+
+def get_catalog_page(cursor=None, page_size=None):
+    """Return a KeysetPage of products ordered by name then id."""
+    return keyset_paginate(
+        catalog_queryset(),
+        CATALOG_ORDERING,
+        cursor=cursor,
+        page_size=page_size or catalog_page_size(),
+    )
+
+
+async def aget_catalog_page(cursor=None, page_size=None):
+    return await akeyset_paginate(
+        catalog_queryset(),
+        CATALOG_ORDERING,
+        cursor=cursor,
+        page_size=page_size or catalog_page_size(),
+    )
+
+
+def get_catalog_version():
+    version = cache.get(CATALOG_VERSION_KEY)
+    if version is None:
+        cache.add(CATALOG_VERSION_KEY, 1, timeout=None)
+        version = cache.get(CATALOG_VERSION_KEY, 1)
+    return version
+
+
+async def aget_catalog_version():
+    version = await cache.aget(CATALOG_VERSION_KEY)
+    if version is None:
+        await cache.aadd(CATALOG_VERSION_KEY, 1, timeout=None)
+        version = await cache.aget(CATALOG_VERSION_KEY, 1)
+    return version
+
+
+def bump_catalog_version():
+    """Invalidate every cached catalog fragment by moving to a new version."""
+    try:
+        return cache.incr(CATALOG_VERSION_KEY)
+    except ValueError:
+        cache.add(CATALOG_VERSION_KEY, 2, timeout=None)
+        return cache.get(CATALOG_VERSION_KEY, 2)
+
+
+def _card_key(product):
+    # updated_at moves on every product write, and on supplier renames
+    version = getattr(settings, 'TEMPLATE_FRAGMENT_VERSION', '1')
+    return f'catalog:card:{version}:{product.id}:{product.updated_at.timestamp()}'
+
+
+def _render_missing_cards(products, keys, cached):
+    """Return (cards, {key: html} of the cards that had to be rendered)."""
+    missing = {}
+    cards = []
+    template = None
+    for product, key in zip(products, keys):
+        html = cached.get(key)
+        if html is None:
+            if template is None:
+                # the engine's own template: one card is not worth a timing entry
+                template = Engine.get_default().get_template(CARD_TEMPLATE)
+            html = missing[key] = template.render(Context({'product': product}))
+        cards.append(html)
+    return cards, missing
+
+
+def render_product_cards(products):
+    """Return the rendered card of each product, from the per-card cache.
+
+    All cards are looked up with one get_many, and only the misses are
+    rendered, so a page whose products did not change renders no card at
+    all even after the page-level cache was invalidated.
+    """
+    keys = [_card_key(product) for product in products]
+    cards, missing = _render_missing_cards(products, keys, cache.get_many(keys))
+    if missing:
+        cache.set_many(missing, getattr(settings, 'CATALOG_CARD_CACHE_TIMEOUT', 86400))
+    return cards
+
+
+async def arender_product_cards(products):
+    """Async render_product_cards."""
+    keys = [_card_key(product) for product in products]
+    cards, missing = _render_missing_cards(products, keys, await cache.aget_many(keys))
+    if missing:
+        await cache.aset_many(missing, getattr(settings, 'CATALOG_CARD_CACHE_TIMEOUT', 86400))
+    return cards
+
+
+def _page_key(version, cursor):
+    """Cache key of a catalog page, or None for a cursor that does not decode.
+
+    The key is built from the decoded sort key rather than the raw ?after=
+    string, so padding or other spellings of one cursor share an entry and
+    junk cursors (served as the first page, uncached) add none.
+    """
+    if not cursor:
+        return f'catalog:page:v{version}:first'
+    values = decode_cursor(cursor, len(CATALOG_ORDERING))
+    if values is None:
+        return None
+    digest = hashlib.sha1(json.dumps(values, default=str).encode()).hexdigest()
+    return f'catalog:page:v{version}:{digest}'
+
+
+def render_catalog_page(cursor=None):
+    """Return (html, page) for one catalog page, served from cache when warm.
+
+    ``page`` is None on a cache hit; the rendered HTML already contains the
+    product grid and the link to the next page.
+    """
+    key = _page_key(get_catalog_version(), cursor)
+    html = cache.get(key) if key else None
+    if html is not None:
+        return html, None
+
+    page = get_catalog_page(cursor)
+    html = render_to_string('includes/product_grid.html', {'page': page})
+    if key:
+        cache.set(key, html, getattr(settings, 'CATALOG_CACHE_TIMEOUT', 300))
+    return html, page
+
+
+async def arender_catalog_page(cursor=None):
+    """Async render_catalog_page."""
+    key = _page_key(await aget_catalog_version(), cursor)
+    html = await cache.aget(key) if key else None
+    if html is not None:
+        return html, None
+
+    page = await aget_catalog_page(cursor)
+    # the cards are looked up here, so rendering the grid touches no cache
+    cards = await arender_product_cards(page.items)
+    html = render_to_string('includes/product_grid.html', {'page': page, 'rendered_cards': cards})
+    if key:
+        await cache.aset(key, html, getattr(settings, 'CATALOG_CACHE_TIMEOUT', 300))
+    return html, page
+
+
+# Supplier directory: a keyset page of suppliers, then one grouped query over
+# their products (via product_supplier_name_idx) for the per-supplier
+# summaries. Aggregating in the page query itself would make the database
+# group every product before it could apply the LIMIT.
+
+def supplier_summaries(supplier_ids):
+    """Map supplier id -> product count, stock value and price range."""
+    stock_value = ExpressionWrapper(F('price') * F('stock'), output_field=DecimalField(max_digits=16, decimal_places=2))
+    rows = (
+        Product.objects.filter(supplier_id__in=supplier_ids)
+        .values('supplier_id')
+        .annotate(
+            product_count=Count('id'), stock_value=Sum(stock_value),
+            min_price=Min('price'), max_price=Max('price'),
+        )
+        .order_by()
+    )
+    return {row.pop('supplier_id'): row for row in rows}
+
+
+def _attach_summary(supplier, summary):
+    supplier.product_count = summary.get('product_count', 0)
+    supplier.stock_value = summary.get('stock_value') or 0
+    supplier.min_price = summary.get('min_price')
+    supplier.max_price = summary.get('max_price')
+    return supplier
+
+
+def get_supplier_page(cursor=None, page_size=None):
+    """Return a KeysetPage of suppliers by name, each with its summary attached."""
+    page = keyset_paginate(
+        Supplier.objects.only('id', 'name', 'contact_email'),
+        SUPPLIER_ORDERING,
+        cursor=cursor,
+        page_size=page_size or getattr(settings, 'SUPPLIER_PAGE_SIZE', 24),
+    )
+    summaries = supplier_summaries([supplier.id for supplier in page.items])
+    for supplier in page.items:
+        _attach_summary(supplier, summaries.get(supplier.id, {}))
+    return page
+
+
+def get_supplier_catalog(supplier, cursor=None, page_size=None):
+    """The supplier's summary and one keyset page of its products by name."""
+    _attach_summary(supplier, supplier_summaries([supplier.id]).get(supplier.id, {}))
+    return keyset_paginate(
+        catalog_queryset().filter(supplier_id=supplier.id),
+        CATALOG_ORDERING,
+        cursor=cursor,
+        page_size=page_size or catalog_page_size(),
+    )
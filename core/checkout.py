@@ -0,0 +1,157 @@
+import logging
+import random
+import time
+from dataclasses import dataclass
+
+from django.conf import settings
+from django.db import OperationalError, connection, transaction
+from django.db.models import Case, F, IntegerField, Value, When
+from django.utils import timezone
+
+from .cart import build_cart_snapshot
+from .catalog import bump_catalog_version
+from .inventory import record_movements
+from .models import Order, OrderItem, Product, StockMovement
+from .outbox import ORDER_PLACED, publish
+from .product_cache import bump_products
+from .reservations import available_to_promise, release_holds
+
+logger = logging.getLogger(__name__)
+
+# SQLSTATEs worth retrying: serialization failure, deadlock, lock not available
+RETRYABLE_SQLSTATES = {'40001', '40P01', '55P03'}
+
+
+class CheckoutError(Exception):
+    """The cart cannot be turned into an order; ``message`` is shown to the buyer."""
+
+    def __init__(self, message, snapshot=None):
+        super().__init__(message)
+        self.message = message
+        self.snapshot = snapshot
+
+
+class EmptyCart(CheckoutError):
+    pass
+
+
+@dataclass
+class CheckoutResult:
+    order: Order
+    items: list
+    attempts: int
+    lock_wait_ms: float
+
+
+def decrement_stock(quantities):
+    """Subtract {product_id: quantity} from stock in a single UPDATE.
+
+    Each row is only touched when it still has enough stock, so the returned
+    row count equals ``len(quantities)`` exactly when every line succeeded.
+    """
+    if not quantities:
+        return 0
+    delta = Case(
+        *[When(id=product_id, then=Value(quantity)) for product_id, quantity in quantities.items()],
+        output_field=IntegerField(),
+    )
+    return Product.objects.filter(id__in=list(quantities), stock__gte=delta).update(
+        stock=F('stock') - delta, updated_at=timezone.now(),
+    )
+
+
+def _is_retryable(exc):
+    cause = exc.__cause__
+    code = getattr(cause, 'pgcode', None) or getattr(cause, 'sqlstate', None)
+    if code:
+        return code in RETRYABLE_SQLSTATES
+    return 'database is locked' in str(exc)
+
+
+def _backoff(attempt):
+    base = getattr(settings, 'CHECKOUT_RETRY_BASE_DELAY', 0.05)
+    cap = getattr(settings, 'CHECKOUT_RETRY_MAX_DELAY', 0.5)
+    # full jitter keeps retrying buyers from colliding on the same rows again
+    return random.uniform(0, min(cap, base * (2 ** (attempt - 1))))
+
+
+def _place_order_once(cart_items, buyer, user=None):
+    with transaction.atomic():
+        lock_started = time.perf_counter()
+        snapshot = build_cart_snapshot(cart_items, for_update=True)
+        lock_wait_ms = (time.perf_counter() - lock_started) * 1000
+
+        if snapshot.missing:
+            raise CheckoutError('One or more products are no longer available.', snapshot)
+        if not snapshot:
+            raise EmptyCart('Your cart is empty.', snapshot)
+        if snapshot.capped_lines:
+            raise CheckoutError(f'Insufficient stock for {snapshot.capped_lines[0].product.name}', snapshot)
+        # other carts' holds still count: the buyer's own may have expired and
+        # been swept, and the units promised to someone else since
+        available = available_to_promise([line.product for line in snapshot.lines], user)
+        short = [line for line in snapshot.lines if line.quantity > available[line.product.id]]
+        if short:
+            raise CheckoutError(f'Insufficient stock for {short[0].product.name}', snapshot)
+
+        quantities = {line.product.id: line.quantity for line in snapshot.lines}
+        if decrement_stock(quantities) != len(quantities):
+            # rows are locked, so this only happens if stock moved under us
+            raise CheckoutError('Insufficient stock for one or more products.', snapshot)
+
+        order = Order.objects.create(
+            total_price=snapshot.total_price,
+            status='completed',
+            **buyer,
+        )
+        items = OrderItem.objects.bulk_create([
+            OrderItem(order=order, product=line.product, quantity=line.quantity, price=line.product.price)
+            for line in snapshot.lines
+        ])
+        record_movements(StockMovement.SALE, {product_id: -quantity for product_id, quantity in quantities.items()},
+                         order=order)
+        # buyer stats, rollups, notices and mail run in the outbox worker
+        publish(ORDER_PLACED, {'order_id': order.id})
+        if user is not None and user.is_authenticated:
+            # the ordered stock is gone now, so the cart's holds are too
+            release_holds(user, quantities)
+        transaction.on_commit(bump_catalog_version)
+        bump_products(list(quantities))
+    return order, items, lock_wait_ms
+
+
+def place_order(cart_items, buyer_name, buyer_email, buyer_phone='', user=None):
+    """Turn a {product_id: quantity} cart into a completed order.
+
+    Stock is locked and priced in one query, decremented in one conditional
+    UPDATE and the order total is taken from the locked prices. Lock and
+    serialization conflicts are retried with jittered exponential backoff,
+    unless we are already inside an outer transaction that a retry could not
+    recover. Units held by other carts are not sold, and ``user``'s own holds
+    on the ordered products are released in the same transaction. Raises
+    CheckoutError when the cart cannot be ordered.
+    """
+    buyer = {'buyer_name': buyer_name, 'buyer_email': buyer_email, 'buyer_phone': buyer_phone}
+    max_attempts = getattr(settings, 'CHECKOUT_MAX_ATTEMPTS', 3)
+    if connection.in_atomic_block:
+        max_attempts = 1
+
+    attempt = 0
+    while True:
+        attempt += 1
+        try:
+            order, items, lock_wait_ms = _place_order_once(cart_items, buyer, user)
+        except OperationalError as exc:
+            if attempt >= max_attempts or not _is_retryable(exc):
+                raise
+            delay = _backoff(attempt)
+            logger.warning('checkout conflict on attempt %s, retrying in %.3fs: %s', attempt, delay, exc)
+            time.sleep(delay)
+            continue
+
+        logger.info(
+            'checkout order=%s lines=%s attempts=%s lock_wait_ms=%.2f',
+            order.id, len(items), attempt, lock_wait_ms,
+            extra={'order_id': order.id, 'lines': len(items), 'attempts': attempt, 'lock_wait_ms': lock_wait_ms},
+        )
+        return CheckoutResult(order=order, items=items, attempts=attempt, lock_wait_ms=lock_wait_ms)
@@ -0,0 +1,74 @@
+import logging
+
+from django.conf import settings
+from django.core.mail import send_mail
+from django.db import transaction
+
+from .buyers import record_order
+from .models import Order, OrderItem
+from .outbox import ORDER_PLACED, consumer
+from .rollups import record_sales
+
+logger = logging.getLogger(__name__)
+
+# Outbox consumers, run by the run_worker command (see core.outbox). Each one
+# runs in the worker's transaction and must only touch the database; mail
+# goes out from on_commit once the event is marked done.
+
+
+def _placed_order(event):
+    """The event's order and items, loaded once for all of its consumers."""
+    if not hasattr(event, '_placed_order'):
+        order = Order.objects.filter(pk=event.payload['order_id']).first()
+        items = []
+        if order is not None:
+            items = list(
+                OrderItem.objects.filter(order=order)
+                .select_related('product')
+                .only('quantity', 'price', 'product__name', 'product__stock', 'product__supplier_id')
+            )
+        event._placed_order = order, items
+    return event._placed_order
+
+
+@consumer(ORDER_PLACED)
+def update_buyer(event):
+    order, _ = _placed_order(event)
+    if order is not None:
+        record_order(order)
+
+
+@consumer(ORDER_PLACED)
+def update_sales_rollups(event):
+    order, items = _placed_order(event)
+    if order is not None:
+        record_sales(order, items)
+
+
+@consumer(ORDER_PLACED)
+def notify_low_stock(event):
+    _, items = _placed_order(event)
+    level = getattr(settings, 'LOW_STOCK_NOTICE_LEVEL', 10)
+    for item in items:
+        if item.product.stock <= level:
+            logger.warning(
+                'low stock: %s (#%s) has %s left', item.product.name, item.product_id, item.product.stock,
+                extra={'product_id': item.product_id, 'stock': item.product.stock},
+            )
+
+
+@consumer(ORDER_PLACED)
+def send_confirmation(event):
+    if not getattr(settings, 'ORDER_CONFIRMATION_EMAILS', False):
+        return
+    order, items = _placed_order(event)
+    if order is None or not order.buyer_email:
+        return
+    lines = '\n'.join(f'{item.quantity} x {item.product.name} @ {item.price}' for item in items)
+    message = f'Hello {order.buyer_name},\n\nThank you for order #{order.id}.\n\n{lines}\n\nTotal: {order.total_price}\n'
+    # a failed send is logged rather than retried, so the row updates above
+    # are never applied twice
+    transaction.on_commit(
+        lambda: send_mail(f'Order #{order.id} confirmed', message, None, [order.buyer_email]),
+        robust=True,
+    )
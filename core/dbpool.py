@@ -0,0 +1,67 @@
+import os
+import threading
+from collections import Counter
+
+from django.db import connections
+
+# Per-worker database connection accounting.
+#
+# ``connects`` counts every time Django opened a connection for an alias in
+# this process (core.signals listens to connection_created). With DB_POOL
+# that is a checkout from the psycopg pool, and the pool's own counters say
+# how many physical connections were really opened, how many are in use or
+# idle, and how long requests waited for one. The numbers are per process;
+# PerformanceMiddleware logs them with the worker's pid.
+
+_lock = threading.Lock()
+_connects = Counter()
+
+
+def record_connect(alias):
+    with _lock:
+        _connects[alias] += 1
+
+
+def reset_connects():
+    with _lock:
+        _connects.clear()
+
+
+def _pool(alias):
+    # only the psycopg backend has .pool, and it is None unless OPTIONS['pool'] is set
+    return getattr(connections[alias], 'pool', None)
+
+
+def pool_stats():
+    """Return {alias: stats} for every configured database, in this process."""
+    stats = {}
+    for alias in connections:
+        entry = {'pooled': False, 'connects': _connects[alias]}
+        pool = _pool(alias)
+        if pool is not None:
+            raw = pool.get_stats()
+            # Django opens the pool lazily on the first query
+            size = 0 if pool.closed else raw.get('pool_size', 0)
+            idle = raw.get('pool_available', 0)
+            entry.update({
+                'pooled': True,
+                'min_size': pool.min_size,
+                'max_size': pool.max_size,
+                'opened': raw.get('connections_num', 0),
+                'in_use': size - idle,
+                'idle': idle,
+                'waiting': raw.get('requests_waiting', 0),
+                'requests': raw.get('requests_num', 0),
+                'wait_ms': raw.get('requests_wait_ms', 0),
+                'timeouts': raw.get('requests_errors', 0),
+            })
+        stats[alias] = entry
+    return stats
+
+
+def pool_summary():
+    """pool_stats() for pooled aliases only, tagged with the worker pid; None without pooling."""
+    pooled = {alias: entry for alias, entry in pool_stats().items() if entry['pooled']}
+    if not pooled:
+        return None
+    return {'pid': os.getpid(), **pooled}
@@ -0,0 +1,219 @@
+import csv
+import io
+import json
+import logging
+import time
+from dataclasses import dataclass, field
+from datetime import datetime, time as dt_time, timedelta
+
+from django.conf import settings
+from django.db import connections, router
+from django.utils import timezone
+from django.utils.dateparse import parse_date
+
+from .models import Order, OrderItem
+
+logger = logging.getLogger(__name__)
+
+# Streaming order exports for accounting, used by the export_orders view and
+# command.
+#
+# Rows are read with a server-side cursor (QuerySet.iterator(chunk_size=...))
+# as flat value tuples, written a chunk at a time as CSV or JSON lines, and
+# yielded as text, so memory stays flat however many rows are exported.
+# Behind a transaction-mode pooler server-side cursors are off, and the rows
+# are paged by primary key instead.
+
+FORMATS = {
+    'csv': 'text/csv; charset=utf-8',
+    'jsonl': 'application/x-ndjson',
+}
+
+ORDER_COLUMNS = (
+    ('order_id', 'id'),
+    ('created_at', 'created_at'),
+    ('status', 'status'),
+    ('buyer_name', 'buyer_name'),
+    ('buyer_email', 'buyer_email'),
+    ('buyer_phone', 'buyer_phone'),
+    ('total_price', 'total_price'),
+)
+
+ITEM_COLUMNS = (
+    ('order_id', 'order_id'),
+    ('order_created_at', 'order__created_at'),
+    ('order_status', 'order__status'),
+    ('buyer_email', 'order__buyer_email'),
+    ('item_id', 'id'),
+    ('product_id', 'product_id'),
+    ('sku', 'product__sku'),
+    ('product_name', 'product__name'),
+    ('quantity', 'quantity'),
+    ('unit_price', 'price'),
+)
+
+KINDS = {
+    # kind: (model, columns, prefix of the order fields)
+    'orders': (Order, ORDER_COLUMNS, ''),
+    'items': (OrderItem, ITEM_COLUMNS, 'order__'),
+}
+
+
+class ExportError(Exception):
+    pass
+
+
+@dataclass
+class ExportFilters:
+    date_from: object = None
+    date_to: object = None
+    status: str = ''
+    buyer: str = ''
+
+    @classmethod
+    def parse(cls, date_from=None, date_to=None, status=None, buyer=None):
+        """Build filters from raw strings (query parameters or command options)."""
+        dates = []
+        for label, raw in (('from', date_from), ('to', date_to)):
+            value = None
+            if raw:
+                try:
+                    value = parse_date(raw)
+                except ValueError:
+                    value = None
+                if value is None:
+                    raise ExportError(f'{label} must be a date (YYYY-MM-DD).')
+            dates.append(value)
+        if dates[0] and dates[1] and dates[0] > dates[1]:
+            raise ExportError('from must not be after to.')
+        status = (status or '').strip()
+        if status and status not in dict(Order.STATUS_CHOICES):
+            raise ExportError(f'Unknown status {status!r}.')
+        # checkout stores emails lowercased, so an exact match can use order_buyer_recent_idx
+        return cls(date_from=dates[0], date_to=dates[1], status=status, buyer=(buyer or '').strip().lower())
+
+    def apply(self, queryset, prefix=''):
+        if self.date_from:
+            queryset = queryset.filter(**{f'{prefix}created_at__gte': _start_of(self.date_from)})
+        if self.date_to:
+            # the whole of the last day
+            queryset = queryset.filter(**{f'{prefix}created_at__lt': _start_of(self.date_to + timedelta(days=1))})
+        if self.status:
+            queryset = queryset.filter(**{f'{prefix}status': self.status})
+        if self.buyer:
+            queryset = queryset.filter(**{f'{prefix}buyer_email': self.buyer})
+        return queryset
+
+    def slug(self):
+        parts = [str(self.date_from or 'start'), 'to', str(self.date_to or 'now')]
+        if self.status:
+            parts.append(self.status)
+        return '-'.join(parts)
+
+
+@dataclass
+class ExportStats:
+    rows: int = 0
+    started: float = field(default_factory=time.perf_counter)
+
+    @property
+    def elapsed(self):
+        return time.perf_counter() - self.started
+
+    @property
+    def rows_per_second(self):
+        return self.rows / self.elapsed if self.elapsed else 0.0
+
+
+def _start_of(day):
+    start = datetime.combine(day, dt_time.min)
+    return timezone.make_aware(start) if settings.USE_TZ else start
+
+
+def chunk_size():
+    return getattr(settings, 'EXPORT_CHUNK_SIZE', 2000)
+
+
+def filename(kind, fmt, filters):
+    return f'{"order-items" if kind == "items" else "orders"}-{filters.slug()}.{fmt}'
+
+
+def export_queryset(kind, filters, using=None):
+    model, columns, prefix = KINDS[kind]
+    using = using or router.db_for_read(model)
+    queryset = filters.apply(model.objects.using(using), prefix)
+    return queryset.order_by('pk').values_list(*[source for _, source in columns])
+
+
+def _rows(queryset, size, pk_index):
+    """Yield value tuples from queryset with constant memory."""
+    if not connections[queryset.db].settings_dict.get('DISABLE_SERVER_SIDE_CURSORS'):
+        yield from queryset.iterator(chunk_size=size)
+        return
+    # no server-side cursors: page by primary key (the queryset is in pk order)
+    last = None
+    while True:
+        page = queryset if last is None else queryset.filter(pk__gt=last)
+        batch = list(page[:size])
+        yield from batch
+        if len(batch) < size:
+            return
+        last = batch[-1][pk_index]
+
+
+def _cell(value):
+    if isinstance(value, datetime):
+        return value.isoformat()
+    return '' if value is None else value
+
+
+def _json_value(value):
+    if isinstance(value, datetime):
+        return value.isoformat()
+    if value is None or isinstance(value, (int, str)):
+        return value
+    return str(value)  # Decimal: keep the exact amount
+
+
+def stream_export(kind, fmt, filters, stats=None, using=None, size=None):
+    """Return an iterator over the export as text chunks of about ``size`` rows.
+
+    Bad arguments raise ExportError here, before anything is streamed.
+    """
+    if kind not in KINDS:
+        raise ExportError(f'Unknown export {kind!r}; choose from {", ".join(KINDS)}.')
+    if fmt not in FORMATS:
+        raise ExportError(f'Unknown format {fmt!r}; choose from {", ".join(FORMATS)}.')
+    columns = KINDS[kind][1]
+    queryset = export_queryset(kind, filters, using=using)
+    return _generate(
+        queryset, fmt, [name for name, _ in columns], [source for _, source in columns].index('id'),
+        stats or ExportStats(), size or chunk_size(),
+    )
+
+
+def _generate(queryset, fmt, names, pk_index, stats, size):
+    buffer = io.StringIO()
+    writer = csv.writer(buffer) if fmt == 'csv' else None
+    if writer:
+        writer.writerow(names)
+    pending = 0
+    for row in _rows(queryset, size, pk_index):
+        if writer:
+            writer.writerow([_cell(value) for value in row])
+        else:
+            buffer.write(json.dumps(dict(zip(names, map(_json_value, row))), separators=(',', ':')))
+            buffer.write('\n')
+        stats.rows += 1
+        pending += 1
+        if pending >= size:
+            yield buffer.getvalue()
+            buffer.seek(0)
+            buffer.truncate()
+            pending = 0
+    if buffer.tell():
+        yield buffer.getvalue()
+    logger.info(
+        'exported %s rows of %s as %s in %.2fs (%.0f rows/s)',
+        stats.rows, queryset.model._meta.model_name, fmt, stats.elapsed, stats.rows_per_second,
+    )
@@ -0,0 +1,244 @@
+import csv
+import hashlib
+import json
+import time
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import dataclass, field
+from decimal import Decimal, InvalidOperation
+
+from django.db import transaction
+
+from . import inventory, product_cache, search
+from .catalog import bump_catalog_version
+from .models import Product, StockMovement, Supplier
+
+# Streaming catalog import used by the import_catalog command.
+#
+# Input is read a chunk at a time, parsed/validated (optionally in worker
+# processes), and each chunk is upserted with bulk_create(update_conflicts=...)
+# keyed by Supplier.name and Product.sku. Rows whose content hash matches the
+# stored Product.content_hash are skipped, so re-running a file is cheap.
+
+PRODUCT_UPDATE_FIELDS = ['name', 'description', 'price', 'stock', 'supplier', 'content_hash', 'updated_at']
+
+
+@dataclass
+class ImportStats:
+    read: int = 0
+    written: int = 0
+    unchanged: int = 0
+    invalid: int = 0
+    errors: list = field(default_factory=list)
+    started: float = field(default_factory=time.perf_counter)
+
+    @property
+    def elapsed(self):
+        return time.perf_counter() - self.started
+
+    @property
+    def rows_per_second(self):
+        return self.read / self.elapsed if self.elapsed else 0.0
+
+
+def content_hash(row):
+    canonical = '\x1f'.join([
+        row['name'], row['description'], str(row['price']), str(row['stock']), row['supplier'],
+    ])
+    return hashlib.blake2b(canonical.encode(), digest_size=16).hexdigest()
+
+
+def normalize_record(raw):
+    """Validate one raw record; returns (row, None) or (None, error)."""
+    sku = (raw.get('sku') or '').strip()
+    name = (raw.get('name') or '').strip()
+    supplier = (raw.get('supplier') or '').strip()
+    if not sku or not name or not supplier:
+        return None, f'missing sku, name or supplier: {raw!r}'
+    try:
+        price = Decimal(str(raw.get('price'))).quantize(Decimal('0.01'))
+        stock = int(raw.get('stock') or 0)
+    except (InvalidOperation, TypeError, ValueError):
+        return None, f'{sku}: invalid price or stock'
+    if price < 0:
+        return None, f'{sku}: negative price'
+
+    row = {
+        'sku': sku[:64],
+        'name': name[:255],
+        'description': (raw.get('description') or '').strip(),
+        'price': price,
+        'stock': stock,
+        'supplier': supplier[:255],
+        'supplier_email': (raw.get('supplier_email') or '').strip() or None,
+    }
+    row['content_hash'] = content_hash(row)
+    return row, None
+
+
+def parse_chunk(fmt, header, chunk):
+    """Turn a chunk of raw input into (rows, errors); runs in worker processes."""
+    rows, errors = [], []
+    for item in chunk:
+        if fmt == 'jsonl':
+            try:
+                raw = json.loads(item)
+            except ValueError as exc:
+                errors.append(f'invalid JSON: {exc}')
+                continue
+            if not isinstance(raw, dict):
+                errors.append('invalid JSON: expected an object per line')
+                continue
+        else:
+            raw = dict(zip(header, item))
+        row, error = normalize_record(raw)
+        if error:
+            errors.append(error)
+        else:
+            rows.append(row)
+    return rows, errors
+
+
+def read_chunks(stream, fmt, chunk_size):
+    """Yield (header, chunk) pairs from a text stream without reading it all."""
+    if fmt == 'jsonl':
+        chunk = []
+        for line in stream:
+            if line.strip():
+                chunk.append(line)
+            if len(chunk) >= chunk_size:
+                yield None, chunk
+                chunk = []
+        if chunk:
+            yield None, chunk
+        return
+
+    reader = csv.reader(stream)
+    header = [column.strip().lower() for column in next(reader, [])]
+    chunk = []
+    for record in reader:
+        if record:
+            chunk.append(record)
+        if len(chunk) >= chunk_size:
+            yield header, chunk
+            chunk = []
+    if chunk:
+        yield header, chunk
+
+
+class CatalogImporter:
+    def __init__(self, chunk_size=5000):
+        self.chunk_size = chunk_size
+        self.supplier_ids = {}
+        self.stats = ImportStats()
+
+    def _supplier_ids_for(self, rows):
+        emails = {}
+        for row in rows:
+            if row['supplier'] not in self.supplier_ids:
+                emails.setdefault(row['supplier'], row['supplier_email'])
+        if emails:
+            with_email = [Supplier(name=name, contact_email=email) for name, email in emails.items() if email]
+            without_email = [Supplier(name=name) for name, email in emails.items() if not email]
+            if with_email:
+                Supplier.objects.bulk_create(
+                    with_email, update_conflicts=True, unique_fields=['name'], update_fields=['contact_email'],
+                )
+            if without_email:
+                # never blank out an email we already have
+                Supplier.objects.bulk_create(without_email, ignore_conflicts=True)
+            self.supplier_ids.update(
+                Supplier.objects.filter(name__in=list(emails)).values_list('name', 'id')
+            )
+            if with_email:
+                product_cache.bump_suppliers([self.supplier_ids[supplier.name] for supplier in with_email])
+        return self.supplier_ids
+
+    def apply_rows(self, rows):
+        """Upsert one parsed chunk; returns the ids of products written."""
+        # the last occurrence of a SKU within a chunk wins
+        rows = list({row['sku']: row for row in rows}.values())
+        existing = {
+            sku: (content_hash, stock)
+            for sku, content_hash, stock in Product.objects.filter(
+                sku__in=[row['sku'] for row in rows]
+            ).values_list('sku', 'content_hash', 'stock')
+        }
+        changed = [row for row in rows if existing.get(row['sku'], (None,))[0] != row['content_hash']]
+        self.stats.unchanged += len(rows) - len(changed)
+        if not changed:
+            return []
+
+        with transaction.atomic():
+            supplier_ids = self._supplier_ids_for(changed)
+            Product.objects.bulk_create(
+                [
+                    Product(
+                        sku=row['sku'],
+                        name=row['name'],
+                        description=row['description'],
+                        price=row['price'],
+                        stock=row['stock'],
+                        supplier_id=supplier_ids[row['supplier']],
+                        content_hash=row['content_hash'],
+                    )
+                    for row in changed
+                ],
+                update_conflicts=True,
+                unique_fields=['sku'],
+                update_fields=PRODUCT_UPDATE_FIELDS,
+            )
+            # bulk upserts skip save() signals, so refresh the search index,
+            # cache versions and stock ledger here
+            ids_by_sku = dict(
+                Product.objects.filter(sku__in=[row['sku'] for row in changed]).values_list('sku', 'id')
+            )
+            product_ids = list(ids_by_sku.values())
+            search.index_products(product_ids)
+            product_cache.bump_products(product_ids)
+            inventory.record_movements(StockMovement.ADJUSTMENT, {
+                ids_by_sku[row['sku']]: row['stock'] - existing.get(row['sku'], (None, 0))[1] for row in changed
+            }, reference='catalog import')
+        self.stats.written += len(changed)
+        return product_ids
+
+    def _record(self, rows, errors):
+        self.stats.read += len(rows) + len(errors)
+        self.stats.invalid += len(errors)
+        self.stats.errors.extend(errors[:max(0, 20 - len(self.stats.errors))])
+        self.apply_rows(rows)
+
+    def run(self, stream, fmt='csv', workers=0, progress=None):
+        """Import every record from stream and return the ImportStats."""
+        chunks = read_chunks(stream, fmt, self.chunk_size)
+        if workers and workers > 1:
+            with ProcessPoolExecutor(max_workers=workers) as pool:
+                pending = []
+                for header, chunk in chunks:
+                    pending.append(pool.submit(parse_chunk, fmt, header, chunk))
+                    # keep a bounded number of chunks in flight so memory stays flat
+                    if len(pending) >= workers * 2:
+                        self._record(*pending.pop(0).result())
+                        if progress:
+                            progress(self.stats)
+                for future in pending:
+                    self._record(*future.result())
+                    if progress:
+                        progress(self.stats)
+        else:
+            for header, chunk in chunks:
+                self._record(*parse_chunk(fmt, header, chunk))
+                if progress:
+                    progress(self.stats)
+
+        if self.stats.written:
+            bump_catalog_version()
+        return self.stats
+
+
+def import_catalog(source, fmt='csv', chunk_size=5000, workers=0, progress=None):
+    """Import a catalog from a path or an open text stream."""
+    importer = CatalogImporter(chunk_size=chunk_size)
+    if hasattr(source, 'read'):
+        return importer.run(source, fmt, workers, progress)
+    with open(source, newline='', encoding='utf-8') as stream:
+        return importer.run(stream, fmt, workers, progress)
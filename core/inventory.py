@@ -0,0 +1,237 @@
+import csv
+import io
+from dataclasses import dataclass, field
+
+from django.conf import settings
+from django.db import DataError, connection, transaction
+from django.db.models import F, Sum
+from django.db.models.functions import Coalesce
+from django.utils import timezone
+
+from .catalog import bump_catalog_version
+from .models import Product, StockMovement
+from .product_cache import bump_products
+
+# Stock ledger.
+#
+# Every change to Product.stock is also written to StockMovement, so a
+# product's stock is the sum of its movements:
+# - checkout records a sale per order line;
+# - saving a Product by hand (admin, seed data) records an adjustment, see
+#   core.signals;
+# - the catalog importer records adjustments for the stock it overwrites;
+# - receive_stock() applies restocks and returns in bulk.
+# find_drift() checks that invariant for every product in one aggregate query
+# (the reconcile_stock command).
+#
+# receive_stock() is sized for a whole shipment. Lines are summed per
+# product and applied chunk by chunk: per chunk, one query maps SKUs to ids,
+# one UPDATE adds a CASE of quantities to stock, and one multi-row INSERT
+# writes the movements. The shipment is applied in one transaction. Both
+# writes are plain SQL: building a 1000-branch Case() through the ORM costs
+# far more than running it.
+
+
+class RestockError(Exception):
+    """The shipment as a whole is unusable (no lines, too many lines...)."""
+
+
+@dataclass
+class RestockResult:
+    reference: str = ''
+    lines: int = 0
+    products: int = 0
+    units: int = 0
+    unknown: list = field(default_factory=list)
+    invalid: list = field(default_factory=list)
+
+    def as_dict(self):
+        return {
+            'reference': self.reference,
+            'lines': self.lines,
+            'products': self.products,
+            'units': self.units,
+            'unknown': self.unknown[:50],
+            'unknown_count': len(self.unknown),
+            'invalid': self.invalid[:50],
+            'invalid_count': len(self.invalid),
+        }
+
+
+def max_lines():
+    return getattr(settings, 'RESTOCK_MAX_LINES', 100_000)
+
+
+def chunk_size():
+    return getattr(settings, 'RESTOCK_CHUNK_SIZE', 1000)
+
+
+def max_quantity():
+    """The largest quantity the stock and movement columns hold on this database."""
+    return connection.ops.integer_field_range('IntegerField')[1]
+
+
+def record_movements(kind, quantities, reference='', order=None):
+    """Append one movement per {product_id: signed quantity}; does not touch stock."""
+    rows = [(product_id, quantity) for product_id, quantity in quantities.items() if quantity]
+    now = connection.ops.adapt_datetimefield_value(timezone.now())
+    order_id = order.id if order is not None else None
+    table = StockMovement._meta.db_table
+    size = chunk_size()
+    with connection.cursor() as cursor:
+        for start in range(0, len(rows), size):
+            chunk = rows[start:start + size]
+            params = []
+            for product_id, quantity in chunk:
+                params += [product_id, kind, quantity, order_id, reference, now]
+            cursor.execute(
+                f'INSERT INTO {table} (product_id, kind, quantity, order_id, reference, created_at) '
+                f'VALUES {", ".join(["(%s, %s, %s, %s, %s, %s)"] * len(chunk))}',
+                params,
+            )
+
+
+def _add_stock(quantities):
+    """stock += quantity for {product_id: quantity} in one UPDATE."""
+    table = Product._meta.db_table
+    cases, params = [], []
+    for product_id, quantity in quantities.items():
+        cases.append('WHEN %s THEN %s')
+        params += [product_id, quantity]
+    params.append(connection.ops.adapt_datetimefield_value(timezone.now()))
+    params += list(quantities)
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f'UPDATE {table} SET stock = stock + CASE id {" ".join(cases)} ELSE 0 END, updated_at = %s '
+            f'WHERE id IN ({", ".join(["%s"] * len(quantities))})',
+            params,
+        )
+        return cursor.rowcount
+
+
+# first-row cells that name a column; any other first row with a bad
+# quantity is a line with a typo and is reported, not skipped
+REF_HEADERS = {'sku', 'ref', 'reference', 'product', 'product id', 'id', 'item', 'code'}
+QUANTITY_HEADERS = {'quantity', 'qty', 'units', 'amount', 'count'}
+
+
+def is_header(cells):
+    """Whether a CSV row names its columns ("sku,quantity") instead of a line."""
+    ref = cells[0].lower().replace('_', ' ') if cells else ''
+    quantity = cells[1].lower().replace('_', ' ') if len(cells) > 1 else ''
+    return ref in REF_HEADERS or quantity in QUANTITY_HEADERS
+
+
+def parse_lines(text):
+    """Turn "ref,quantity" CSV text into ([(line, ref, quantity)], invalid).
+
+    ``ref`` is a SKU or a product id. A header row (see is_header) is
+    skipped; rows with a missing, non-positive or out-of-range quantity are
+    returned in ``invalid``.
+    """
+    limit = max_quantity()
+    try:
+        dialect = csv.Sniffer().sniff(text[:2048], delimiters=',;\t')
+    except csv.Error:
+        dialect = csv.excel
+    lines, invalid = [], []
+    for number, row in enumerate(csv.reader(io.StringIO(text), dialect), start=1):
+        cells = [cell.strip() for cell in row]
+        if not cells or not cells[0]:
+            continue
+        raw = cells[1] if len(cells) > 1 else ''
+        try:
+            quantity = int(raw)
+        except ValueError:
+            if not lines and not invalid and is_header(cells):
+                continue
+            quantity = 0
+        if quantity <= 0 or quantity > limit:
+            invalid.append({'line': number, 'ref': cells[0], 'quantity': raw})
+        else:
+            lines.append((number, cells[0], quantity))
+    return lines, invalid
+
+
+def _resolve(refs):
+    """Map each ref (SKU first, else numeric product id) to a product id."""
+    found = dict(Product.objects.filter(sku__in=refs).values_list('sku', 'id'))
+    # numbers beyond the id column would make the lookup itself fail
+    limit = connection.ops.integer_field_range(Product._meta.pk.get_internal_type())[1]
+    ids = {
+        ref: int(ref) for ref in refs
+        if ref not in found and ref.isascii() and ref.isdigit() and len(ref) <= len(str(limit)) and int(ref) <= limit
+    }
+    if ids:
+        existing = set(Product.objects.filter(id__in=ids.values()).values_list('id', flat=True))
+        found.update({ref: product_id for ref, product_id in ids.items() if product_id in existing})
+    return found
+
+
+def receive_stock(lines, kind=StockMovement.RESTOCK, reference='', invalid=(), size=None):
+    """Add stock for [(line, ref, quantity)] and record the movements.
+
+    Returns a RestockResult; refs that match no product are reported in
+    ``unknown``, lines that would take a ref past max_quantity() in
+    ``invalid``, and the rest is still applied.
+    """
+    if kind not in (StockMovement.RESTOCK, StockMovement.RETURN):
+        raise RestockError(f'Cannot receive stock as {kind!r}.')
+    if not lines:
+        raise RestockError('No valid lines to apply.')
+
+    result = RestockResult(reference=reference, lines=len(lines), invalid=list(invalid))
+    limit = max_quantity()
+    by_ref = {}
+    for line, ref, quantity in lines:
+        if by_ref.get(ref, 0) + quantity > limit:
+            result.invalid.append({'line': line, 'ref': ref, 'quantity': quantity})
+        else:
+            by_ref[ref] = by_ref.get(ref, 0) + quantity
+    refs = list(by_ref)
+    size = size or chunk_size()
+    try:
+        with transaction.atomic():
+            for start in range(0, len(refs), size):
+                chunk = refs[start:start + size]
+                ids = _resolve(chunk)
+                quantities = {}
+                for ref in chunk:
+                    if ref in ids:
+                        quantities[ids[ref]] = quantities.get(ids[ref], 0) + by_ref[ref]
+                    else:
+                        result.unknown.append(ref)
+                if not quantities:
+                    continue
+                # ids in ascending order, like checkout's row locks
+                quantities = dict(sorted(quantities.items()))
+                _add_stock(quantities)
+                record_movements(kind, quantities, reference=reference)
+                bump_products(list(quantities))
+                result.products += len(quantities)
+                result.units += sum(quantities.values())
+            if result.products:
+                transaction.on_commit(bump_catalog_version)
+    except DataError:
+        # a product's new stock is past the column range (PostgreSQL, MySQL)
+        raise RestockError('The shipment would take stock beyond what the database can store.')
+    return result
+
+
+def find_drift():
+    """Return [(product_id, stock, ledger)] for every product whose stock != its ledger sum."""
+    return list(
+        Product.objects.values('id', 'stock')
+        .annotate(ledger=Coalesce(Sum('movements__quantity'), 0))
+        .exclude(stock=F('ledger'))
+        .order_by('id')
+        .values_list('id', 'stock', 'ledger')
+    )
+
+
+def adopt_stock(drift, reference='reconciliation'):
+    """Record adjustments so the ledger matches the current stock of the drifted products."""
+    quantities = {product_id: stock - ledger for product_id, stock, ledger in drift}
+    with transaction.atomic():
+        record_movements(StockMovement.ADJUSTMENT, quantities, reference=reference)
+    return len(quantities)
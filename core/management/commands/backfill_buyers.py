@@ -0,0 +1,18 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from core.buyers import rebuild_buyers
+
+
+class Command(BaseCommand):
+    help = 'Rebuild the Buyer directory from existing orders'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=1000)
+
+    def handle(self, *args, **options):
+        started = time.perf_counter()
+        written = rebuild_buyers(batch_size=options['batch_size'])
+        elapsed = time.perf_counter() - started
+        self.stdout.write(self.style.SUCCESS(f'Rebuilt {written} buyers in {elapsed:.2f}s'))
@@ -0,0 +1,203 @@
+import asyncio
+import io
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.core.asgi import get_asgi_application
+from django.core.management.base import BaseCommand, CommandError
+from django.core.wsgi import get_wsgi_application
+from django.db import connections
+from django.db.backends.signals import connection_created
+from django.test import Client, override_settings
+from django.urls import include, path, reverse
+
+from core import async_views, views
+from core.benchmarks import percentile
+from core.models import Product
+from core.urls import build_urlpatterns
+
+LOADTEST_USERNAME = 'benchmark-asgi'
+
+
+def _urlconf(hot):
+    return type('LoadTestURLConf', (), {'urlpatterns': [path('', include(build_urlpatterns(hot)))]})
+
+
+class Command(BaseCommand):
+    help = (
+        'Load-test the catalog and cart endpoints under WSGI (sync views, fixed thread pool) '
+        'and ASGI (async views, one event loop) with simulated database latency'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--concurrency', type=int, default=64, help='Requests in flight at once')
+        parser.add_argument('--requests', type=int, default=600, help='Total requests per mode')
+        parser.add_argument('--latency-ms', type=float, default=20.0,
+                            help='Delay added to every SQL statement, as a remote database would')
+        parser.add_argument('--wsgi-threads', type=int, default=8,
+                            help='Threads per WSGI worker (e.g. gunicorn --threads)')
+        parser.add_argument('--host', default='localhost')
+        parser.add_argument('--only', choices=['wsgi', 'asgi'])
+
+    def handle(self, *args, **options):
+        product = Product.objects.order_by('id').first()
+        if product is None:
+            raise CommandError('No products; run generate_load_data or seed_data first.')
+        if options['concurrency'] < 1 or options['requests'] < 1:
+            raise CommandError('--concurrency and --requests must be positive')
+
+        user, _ = User.objects.get_or_create(username=LOADTEST_USERNAME)
+        client = Client()
+        client.force_login(user)
+        self.cookie = f'{settings.SESSION_COOKIE_NAME}={client.cookies[settings.SESSION_COOKIE_NAME].value}'
+        self.host = options['host']
+        self.paths = [
+            (reverse('product_list'), False),
+            (reverse('product_detail', args=[product.id]), False),
+            (reverse('cart_count'), True),
+        ]
+
+        delay = options['latency_ms'] / 1000
+
+        def slow_execute(execute, sql, params, many, context):
+            time.sleep(delay)
+            return execute(sql, params, many, context)
+
+        def add_latency(sender, connection, **kwargs):
+            connection.execute_wrappers.append(slow_execute)
+
+        # connections already open in this thread, and every one opened by the
+        # worker threads from now on
+        for connection in connections.all():
+            connection.execute_wrappers.append(slow_execute)
+        connection_created.connect(add_latency)
+        results = []
+        try:
+            if options['only'] != 'asgi':
+                with override_settings(ROOT_URLCONF=_urlconf(views)):
+                    results.append(self.run_wsgi(options))
+            if options['only'] != 'wsgi':
+                with override_settings(ROOT_URLCONF=_urlconf(async_views)):
+                    results.append(self.run_asgi(options))
+        finally:
+            connection_created.disconnect(add_latency)
+            for connection in connections.all():
+                if slow_execute in connection.execute_wrappers:
+                    connection.execute_wrappers.remove(slow_execute)
+            user.delete()
+
+        self.stdout.write(
+            f'{options["requests"]} requests per mode, {options["concurrency"]} in flight, '
+            f'{options["latency_ms"]:g} ms per query'
+        )
+        header = f'{"mode":<28}{"req/s":>9}{"p50 ms":>10}{"p95 ms":>10}{"errors":>8}{"threads":>9}'
+        self.stdout.write(header)
+        self.stdout.write('-' * len(header))
+        for label, elapsed, latencies, errors, threads in results:
+            self.stdout.write(
+                f'{label:<28}{len(latencies) / elapsed:>9.1f}{percentile(latencies, 0.50):>10.1f}'
+                f'{percentile(latencies, 0.95):>10.1f}{errors:>8}{threads:>9}'
+            )
+
+    def _target(self, number):
+        return self.paths[number % len(self.paths)]
+
+    def _headers(self, logged_in):
+        headers = {'host': self.host}
+        if logged_in:
+            headers['cookie'] = self.cookie
+        return headers
+
+    def run_wsgi(self, options):
+        application = get_wsgi_application()
+        latencies, errors = [], []
+        peak = threading.active_count()
+
+        def one(number, queued):
+            nonlocal peak
+            url, logged_in = self._target(number)
+            environ = {
+                'REQUEST_METHOD': 'GET', 'PATH_INFO': url, 'QUERY_STRING': '', 'SCRIPT_NAME': '',
+                'SERVER_NAME': self.host, 'SERVER_PORT': '80', 'SERVER_PROTOCOL': 'HTTP/1.1',
+                'wsgi.url_scheme': 'http', 'wsgi.input': io.BytesIO(), 'wsgi.errors': io.StringIO(),
+                'wsgi.multithread': True, 'wsgi.multiprocess': False, 'wsgi.run_once': False,
+                **{f'HTTP_{name.upper()}': value for name, value in self._headers(logged_in).items()},
+            }
+            status = []
+            response = application(environ, lambda code, headers, exc_info=None: status.append(code))
+            try:
+                b''.join(response)
+            finally:
+                response.close()
+            # measured from when the client sent it, so time queued for a free thread counts
+            latencies.append((time.perf_counter() - queued) * 1000)
+            peak = max(peak, threading.active_count())
+            if not status[0].startswith('200'):
+                errors.append(status[0])
+
+        # a WSGI worker can only have as many requests in flight as it has threads
+        threads = min(options['wsgi_threads'], options['concurrency'])
+        clients = threading.BoundedSemaphore(options['concurrency'])
+        started = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=threads) as pool:
+            futures = []
+            for number in range(options['requests']):
+                clients.acquire()
+                future = pool.submit(one, number, time.perf_counter())
+                future.add_done_callback(lambda _: clients.release())
+                futures.append(future)
+            for future in futures:
+                future.result()
+        elapsed = time.perf_counter() - started
+        return f'wsgi ({threads} threads)', elapsed, latencies, len(errors), peak
+
+    def run_asgi(self, options):
+        application = get_asgi_application()
+        latencies, errors = [], []
+        peak = threading.active_count()
+
+        async def one(number):
+            nonlocal peak
+            url, logged_in = self._target(number)
+            scope = {
+                'type': 'http', 'asgi': {'version': '3.0'}, 'http_version': '1.1', 'method': 'GET',
+                'scheme': 'http', 'path': url, 'raw_path': url.encode(), 'query_string': b'', 'root_path': '',
+                'headers': [(name.encode(), value.encode()) for name, value in self._headers(logged_in).items()],
+                'server': (self.host, 80), 'client': ('127.0.0.1', 0),
+            }
+            status = []
+            messages = [{'type': 'http.request', 'body': b'', 'more_body': False}]
+
+            async def receive():
+                if messages:
+                    return messages.pop()
+                # the client stays connected; Django cancels this wait once it has responded
+                await asyncio.Event().wait()
+
+            async def send(message):
+                if message['type'] == 'http.response.start':
+                    status.append(message['status'])
+
+            started = time.perf_counter()
+            await application(scope, receive, send)
+            latencies.append((time.perf_counter() - started) * 1000)
+            peak = max(peak, threading.active_count())
+            if status[0] != 200:
+                errors.append(status[0])
+
+        async def main():
+            slots = asyncio.Semaphore(options['concurrency'])
+
+            async def limited(number):
+                async with slots:
+                    await one(number)
+
+            await asyncio.gather(*(limited(number) for number in range(options['requests'])))
+
+        started = time.perf_counter()
+        asyncio.run(main())
+        elapsed = time.perf_counter() - started
+        return f'asgi ({options["concurrency"]} in flight)', elapsed, latencies, len(errors), peak
@@ -0,0 +1,44 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from core.benchmarks import format_table, measure
+from core.cart import build_cart_snapshot
+from core.models import Product, Supplier
+
+
+class Command(BaseCommand):
+    help = 'Benchmark cart snapshot query count and latency as the number of cart lines grows'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--sizes', default='10,50,100,250,500',
+                            help='Comma-separated cart sizes (number of lines) to measure')
+        parser.add_argument('--repeat', type=int, default=20)
+
+    def handle(self, *args, **options):
+        sizes = sorted({int(size) for size in options['sizes'].split(',') if size.strip()})
+        results = []
+
+        # the fixture rows are rolled back, so this is safe on any database
+        with transaction.atomic():
+            supplier = Supplier.objects.create(name='Benchmark Supplier')
+            products = Product.objects.bulk_create([
+                Product(name=f'Benchmark Product {i:05d}', price='9.99', supplier=supplier, stock=1000)
+                for i in range(max(sizes))
+            ])
+
+            for size in sizes:
+                cart_items = {str(product.id): 3 for product in products[:size]}
+                results.append(measure(
+                    f'snapshot {size} lines',
+                    lambda: build_cart_snapshot(cart_items),
+                    repeat=options['repeat'],
+                ))
+                results.append(measure(
+                    f'snapshot {size} lines locked',
+                    lambda: build_cart_snapshot(cart_items, for_update=True),
+                    repeat=options['repeat'],
+                ))
+
+            transaction.set_rollback(True)
+
+        self.stdout.write(format_table(results))
@@ -0,0 +1,75 @@
+import threading
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connections
+
+from core.benchmarks import percentile
+from core.dbpool import pool_stats, reset_connects
+from core.models import Product
+
+
+class Command(BaseCommand):
+    help = 'Simulate concurrent requests and report connection reuse and pool wait times'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--database', default='default')
+        parser.add_argument('--threads', type=int, default=16, help='Concurrent workers')
+        parser.add_argument('--requests', type=int, default=50, help='Requests per worker')
+        parser.add_argument('--no-reuse', action='store_true',
+                            help='Close the connection after every request (baseline)')
+
+    def handle(self, *args, **options):
+        alias = options['database']
+        if alias not in connections:
+            raise CommandError(f'Unknown database alias {alias!r}')
+        threads, per_thread = options['threads'], options['requests']
+        latencies, errors = [], []
+        lock = threading.Lock()
+        reset_connects()
+
+        def worker():
+            connection = connections[alias]
+            own = []
+            try:
+                for _ in range(per_thread):
+                    started = time.perf_counter()
+                    Product.objects.using(alias).filter(stock__gt=0).exists()
+                    # what request_finished does at the end of every request
+                    if options['no_reuse']:
+                        connection.close()
+                    else:
+                        connection.close_if_unusable_or_obsolete()
+                    own.append((time.perf_counter() - started) * 1000)
+            except Exception as exc:
+                with lock:
+                    errors.append(exc)
+            finally:
+                connection.close()
+                with lock:
+                    latencies.extend(own)
+
+        started = time.perf_counter()
+        workers = [threading.Thread(target=worker) for _ in range(threads)]
+        for thread in workers:
+            thread.start()
+        for thread in workers:
+            thread.join()
+        elapsed = time.perf_counter() - started
+
+        stats = pool_stats()[alias]
+        opened = stats['opened'] if stats['pooled'] else stats['connects']
+        done = len(latencies)
+        self.stdout.write(f'{done} requests from {threads} workers in {elapsed:.2f}s ({done / elapsed:.0f} req/s)')
+        self.stdout.write(f'p50 {percentile(latencies, 0.50):.2f} ms, p95 {percentile(latencies, 0.95):.2f} ms')
+        self.stdout.write(
+            f'connections: {stats["connects"]} checkouts, {opened} opened, '
+            f'{done / opened if opened else 0:.1f} requests per connection'
+        )
+        if stats['pooled']:
+            self.stdout.write(
+                f'pool: size {stats["min_size"]}-{stats["max_size"]}, in use {stats["in_use"]}, idle {stats["idle"]}, '
+                f'waited {stats["wait_ms"]} ms total, {stats["timeouts"]} timeouts'
+            )
+        if errors:
+            raise CommandError(f'{len(errors)} workers failed, first error: {errors[0]}')
@@ -0,0 +1,67 @@
+import random
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+
+from core.benchmarks import format_table, measure
+from core.models import Product, Supplier
+from core.search import rebuild_index, search
+
+WORDS = (
+    'steel copper nitrile cotton industrial heavy duty safety pallet wrap glove bolt anchor '
+    'clamp drill epoxy tape cable socket valve filter hose lamp chair desk monitor hub keyboard '
+    'premium compact wireless adjustable ergonomic portable reinforced galvanized stainless'
+).split()
+
+
+class Command(BaseCommand):
+    help = 'Benchmark product search latency on a synthetic catalog (rolled back afterwards)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--products', type=int, default=100_000)
+        parser.add_argument('--suppliers', type=int, default=500)
+        parser.add_argument('--repeat', type=int, default=20)
+        parser.add_argument('--budget-ms', type=float, default=50.0,
+                            help='Fail if any query p95 exceeds this many milliseconds')
+        parser.add_argument('--seed', type=int, default=1)
+
+    def handle(self, *args, **options):
+        rng = random.Random(options['seed'])
+        queries = ['glove', 'steel bolt', 'erg', 'wireless key', 'galvanized anchor clamp', 'supplier 42']
+        results = []
+
+        with transaction.atomic():
+            started = time.perf_counter()
+            suppliers = Supplier.objects.bulk_create([
+                Supplier(name=f'Benchmark Supplier {i}') for i in range(options['suppliers'])
+            ])
+            Product.objects.bulk_create(
+                (
+                    Product(
+                        name=' '.join(rng.sample(WORDS, 3)).title(),
+                        description=' '.join(rng.choices(WORDS, k=12)),
+                        price='1.00',
+                        stock=1,
+                        supplier=suppliers[i % len(suppliers)],
+                    )
+                    for i in range(options['products'])
+                ),
+                batch_size=5000,
+            )
+            indexed = rebuild_index()
+            self.stdout.write(f'Indexed {indexed} products in {time.perf_counter() - started:.1f}s')
+
+            for query in queries:
+                results.append(measure(f'q={query!r}', lambda: search(query), repeat=options['repeat']))
+
+            transaction.set_rollback(True)
+
+        self.stdout.write(format_table(results))
+        slow = [m for m in results if m.p95_ms > options['budget_ms']]
+        if slow:
+            raise CommandError(
+                f'{len(slow)} queries exceeded the {options["budget_ms"]:.0f} ms p95 budget: '
+                + ', '.join(m.label for m in slow)
+            )
+        self.stdout.write(self.style.SUCCESS(f'All queries within {options["budget_ms"]:.0f} ms p95'))
@@ -0,0 +1,43 @@
+import time
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+from django.utils.dateparse import parse_date
+
+from core.rollups import day_start, prune_hourly, rebuild
+
+
+class Command(BaseCommand):
+    help = 'Rebuild closed sales rollup buckets from orders and prune old hourly rollups'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--since', help='Rebuild from this date, YYYY-MM-DD')
+        parser.add_argument('--days', type=int, default=2, help='Rebuild the last N days (default 2)')
+        parser.add_argument('--batch-size', type=int, default=1000)
+        parser.add_argument('--loop', action='store_true', help='Keep compacting every --interval seconds')
+        parser.add_argument('--interval', type=float, default=3600.0)
+
+    def handle(self, *args, **options):
+        since_day = None
+        if options['since']:
+            try:
+                since_day = parse_date(options['since'])
+            except ValueError:
+                since_day = None
+            if since_day is None:
+                raise CommandError('--since must be a date (YYYY-MM-DD).')
+        while True:
+            started = time.perf_counter()
+            day = since_day or timezone.localdate() - timedelta(days=options['days'])
+            written = rebuild(day_start(day), batch_size=options['batch_size'])
+            pruned = prune_hourly()
+            elapsed = time.perf_counter() - started
+            self.stdout.write(
+                f'Rebuilt {written} rollup rows since {day}, pruned {pruned} hourly rows older than '
+                f'{settings.SALES_HOURLY_RETENTION_DAYS} days in {elapsed:.2f}s'
+            )
+            if not options['loop']:
+                return
+            time.sleep(options['interval'])
@@ -0,0 +1,24 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from core.reservations import expire_holds
+
+
+class Command(BaseCommand):
+    help = 'Release cart stock holds whose TTL has passed'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=1000)
+        parser.add_argument('--loop', action='store_true', help='Keep sweeping every --interval seconds')
+        parser.add_argument('--interval', type=float, default=30.0)
+
+    def handle(self, *args, **options):
+        while True:
+            started = time.perf_counter()
+            swept = expire_holds(batch_size=options['batch_size'])
+            elapsed = time.perf_counter() - started
+            self.stdout.write(f'Expired {swept} holds in {elapsed:.2f}s')
+            if not options['loop']:
+                return
+            time.sleep(options['interval'])
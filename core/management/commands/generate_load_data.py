@@ -0,0 +1,137 @@
+import random
+import time
+from contextlib import contextmanager
+from datetime import timedelta
+from decimal import Decimal
+
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.utils import timezone
+
+from core.buyers import rebuild_buyers
+from core.catalog import bump_catalog_version
+from core.inventory import record_movements
+from core.models import Buyer, Order, OrderItem, Product, StockMovement, Supplier
+from core.search import rebuild_index
+
+SKU_PREFIX = 'LOAD-'
+SUPPLIER_PREFIX = 'Load Supplier '
+BUYER_DOMAIN = '@load.example'
+ADJECTIVES = 'Heavy Duty,Compact,Premium,Industrial,Galvanized,Stainless,Wireless,Ergonomic,Reinforced,Portable'.split(',')
+NOUNS = 'Bolt,Anchor,Clamp,Drill,Glove,Tape,Cable,Socket,Valve,Filter,Hose,Lamp,Chair,Desk,Monitor,Hub'.split(',')
+FIRST_NAMES = 'Asha,Ravi,Meera,Arjun,Priya,Kabir,Nisha,Vikram,Anya,Dev'.split(',')
+LAST_NAMES = 'Shah,Patel,Iyer,Khan,Reddy,Mehta,Das,Nair,Gupta,Rao'.split(',')
+
+
+@contextmanager
+def _explicit_timestamps(model):
+    """Let bulk_create keep the created_at/updated_at values we generate."""
+    fields = [model._meta.get_field(name) for name in ('created_at', 'updated_at')]
+    saved = [(f, f.auto_now, f.auto_now_add) for f in fields]
+    for f in fields:
+        f.auto_now = f.auto_now_add = False
+    try:
+        yield
+    finally:
+        for f, auto_now, auto_now_add in saved:
+            f.auto_now, f.auto_now_add = auto_now, auto_now_add
+
+
+class Command(BaseCommand):
+    help = 'Generate a deterministic synthetic dataset for performance benchmarks'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--suppliers', type=int, default=1_000)
+        parser.add_argument('--products', type=int, default=200_000)
+        parser.add_argument('--orders', type=int, default=1_000_000)
+        parser.add_argument('--buyers', type=int, default=50_000)
+        parser.add_argument('--max-items', type=int, default=3, help='Items per order are 1..max-items')
+        parser.add_argument('--days', type=int, default=365, help='Spread orders over this many past days')
+        parser.add_argument('--seed', type=int, default=42)
+        parser.add_argument('--batch-size', type=int, default=5_000)
+        parser.add_argument('--clear', action='store_true', help='Delete previously generated rows first')
+
+    def log(self, message, started):
+        self.stdout.write(f'{message} ({time.perf_counter() - started:.1f}s)')
+
+    def handle(self, *args, **options):
+        rng = random.Random(options['seed'])
+        batch_size = options['batch_size']
+        started = time.perf_counter()
+
+        if options['clear']:
+            Order.objects.filter(buyer_email__endswith=BUYER_DOMAIN).delete()
+            Buyer.objects.filter(email__endswith=BUYER_DOMAIN).delete()
+            Supplier.objects.filter(name__startswith=SUPPLIER_PREFIX).delete()
+            self.log('Cleared previous load data', started)
+
+        suppliers = Supplier.objects.bulk_create(
+            [
+                Supplier(name=f'{SUPPLIER_PREFIX}{i:05d}', contact_email=f'supplier{i}@load.example')
+                for i in range(options['suppliers'])
+            ],
+            batch_size=batch_size,
+        )
+        self.log(f'Created {len(suppliers)} suppliers', started)
+
+        prices = []
+        product_ids = []
+        for offset in range(0, options['products'], batch_size):
+            batch = []
+            for i in range(offset, min(offset + batch_size, options['products'])):
+                price = Decimal(rng.randint(100, 500_000)) / 100
+                prices.append(price)
+                batch.append(Product(
+                    sku=f'{SKU_PREFIX}{i:07d}',
+                    name=f'{rng.choice(ADJECTIVES)} {rng.choice(NOUNS)} {i}',
+                    description=' '.join(rng.choices(ADJECTIVES + NOUNS, k=10)).lower(),
+                    price=price,
+                    stock=rng.randint(0, 5_000),
+                    supplier=suppliers[i % len(suppliers)],
+                ))
+            created = Product.objects.bulk_create(batch)
+            product_ids.extend(p.id for p in created)
+            # the generated stock is each product's opening balance in the ledger
+            record_movements(StockMovement.ADJUSTMENT, {p.id: p.stock for p in created}, reference='opening balance')
+        self.log(f'Created {len(product_ids)} products', started)
+
+        buyers = [
+            (f'{rng.choice(FIRST_NAMES)} {rng.choice(LAST_NAMES)}', f'buyer{i}{BUYER_DOMAIN}', f'9{i:09d}')
+            for i in range(options['buyers'])
+        ]
+        window = timedelta(days=options['days']).total_seconds()
+        now = timezone.now()
+        item_count = 0
+        with _explicit_timestamps(Order):
+            for offset in range(0, options['orders'], batch_size):
+                size = min(batch_size, options['orders'] - offset)
+                orders, lines = [], []
+                for i in range(size):
+                    name, email, phone = rng.choice(buyers)
+                    picks = rng.sample(range(len(product_ids)), rng.randint(1, options['max_items']))
+                    order_lines = [(product_ids[p], rng.randint(1, 20), prices[p]) for p in picks]
+                    # orders get later as ids grow, like real traffic
+                    created_at = now - timedelta(seconds=window * (1 - (offset + i) / options['orders']))
+                    orders.append(Order(
+                        buyer_name=name, buyer_email=email, buyer_phone=phone, status='completed',
+                        total_price=sum(price * qty for _, qty, price in order_lines),
+                        created_at=created_at, updated_at=created_at,
+                    ))
+                    lines.append(order_lines)
+                with transaction.atomic():
+                    orders = Order.objects.bulk_create(orders)
+                    items = [
+                        OrderItem(order_id=order.id, product_id=product_id, quantity=qty, price=price)
+                        for order, order_lines in zip(orders, lines)
+                        for product_id, qty, price in order_lines
+                    ]
+                    OrderItem.objects.bulk_create(items)
+                item_count += len(items)
+                if (offset // batch_size) % 20 == 0:
+                    self.log(f'  {offset + size} orders', started)
+        self.log(f'Created {options["orders"]} orders with {item_count} items', started)
+
+        self.log(f'Rebuilt {rebuild_buyers()} buyers', started)
+        self.log(f'Indexed {rebuild_index()} products for search', started)
+        bump_catalog_version()
+        self.stdout.write(self.style.SUCCESS('Load data ready'))
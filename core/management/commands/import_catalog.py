@@ -0,0 +1,40 @@
+import os
+import sys
+
+from django.core.management.base import BaseCommand, CommandError
+
+from core.importer import import_catalog
+
+
+class Command(BaseCommand):
+    help = 'Stream a CSV or JSONL supplier price list into Supplier and Product rows'
+
+    def add_arguments(self, parser):
+        parser.add_argument('path', help="Input file, or '-' for stdin")
+        parser.add_argument('--format', choices=['csv', 'jsonl'],
+                            help='Input format (default: from the file extension)')
+        parser.add_argument('--chunk-size', type=int, default=5000)
+        parser.add_argument('--workers', type=int, default=0,
+                            help='Parse chunks in this many worker processes')
+
+    def handle(self, *args, **options):
+        path = options['path']
+        fmt = options['format'] or ('jsonl' if path.endswith(('.jsonl', '.ndjson')) else 'csv')
+        if path != '-' and not os.path.exists(path):
+            raise CommandError(f'No such file: {path}')
+
+        def progress(stats):
+            self.stdout.write(f'  {stats.read} rows, {stats.rows_per_second:,.0f} rows/s', ending='\r')
+
+        source = sys.stdin if path == '-' else path
+        stats = import_catalog(
+            source, fmt=fmt, chunk_size=options['chunk_size'], workers=options['workers'], progress=progress,
+        )
+
+        self.stdout.write('')
+        for error in stats.errors:
+            self.stderr.write(f'  skipped: {error}')
+        self.stdout.write(self.style.SUCCESS(
+            f'Read {stats.read} rows in {stats.elapsed:.2f}s ({stats.rows_per_second:,.0f} rows/s): '
+            f'{stats.written} written, {stats.unchanged} unchanged, {stats.invalid} invalid'
+        ))
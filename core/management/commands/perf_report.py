@@ -0,0 +1,57 @@
+import json
+
+from django.core.cache import caches
+from django.core.cache.backends.dummy import DummyCache
+from django.core.cache.backends.locmem import LocMemCache
+from django.core.management.base import BaseCommand, CommandError
+
+from core import product_cache
+from core.perf import HISTOGRAM_BUCKETS_MS, histogram_report, reset_histograms
+
+
+class Command(BaseCommand):
+    help = 'Show per-view latency histograms collected by PerformanceMiddleware, and product cache counters'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--json', action='store_true', help='Print the raw report as JSON')
+        parser.add_argument('--reset', action='store_true', help='Clear the collected histograms and counters afterwards')
+
+    def handle(self, *args, **options):
+        backend = caches['default']
+        if isinstance(backend, (LocMemCache, DummyCache)):
+            # the counters live in each worker's memory; this process would
+            # only ever see its own, empty ones
+            raise CommandError(
+                f'The default cache ({type(backend).__name__}) is not shared between processes, '
+                'so there is nothing to report. Set REDIS_URL.'
+            )
+        report = histogram_report()
+        if options['json']:
+            self.stdout.write(json.dumps(report, indent=2))
+        elif not report:
+            self.stdout.write('No samples collected yet.')
+        else:
+            bounds = [f'<={bound}' for bound in HISTOGRAM_BUCKETS_MS] + ['>max']
+            header = f'{"view":<24}{"count":>8}{"mean ms":>10}{"p50":>7}{"p95":>7}{"queries":>9}  ' + ' '.join(
+                f'{label:>6}' for label in bounds
+            )
+            self.stdout.write(header)
+            self.stdout.write('-' * len(header))
+            for view, row in report.items():
+                buckets = ' '.join(f'{hits:>6}' for hits in row['buckets'].values())
+                self.stdout.write(
+                    f'{view:<24}{row["count"]:>8}{row["mean_ms"]:>10.1f}{row["p50_ms"]:>7}{row["p95_ms"]:>7}'
+                    f'{row["mean_queries"]:>9.1f}  {buckets}'
+                )
+        if not options['json']:
+            counts = product_cache.stats()
+            lookups = sum(counts.values())
+            served = counts['hits'] + counts['stale'] + counts['waits']
+            ratio = f'{served / lookups:.1%}' if lookups else 'n/a'
+            self.stdout.write(
+                f'\nProduct detail cache: {counts["hits"]} hits, {counts["stale"]} stale, '
+                f'{counts["waits"]} waited, {counts["misses"]} misses (served from cache: {ratio})'
+            )
+        if options['reset']:
+            reset_histograms()
+            product_cache.reset_stats()
@@ -0,0 +1,57 @@
+import time
+
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.core.management.base import BaseCommand, CommandError
+from django.test import Client
+
+from core import template_profile
+
+
+class Command(BaseCommand):
+    help = 'Render a page repeatedly and report template render time per template and per tag'
+
+    def add_arguments(self, parser):
+        parser.add_argument('path', nargs='?', default='/products/')
+        parser.add_argument('--repeat', type=int, default=20)
+        parser.add_argument('--user', help='Log in as this username first')
+        parser.add_argument('--cold', action='store_true',
+                            help='Clear the cache before every request (no page or fragment caches)')
+        parser.add_argument('--top', type=int, default=15)
+
+    def handle(self, *args, **options):
+        client = Client(SERVER_NAME='localhost')
+        if options['user']:
+            user = User.objects.filter(username=options['user']).first()
+            if user is None:
+                raise CommandError(f'No user {options["user"]!r}.')
+            client.force_login(user)
+
+        repeat = options['repeat']
+        template_profile.install()
+        try:
+            client.get(options['path'])  # warm up the template loader
+            elapsed = 0.0
+            with template_profile.profile() as result:
+                for _ in range(repeat):
+                    if options['cold']:
+                        cache.clear()
+                    started = time.perf_counter()
+                    response = client.get(options['path'])
+                    elapsed += time.perf_counter() - started
+        finally:
+            template_profile.uninstall()
+        if response.status_code != 200:
+            raise CommandError(f'{options["path"]} returned {response.status_code}.')
+
+        rendered = sum(result.by_template.values())
+        self.stdout.write(
+            f'{options["path"]}: {elapsed * 1000 / repeat:.1f} ms per request, '
+            f'{rendered / repeat:.1f} ms in template nodes\n'
+        )
+        self.stdout.write(f'{"template":<44} {"self ms/req":>12}')
+        for name, ms in result.top_templates(options['top']):
+            self.stdout.write(f'{name:<44} {ms / repeat:>12.2f}')
+        self.stdout.write(f'\n{"tag":<44} {"self ms/req":>12} {"calls/req":>10}')
+        for tag, ms, calls in result.top_tags(options['top']):
+            self.stdout.write(f'{tag:<44} {ms / repeat:>12.2f} {calls / repeat:>10.0f}')
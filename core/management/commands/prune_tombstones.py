@@ -0,0 +1,12 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from core.api import prune_tombstones
+
+
+class Command(BaseCommand):
+    help = 'Delete API deletion records older than TOMBSTONE_RETENTION_DAYS'
+
+    def handle(self, *args, **options):
+        pruned = prune_tombstones()
+        self.stdout.write(f'Pruned {pruned} tombstones older than {settings.TOMBSTONE_RETENTION_DAYS} days')
@@ -0,0 +1,30 @@
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from core.inventory import adopt_stock, find_drift
+
+
+class Command(BaseCommand):
+    help = 'Check every Product.stock against the sum of its stock movements'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--fix', action='store_true',
+                            help='Record adjustments so the ledger matches the current stock')
+        parser.add_argument('--show', type=int, default=20, help='List at most this many drifted products')
+
+    def handle(self, *args, **options):
+        started = time.perf_counter()
+        drift = find_drift()
+        elapsed = time.perf_counter() - started
+        if not drift:
+            self.stdout.write(self.style.SUCCESS(f'Stock matches the ledger for every product ({elapsed:.2f}s)'))
+            return
+
+        self.stdout.write(f'{"product":>10} {"stock":>10} {"ledger":>10} {"diff":>8}')
+        for product_id, stock, ledger in drift[:options['show']]:
+            self.stdout.write(f'{product_id:>10} {stock:>10} {ledger:>10} {stock - ledger:>+8}')
+        summary = f'{len(drift)} products drifted from the ledger ({elapsed:.2f}s)'
+        if not options['fix']:
+            raise CommandError(f'{summary}; rerun with --fix to record adjustments')
+        self.stdout.write(self.style.SUCCESS(f'{summary}; recorded {adopt_stock(drift)} adjustments'))
@@ -0,0 +1,48 @@
+import os
+import sys
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from core.inventory import RestockError, parse_lines, receive_stock
+from core.models import StockMovement
+
+
+class Command(BaseCommand):
+    help = 'Add stock from a "sku,quantity" CSV shipment file and record it in the stock ledger'
+
+    def add_arguments(self, parser):
+        parser.add_argument('path', help="CSV file of SKU (or product id) and quantity, or '-' for stdin")
+        parser.add_argument('--reference', default='', help='Shipment or document number stored on each movement')
+        parser.add_argument('--returns', action='store_true', help='Record the lines as returns instead of restocks')
+        parser.add_argument('--chunk-size', type=int, help='Products per UPDATE (default RESTOCK_CHUNK_SIZE)')
+
+    def handle(self, *args, **options):
+        path = options['path']
+        if path == '-':
+            text = sys.stdin.read()
+        elif not os.path.exists(path):
+            raise CommandError(f'No such file: {path}')
+        else:
+            with open(path, encoding='utf-8-sig') as fh:
+                text = fh.read()
+
+        started = time.perf_counter()
+        lines, invalid = parse_lines(text)
+        kind = StockMovement.RETURN if options['returns'] else StockMovement.RESTOCK
+        try:
+            result = receive_stock(
+                lines, kind=kind, reference=options['reference'], invalid=invalid, size=options['chunk_size'],
+            )
+        except RestockError as exc:
+            raise CommandError(str(exc))
+        elapsed = time.perf_counter() - started
+
+        for entry in result.invalid[:20]:
+            self.stderr.write(f'  line {entry["line"]}: invalid quantity {entry["quantity"]!r} for {entry["ref"]}')
+        for ref in result.unknown[:20]:
+            self.stderr.write(f'  unknown product: {ref}')
+        self.stdout.write(self.style.SUCCESS(
+            f'Applied {result.lines} lines to {result.products} products (+{result.units} units) in {elapsed:.2f}s; '
+            f'{len(result.unknown)} unknown, {len(result.invalid)} invalid'
+        ))
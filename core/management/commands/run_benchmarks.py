@@ -0,0 +1,247 @@
+import json
+import platform
+from datetime import timedelta
+from dataclasses import dataclass, field
+from typing import Callable, Optional
+from urllib.parse import urlencode
+
+from django.contrib.auth.models import Group, User
+from django.core.cache import cache
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
+from django.test import Client
+from django.urls import reverse
+from django.utils import timezone
+
+from core import cart_store
+from core.benchmarks import format_table, measure, peak_memory_kb
+from core.catalog import CATALOG_ORDERING, catalog_queryset
+from core.models import Buyer, Cart, Order, OrderItem, Product, Supplier
+from core.pagination import encode_cursor
+from core.roles import invalidate_user_groups
+
+# Default per-view budgets; override with --budgets FILE (same shape).
+DEFAULT_BUDGETS = {
+    'product_list': {'queries': 2, 'p95_ms': 150},
+    'product_list_deep': {'queries': 2, 'p95_ms': 150},
+    'product_detail': {'queries': 1, 'p95_ms': 100},
+    'product_search': {'queries': 3, 'p95_ms': 150},
+    'supplier_list': {'queries': 2, 'p95_ms': 100},
+    'supplier_detail': {'queries': 3, 'p95_ms': 100},
+    'cart': {'queries': 6, 'p95_ms': 200},
+    'checkout': {'queries': 6, 'p95_ms': 200},
+    'checkout_submit': {'queries': 20, 'p95_ms': 400},
+    'quick_order': {'queries': 40, 'p95_ms': 1000},
+    'buyer_list': {'queries': 5, 'p95_ms': 150},
+    'buyer_detail': {'queries': 6, 'p95_ms': 150},
+    'api_products': {'queries': 2, 'p95_ms': 150},
+    'api_products_changes': {'queries': 2, 'p95_ms': 150},
+    'seller_dashboard': {'queries': 8, 'p95_ms': 300},
+    'seller_dashboard_year': {'queries': 8, 'p95_ms': 1000},
+}
+
+
+@dataclass
+class Scenario:
+    name: str
+    path: str
+    method: str = 'get'
+    data: dict = field(default_factory=dict)
+    login: bool = False
+    cart: bool = False
+    expect: int = 200
+    rollback: bool = False
+    setup: Optional[Callable] = None
+
+
+class Command(BaseCommand):
+    help = 'Time the main views with the test client and check them against query and latency budgets'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--repeat', type=int, default=20)
+        parser.add_argument('--warmup', type=int, default=2)
+        parser.add_argument('--cart-lines', type=int, default=50)
+        parser.add_argument('--only', help='Comma-separated scenario names to run')
+        parser.add_argument('--cold', action='store_true', help='Clear the cache before every request')
+        parser.add_argument('--output', help='Write results as JSON to this file')
+        parser.add_argument('--compare', help='Compare against a previous --output file')
+        parser.add_argument('--budgets', help='JSON file of {scenario: {"queries": n, "p95_ms": ms}}')
+        parser.add_argument('--enforce', action='store_true',
+                            help='Exit with an error when a budget is exceeded')
+        parser.add_argument('--max-regression', type=float, default=1.25,
+                            help='With --compare, fail when p95 grows by more than this factor')
+
+    def build_scenarios(self, cart_lines):
+        product = Product.objects.order_by('id').first()
+        if product is None:
+            raise CommandError('No products found; run generate_load_data first.')
+
+        total = Product.objects.count()
+        middle = catalog_queryset().order_by(*CATALOG_ORDERING).values_list(*CATALOG_ORDERING)[total // 2]
+        buyer = Buyer.objects.order_by('-last_order_at', '-id').first()
+        buyer_email = buyer.email if buyer else 'nobody@example.com'
+        cart_items = {
+            str(pk): 1
+            for pk in Product.objects.filter(stock__gt=10).order_by('id').values_list('id', flat=True)[:cart_lines]
+        }
+        recent = (timezone.now() - timedelta(hours=1)).isoformat()
+        year_ago = (timezone.localdate() - timedelta(days=364)).isoformat()
+        pad_lines = '\n'.join(
+            f'{pk},1' for pk in Product.objects.filter(stock__gt=10).order_by('-id').values_list('id', flat=True)[:1000]
+        )
+
+        return cart_items, [
+            Scenario('product_list', reverse('product_list')),
+            Scenario('product_list_deep', f"{reverse('product_list')}?after={encode_cursor(middle)}"),
+            Scenario('product_detail', reverse('product_detail', args=[product.id])),
+            Scenario('product_search', f"{reverse('product_search')}?q=bolt"),
+            Scenario('supplier_list', reverse('supplier_list')),
+            Scenario('supplier_detail', reverse('supplier_detail', args=[product.supplier_id])),
+            Scenario('cart', reverse('cart'), login=True, cart=True),
+            Scenario('checkout', reverse('checkout'), login=True, cart=True),
+            Scenario(
+                'checkout_submit', reverse('checkout'), method='post', login=True, cart=True, rollback=True,
+                data={'buyer_name': 'Bench Buyer', 'buyer_email': 'bench@example.com'},
+            ),
+            Scenario(
+                'quick_order', reverse('quick_order'), method='post', login=True, rollback=True,
+                data={'csv': pad_lines},
+            ),
+            Scenario('buyer_list', reverse('buyer_list'), login=True),
+            Scenario('buyer_detail', reverse('buyer_detail', args=[buyer_email]), login=True),
+            Scenario('api_products', reverse('api_products')),
+            Scenario('api_products_changes', f"{reverse('api_products')}?{urlencode({'changed_since': recent})}"),
+            Scenario('seller_dashboard', reverse('seller_dashboard'), login=True),
+            Scenario('seller_dashboard_year', f"{reverse('seller_dashboard')}?{urlencode({'from': year_ago})}", login=True),
+        ]
+
+    def handle(self, *args, **options):
+        budgets = DEFAULT_BUDGETS
+        if options['budgets']:
+            with open(options['budgets']) as fh:
+                budgets = {**DEFAULT_BUDGETS, **json.load(fh)}
+
+        only = set(filter(None, (options['only'] or '').split(',')))
+        results = {}
+        measurements = []
+
+        # everything the benchmark writes (user, sessions, orders) is rolled back
+        with transaction.atomic():
+            user = User.objects.create_user('benchmark-runner', password='benchmark')
+            user.groups.add(Group.objects.get_or_create(name='seller')[0])
+            cart_items, scenarios = self.build_scenarios(options['cart_lines'])
+            anonymous = Client(SERVER_NAME='localhost')
+            member = Client(SERVER_NAME='localhost')
+            member.force_login(user)
+
+            for scenario in scenarios:
+                if only and scenario.name not in only:
+                    continue
+                client = member if scenario.login else anonymous
+                results[scenario.name] = self.run_scenario(client, user, scenario, cart_items, options)
+                measurements.append(results[scenario.name].pop('_measurement'))
+
+            transaction.set_rollback(True)
+        # the rollback does not reach the cache, and the runner's id gets reused
+        invalidate_user_groups([user.id])
+
+        self.stdout.write(format_table(measurements))
+        report = {
+            'meta': {
+                'timestamp': timezone.now().isoformat(),
+                'database': connection.vendor,
+                'python': platform.python_version(),
+                'products': Product.objects.count(),
+                'suppliers': Supplier.objects.count(),
+                'orders': Order.objects.count(),
+                'order_items': OrderItem.objects.count(),
+                'repeat': options['repeat'],
+                'cold_cache': options['cold'],
+            },
+            'results': results,
+        }
+        if options['output']:
+            with open(options['output'], 'w') as fh:
+                json.dump(report, fh, indent=2)
+            self.stdout.write(f'Wrote {options["output"]}')
+
+        failures = self.check_budgets(results, budgets)
+        if options['compare']:
+            failures += self.compare(results, options['compare'], options['max_regression'])
+        for failure in failures:
+            self.stderr.write(f'  {failure}')
+        if failures and options['enforce']:
+            raise CommandError(f'{len(failures)} performance budget(s) exceeded')
+
+    def run_scenario(self, client, user, scenario, cart_items, options):
+        savepoints = []
+
+        def setup():
+            if options['cold']:
+                cache.clear()
+            if scenario.rollback:
+                savepoints.append(transaction.savepoint())
+            if scenario.cart:
+                cart_id = Cart.objects.get_or_create(user=user)[0].pk
+                cart_store.clear(cart_id)
+                cart_store.set_quantities(cart_id, cart_items)
+
+        def teardown():
+            if scenario.rollback:
+                transaction.savepoint_rollback(savepoints.pop())
+
+        statuses = []
+
+        def call():
+            response = getattr(client, scenario.method)(scenario.path, scenario.data or None, secure=True)
+            statuses.append(response.status_code)
+
+        measurement = measure(
+            scenario.name, call, repeat=options['repeat'], warmup=options['warmup'],
+            setup=setup, teardown=teardown,
+        )
+        setup()
+        try:
+            peak_kb = peak_memory_kb(call)
+        finally:
+            teardown()
+
+        unexpected = sorted({status for status in statuses if status != scenario.expect})
+        return {
+            **{key: value for key, value in measurement.as_dict().items() if key != 'label'},
+            'peak_kb': peak_kb,
+            'unexpected_status': unexpected,
+            '_measurement': measurement,
+        }
+
+    def check_budgets(self, results, budgets):
+        failures = []
+        for name, result in results.items():
+            if result['unexpected_status']:
+                failures.append(f'{name}: unexpected status {result["unexpected_status"]}')
+            budget = budgets.get(name, {})
+            if 'queries' in budget and result['queries'] > budget['queries']:
+                failures.append(f'{name}: {result["queries"]} queries > budget {budget["queries"]}')
+            if 'p95_ms' in budget and result['p95_ms'] > budget['p95_ms']:
+                failures.append(f'{name}: p95 {result["p95_ms"]:.1f} ms > budget {budget["p95_ms"]} ms')
+        return failures
+
+    def compare(self, results, path, max_regression):
+        with open(path) as fh:
+            baseline = json.load(fh)['results']
+        failures = []
+        self.stdout.write(f'\nCompared with {path}:')
+        for name, result in results.items():
+            before = baseline.get(name)
+            if not before:
+                continue
+            ratio = result['p95_ms'] / before['p95_ms'] if before['p95_ms'] else 1.0
+            self.stdout.write(
+                f'  {name:<22} p95 {before["p95_ms"]:>8.2f} -> {result["p95_ms"]:>8.2f} ms ({ratio:.2f}x), '
+                f'queries {before["queries"]} -> {result["queries"]}'
+            )
+            if ratio > max_regression:
+                failures.append(f'{name}: p95 regressed {ratio:.2f}x against {path}')
+            if result['queries'] > before['queries']:
+                failures.append(f'{name}: query count grew {before["queries"]} -> {result["queries"]}')
+        return failures
@@ -0,0 +1,65 @@
+import signal
+import time
+
+from django.core.management.base import BaseCommand
+
+from core.outbox import backlog, drain, requeue_failed
+
+
+class Command(BaseCommand):
+    help = 'Run outbox consumers (buyer stats, sales rollups, notices, mail) for committed events'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=100)
+        parser.add_argument('--interval', type=float, default=1.0, help='Seconds to sleep when the queue is empty')
+        parser.add_argument('--once', action='store_true', help='Drain what is due, then exit')
+        parser.add_argument('--stats-every', type=float, default=60.0,
+                            help='Seconds between backlog reports while running')
+        parser.add_argument('--requeue-failed', action='store_true',
+                            help='Give parked (failed) events a fresh set of attempts first')
+
+    def handle(self, *args, **options):
+        if options['requeue_failed']:
+            self.stdout.write(f'Requeued {requeue_failed()} failed events')
+
+        # finish the current batch on Ctrl-C / SIGTERM instead of abandoning it
+        stopping = []
+        previous = {
+            signum: signal.signal(signum, lambda *_: stopping.append(True))
+            for signum in (signal.SIGINT, signal.SIGTERM)
+        }
+        try:
+            self.work(options, stopping)
+        finally:
+            for signum, handler in previous.items():
+                signal.signal(signum, handler)
+
+    def work(self, options, stopping):
+        batch_size = options['batch_size']
+        totals = {'processed': 0, 'retried': 0, 'failed': 0}
+        started = last_report = time.monotonic()
+        while not stopping:
+            result = drain(batch_size)
+            for key in totals:
+                totals[key] += getattr(result, key)
+            if result.fetched:
+                self.stdout.write(
+                    f'{result.processed} done, {result.retried} to retry, {result.failed} failed; '
+                    f'max lag {result.max_lag:.2f}s'
+                )
+            now = time.monotonic()
+            if now - last_report >= options['stats_every']:
+                pending, lag = backlog()
+                self.stdout.write(f'Backlog: {pending} events, oldest {lag:.1f}s')
+                last_report = now
+            if result.fetched < batch_size:
+                if options['once']:
+                    break
+                time.sleep(options['interval'])
+
+        elapsed = time.monotonic() - started
+        pending, lag = backlog()
+        self.stdout.write(
+            f'Handled {totals["processed"]} events ({totals["retried"]} retried, {totals["failed"]} failed) '
+            f'in {elapsed:.2f}s; {pending} pending, oldest {lag:.1f}s'
+        )
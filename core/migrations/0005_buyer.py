@@ -0,0 +1,33 @@
+# Generated by Django 6.0.2 on 2026-10-17 02:07
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0004_stockhold_holdshard'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Buyer',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('email', models.EmailField(max_length=254, unique=True)),
+                ('name', models.CharField(max_length=255)),
+                ('phone', models.CharField(blank=True, max_length=20)),
+                ('order_count', models.PositiveIntegerField(default=0)),
+                ('lifetime_value', models.DecimalField(decimal_places=2, default=0, max_digits=14)),
+                ('last_order_at', models.DateTimeField()),
+            ],
+        ),
+        migrations.AddIndex(
+            model_name='order',
+            index=models.Index(fields=['buyer_email', '-created_at'], name='order_buyer_recent_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='buyer',
+            index=models.Index(fields=['-last_order_at', '-id'], name='buyer_recent_idx'),
+        ),
+    ]
@@ -0,0 +1,51 @@
+# Generated by Django 6.0.2 on 2026-10-17 02:10
+
+from django.db import migrations
+
+SQLITE_FORWARD = [
+    "CREATE VIRTUAL TABLE IF NOT EXISTS core_product_search USING fts5("
+    "name, description, supplier, tokenize='unicode61 remove_diacritics 2', prefix='2 3')",
+    "INSERT INTO core_product_search (rowid, name, description, supplier) "
+    "SELECT p.id, p.name, p.description, s.name "
+    "FROM core_product p INNER JOIN core_supplier s ON s.id = p.supplier_id",
+]
+
+POSTGRES_FORWARD = [
+    "CREATE EXTENSION IF NOT EXISTS pg_trgm",
+    "CREATE TABLE IF NOT EXISTS core_product_search ("
+    "product_id bigint PRIMARY KEY REFERENCES core_product (id) ON DELETE CASCADE DEFERRABLE INITIALLY DEFERRED, "
+    "document tsvector NOT NULL, "
+    "body text NOT NULL)",
+    "CREATE INDEX IF NOT EXISTS core_product_search_document_idx ON core_product_search USING gin (document)",
+    "CREATE INDEX IF NOT EXISTS core_product_search_body_trgm_idx ON core_product_search USING gin (body gin_trgm_ops)",
+    "INSERT INTO core_product_search (product_id, document, body) "
+    "SELECT p.id, "
+    "setweight(to_tsvector('simple', p.name), 'A') || "
+    "setweight(to_tsvector('simple', s.name), 'B') || "
+    "setweight(to_tsvector('simple', coalesce(p.description, '')), 'C'), "
+    "lower(p.name || ' ' || s.name) "
+    "FROM core_product p INNER JOIN core_supplier s ON s.id = p.supplier_id "
+    "ON CONFLICT (product_id) DO NOTHING",
+]
+
+
+def create_search_index(apps, schema_editor):
+    statements = {'sqlite': SQLITE_FORWARD, 'postgresql': POSTGRES_FORWARD}
+    for statement in statements.get(schema_editor.connection.vendor, []):
+        schema_editor.execute(statement)
+
+
+def drop_search_index(apps, schema_editor):
+    if schema_editor.connection.vendor in ('sqlite', 'postgresql'):
+        schema_editor.execute('DROP TABLE IF EXISTS core_product_search')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0005_buyer'),
+    ]
+
+    operations = [
+        migrations.RunPython(create_search_index, drop_search_index),
+    ]
@@ -0,0 +1,51 @@
+# Generated by Django 6.0.2 on 2026-10-17 02:10
+
+from django.db import migrations, models
+from django.db.models import Count
+
+
+def merge_duplicate_suppliers(apps, schema_editor):
+    """Fold suppliers that share a name into the oldest one, so the name can be unique."""
+    Supplier = apps.get_model('core', 'Supplier')
+    Product = apps.get_model('core', 'Product')
+    names = (
+        Supplier.objects.values('name').annotate(copies=Count('id')).filter(copies__gt=1).values_list('name', flat=True)
+    )
+    for name in list(names):
+        keep, *duplicates = Supplier.objects.filter(name=name).order_by('id')
+        duplicate_ids = [supplier.id for supplier in duplicates]
+        Product.objects.filter(supplier_id__in=duplicate_ids).update(supplier=keep)
+        if not keep.contact_email:
+            keep.contact_email = next((s.contact_email for s in duplicates if s.contact_email), None)
+            keep.save(update_fields=['contact_email'])
+        Supplier.objects.filter(id__in=duplicate_ids).delete()
+    if schema_editor.connection.vendor == 'postgresql':
+        # run the deferred foreign key checks of the moved products now; while
+        # they are pending PostgreSQL refuses the ALTER TABLE below
+        schema_editor.execute('SET CONSTRAINTS ALL IMMEDIATE')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0006_product_search_index'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='product',
+            name='content_hash',
+            field=models.CharField(blank=True, default='', max_length=32),
+        ),
+        migrations.AddField(
+            model_name='product',
+            name='sku',
+            field=models.CharField(blank=True, max_length=64, null=True, unique=True),
+        ),
+        migrations.RunPython(merge_duplicate_suppliers, migrations.RunPython.noop),
+        migrations.AlterField(
+            model_name='supplier',
+            name='name',
+            field=models.CharField(max_length=255, unique=True),
+        ),
+    ]
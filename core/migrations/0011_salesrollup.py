@@ -0,0 +1,31 @@
+# Generated by Django 6.0.2 on 2026-10-17 11:00
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0010_order_admin_indexes'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='SalesRollup',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('granularity', models.CharField(choices=[('hour', 'Hour'), ('day', 'Day')], max_length=4)),
+                ('bucket', models.DateTimeField()),
+                ('units', models.PositiveBigIntegerField(default=0)),
+                ('revenue', models.DecimalField(decimal_places=2, default=0, max_digits=14)),
+                ('order_lines', models.PositiveIntegerField(default=0)),
+                ('product', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to='core.product')),
+                ('supplier', models.ForeignKey(db_index=False, on_delete=django.db.models.deletion.CASCADE, related_name='+', to='core.supplier')),
+            ],
+            options={
+                'indexes': [models.Index(fields=['supplier', 'granularity', 'bucket'], name='rollup_supplier_bucket_idx')],
+                'constraints': [models.UniqueConstraint(fields=('granularity', 'bucket', 'product'), name='unique_sales_rollup')],
+            },
+        ),
+    ]
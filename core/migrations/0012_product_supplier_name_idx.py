@@ -0,0 +1,23 @@
+# Generated by Django 6.0.2 on 2026-10-17 15:00
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0011_salesrollup'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='product',
+            index=models.Index(fields=['supplier', 'name', 'id'], name='product_supplier_name_idx'),
+        ),
+        migrations.AlterField(
+            model_name='product',
+            name='supplier',
+            field=models.ForeignKey(db_index=False, on_delete=django.db.models.deletion.CASCADE, related_name='products', to='core.supplier'),
+        ),
+    ]
@@ -0,0 +1,39 @@
+# Generated by Django 6.0.2 on 2026-10-17 05:00
+
+import django.db.models.deletion
+import django.utils.timezone
+from django.db import migrations, models
+
+# Existing stock becomes each product's opening balance, so the ledger sums
+# to Product.stock from the start.
+OPENING_BALANCES = (
+    "INSERT INTO core_stockmovement (product_id, kind, quantity, reference, created_at) "
+    "SELECT id, 'adjustment', stock, 'opening balance', CURRENT_TIMESTAMP "
+    "FROM core_product WHERE stock <> 0"
+)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0013_outboxevent'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='StockMovement',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('kind', models.CharField(choices=[('sale', 'Sale'), ('restock', 'Restock'), ('adjustment', 'Adjustment'), ('return', 'Return')], max_length=10)),
+                ('quantity', models.IntegerField()),
+                ('reference', models.CharField(blank=True, default='', max_length=100)),
+                ('created_at', models.DateTimeField(default=django.utils.timezone.now)),
+                ('order', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='+', to='core.order')),
+                ('product', models.ForeignKey(db_index=False, on_delete=django.db.models.deletion.CASCADE, related_name='movements', to='core.product')),
+            ],
+            options={
+                'indexes': [models.Index(fields=['product', 'id'], name='movement_product_idx'), models.Index(fields=['created_at'], name='movement_created_idx')],
+            },
+        ),
+        migrations.RunSQL(OPENING_BALANCES, migrations.RunSQL.noop),
+    ]
@@ -1,11 +1,19 @@
+from django.conf import settings
 from django.db import models
 from django.utils import timezone
 
 # Basic wholeseller models
 
 class Supplier(models.Model):
-    name = models.CharField(max_length=255)
+    name = models.CharField(max_length=255, unique=True)
     contact_email = models.EmailField(blank=True, null=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        indexes = [
+            # the API's changed_since feed walks (updated_at, id)
+            models.Index(fields=['updated_at', 'id'], name='supplier_updated_id_idx'),
+        ]
 
     def __str__(self):
         return self.name
@@ -15,12 +23,41 @@ class Product(models.Model):
     name = models.CharField(max_length=255)
     description = models.TextField(blank=True)
     price = models.DecimalField(max_digits=10, decimal_places=2)
-    supplier = models.ForeignKey(Supplier, on_delete=models.CASCADE, related_name='products')
+    # indexed by product_supplier_name_idx, which leads with supplier_id
+    supplier = models.ForeignKey(Supplier, on_delete=models.CASCADE, related_name='products', db_index=False)
     stock = models.IntegerField(default=0)
+    # natural key and change fingerprint used by the import_catalog command
+    sku = models.CharField(max_length=64, unique=True, null=True, blank=True)
+    content_hash = models.CharField(max_length=32, blank=True, default='')
+    # bumped by every write, including bulk ones (checkout, import_catalog)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        indexes = [
+            # keyset pagination of the catalog walks (name, id)
+            models.Index(fields=['name', 'id'], name='product_name_id_idx'),
+            # supplier catalog pages and directory summaries
+            models.Index(fields=['supplier', 'name', 'id'], name='product_supplier_name_idx'),
+            # the API's changed_since feed walks (updated_at, id)
+            models.Index(fields=['updated_at', 'id'], name='product_updated_id_idx'),
+        ]
 
     def __str__(self):
         return self.name
 
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        product = super().from_db(db, field_names, values)
+        # the stock as read, so core.signals can record a hand edit as the
+        # difference without reading the row again
+        product._loaded_stock = product.__dict__.get('stock')
+        return product
+
+    def refresh_from_db(self, using=None, fields=None, from_queryset=None):
+        super().refresh_from_db(using=using, fields=fields, from_queryset=from_queryset)
+        if fields is None or 'stock' in fields:
+            self._loaded_stock = self.__dict__.get('stock')
+
 
 class Order(models.Model):
     STATUS_CHOICES = [
@@ -37,6 +74,14 @@ class Order(models.Model):
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
 
+    class Meta:
+        indexes = [
+            models.Index(fields=['buyer_email', '-created_at'], name='order_buyer_recent_idx'),
+            # admin date hierarchy / date filters and the status filter
+            models.Index(fields=['created_at'], name='order_created_idx'),
+            models.Index(fields=['status', '-id'], name='order_status_recent_idx'),
+        ]
+
     def __str__(self):
         return f"Order #{self.id} - {self.buyer_name}"
     
@@ -60,3 +105,183 @@ class OrderItem(models.Model):
     def get_subtotal(self):
         """Calculate subtotal for this item"""
         return self.price * self.quantity
+
+
+class Buyer(models.Model):
+    """One row per buyer email, summarising their orders.
+
+    Maintained by checkout (see core.buyers) and rebuilt from Order with the
+    backfill_buyers command.
+    """
+    email = models.EmailField(unique=True)
+    name = models.CharField(max_length=255)
+    phone = models.CharField(max_length=20, blank=True)
+    order_count = models.PositiveIntegerField(default=0)
+    lifetime_value = models.DecimalField(max_digits=14, decimal_places=2, default=0)
+    last_order_at = models.DateTimeField()
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['-last_order_at', '-id'], name='buyer_recent_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.name} <{self.email}>"
+
+
+class StockHold(models.Model):
+    """A time-limited hold on stock placed by a user's cart."""
+    product = models.ForeignKey(Product, on_delete=models.CASCADE, related_name='holds')
+    user = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE, related_name='stock_holds')
+    quantity = models.PositiveIntegerField()
+    shard = models.PositiveSmallIntegerField()
+    expires_at = models.DateTimeField(db_index=True)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['user', 'product'], name='unique_stock_hold_per_user'),
+        ]
+
+    def __str__(self):
+        return f"{self.product_id} x {self.quantity} held by {self.user_id}"
+
+
+class HoldShard(models.Model):
+    """Running total of held quantity for one product, split over several rows.
+
+    Each user always lands on the same shard, so concurrent carts spread their
+    counter updates over ``STOCK_HOLD_SHARDS`` rows instead of one hot row.
+    """
+    product = models.ForeignKey(Product, on_delete=models.CASCADE, related_name='hold_shards')
+    shard = models.PositiveSmallIntegerField()
+    reserved = models.IntegerField(default=0)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['product', 'shard'], name='unique_hold_shard'),
+        ]
+
+    def __str__(self):
+        return f"{self.product_id}#{self.shard}: {self.reserved}"
+
+
+class Cart(models.Model):
+    """A user's shopping cart; its lines are CartItem rows (see core.cart_store)."""
+    user = models.OneToOneField(settings.AUTH_USER_MODEL, on_delete=models.CASCADE, related_name='cart')
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    def __str__(self):
+        return f"Cart of {self.user_id}"
+
+
+class CartItem(models.Model):
+    cart = models.ForeignKey(Cart, on_delete=models.CASCADE, related_name='items')
+    product = models.ForeignKey(Product, on_delete=models.CASCADE, related_name='+')
+    quantity = models.PositiveIntegerField()
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['cart', 'product'], name='unique_cart_line'),
+        ]
+
+    def __str__(self):
+        return f"{self.product_id} x {self.quantity}"
+
+
+class Tombstone(models.Model):
+    """Records a deleted catalog row so the API's changed_since feed can report it."""
+    kind = models.CharField(max_length=20)
+    object_id = models.BigIntegerField()
+    deleted_at = models.DateTimeField(default=timezone.now)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['kind', 'deleted_at'], name='tombstone_kind_deleted_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.kind} {self.object_id} deleted {self.deleted_at:%Y-%m-%d %H:%M}"
+
+
+class SalesRollup(models.Model):
+    """Units and revenue for one product in one hour or day (see core.rollups)."""
+    HOUR = 'hour'
+    DAY = 'day'
+    GRANULARITY_CHOICES = [(HOUR, 'Hour'), (DAY, 'Day')]
+
+    granularity = models.CharField(max_length=4, choices=GRANULARITY_CHOICES)
+    bucket = models.DateTimeField()
+    product = models.ForeignKey(Product, on_delete=models.CASCADE, related_name='+')
+    # covered by rollup_supplier_bucket_idx
+    supplier = models.ForeignKey(Supplier, on_delete=models.CASCADE, related_name='+', db_index=False)
+    units = models.PositiveBigIntegerField(default=0)
+    revenue = models.DecimalField(max_digits=14, decimal_places=2, default=0)
+    order_lines = models.PositiveIntegerField(default=0)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['granularity', 'bucket', 'product'], name='unique_sales_rollup'),
+        ]
+        indexes = [
+            models.Index(fields=['supplier', 'granularity', 'bucket'], name='rollup_supplier_bucket_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.product_id} {self.granularity} {self.bucket:%Y-%m-%d %H:%M}: {self.units}"
+
+
+class OutboxEvent(models.Model):
+    """A side effect to run after a transaction commits (see core.outbox)."""
+    topic = models.CharField(max_length=64)
+    payload = models.JSONField(default=dict)
+    created_at = models.DateTimeField(default=timezone.now)
+    # not picked up before this time; pushed back after each failed attempt
+    available_at = models.DateTimeField(default=timezone.now)
+    attempts = models.PositiveIntegerField(default=0)
+    last_error = models.TextField(blank=True, default='')
+    # set once attempts run out; the row is kept for inspection and requeue
+    failed_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        indexes = [
+            models.Index(
+                fields=['available_at', 'id'], name='outbox_pending_idx',
+                condition=models.Q(failed_at__isnull=True),
+            ),
+        ]
+
+    def __str__(self):
+        return f"{self.topic} #{self.id} ({self.attempts} attempts)"
+
+
+class StockMovement(models.Model):
+    """One change to a product's stock; append-only (see core.inventory).
+
+    ``quantity`` is signed: sales are negative, restocks and returns
+    positive. Summed per product, the ledger equals ``Product.stock``.
+    """
+    SALE = 'sale'
+    RESTOCK = 'restock'
+    ADJUSTMENT = 'adjustment'
+    RETURN = 'return'
+    KIND_CHOICES = [(SALE, 'Sale'), (RESTOCK, 'Restock'), (ADJUSTMENT, 'Adjustment'), (RETURN, 'Return')]
+
+    # covered by movement_product_idx
+    product = models.ForeignKey(Product, on_delete=models.CASCADE, related_name='movements', db_index=False)
+    kind = models.CharField(max_length=10, choices=KIND_CHOICES)
+    quantity = models.IntegerField()
+    # the order behind a sale
+    order = models.ForeignKey(Order, on_delete=models.SET_NULL, null=True, blank=True, related_name='+')
+    # shipment or document number, or why stock was adjusted
+    reference = models.CharField(max_length=100, blank=True, default='')
+    created_at = models.DateTimeField(default=timezone.now)
+
+    class Meta:
+        indexes = [
+            # a product's history, and the per-product sums of reconcile_stock
+            models.Index(fields=['product', 'id'], name='movement_product_idx'),
+            models.Index(fields=['created_at'], name='movement_created_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.kind} {self.quantity:+d} of {self.product_id}"
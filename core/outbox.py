@@ -0,0 +1,147 @@
+import logging
+import random
+import traceback
+from collections import defaultdict
+from dataclasses import dataclass, field
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Count, Min
+from django.utils import timezone
+
+from .models import OutboxEvent
+
+logger = logging.getLogger(__name__)
+
+# Transactional outbox for work that follows a committed write.
+#
+# The writer calls publish() inside its own transaction, so the event row
+# commits or rolls back together with the data it describes and checkout
+# does one INSERT however many consumers there are. The run_worker command
+# drains pending rows in batches: it locks them with SELECT ... FOR UPDATE
+# SKIP LOCKED (so several workers split the queue instead of waiting on each
+# other), runs every consumer of the topic in a savepoint, and deletes the
+# row in the same transaction. A failing event is rolled back as a whole and
+# retried with backoff; after OUTBOX_MAX_ATTEMPTS it is parked with
+# failed_at set. Database side effects therefore apply exactly once; anything
+# external (email) should be sent from transaction.on_commit in the consumer.
+
+ORDER_PLACED = 'order.placed'
+
+CONSUMERS = defaultdict(list)
+
+
+def consumer(topic):
+    """Register the decorated function(event) to run for each ``topic`` event."""
+    def register(func):
+        CONSUMERS[topic].append(func)
+        return func
+    return register
+
+
+def publish(topic, payload):
+    return OutboxEvent.objects.create(topic=topic, payload=payload)
+
+
+@dataclass
+class DrainResult:
+    processed: int = 0
+    retried: int = 0
+    failed: int = 0
+    # seconds between publishing and handling, for the handled events
+    lags: list = field(default_factory=list)
+
+    @property
+    def fetched(self):
+        return self.processed + self.retried + self.failed
+
+    @property
+    def max_lag(self):
+        return max(self.lags, default=0.0)
+
+
+def _retry_delay(attempts):
+    base = getattr(settings, 'OUTBOX_RETRY_BASE_DELAY', 1.0)
+    cap = getattr(settings, 'OUTBOX_RETRY_MAX_DELAY', 300.0)
+    return random.uniform(0.5, 1.0) * min(cap, base * (2 ** (attempts - 1)))
+
+
+def dispatch(event):
+    handlers = CONSUMERS.get(event.topic)
+    if not handlers:
+        raise LookupError(f'No consumer for outbox topic {event.topic!r}')
+    for handler in handlers:
+        handler(event)
+
+
+def drain(batch_size=100):
+    """Handle one batch of due events; returns a DrainResult."""
+    result = DrainResult()
+    max_attempts = getattr(settings, 'OUTBOX_MAX_ATTEMPTS', 8)
+    with transaction.atomic():
+        now = timezone.now()
+        events = list(
+            OutboxEvent.objects.select_for_update(skip_locked=True)
+            .filter(failed_at__isnull=True, available_at__lte=now)
+            .order_by('available_at', 'id')[:batch_size]
+        )
+        done, changed = [], []
+        for event in events:
+            try:
+                with transaction.atomic():
+                    dispatch(event)
+            except Exception as exc:
+                event.attempts += 1
+                event.last_error = ''.join(traceback.format_exception_only(exc)).strip()[:2000]
+                if event.attempts >= max_attempts:
+                    event.failed_at = now
+                    result.failed += 1
+                    logger.error('outbox event %s (%s) failed for good: %s', event.id, event.topic, event.last_error)
+                else:
+                    event.available_at = now + timedelta(seconds=_retry_delay(event.attempts))
+                    result.retried += 1
+                    logger.warning(
+                        'outbox event %s (%s) failed on attempt %s: %s',
+                        event.id, event.topic, event.attempts, event.last_error,
+                    )
+                changed.append(event)
+                continue
+            done.append(event.id)
+            result.processed += 1
+            result.lags.append((timezone.now() - event.created_at).total_seconds())
+        if done:
+            OutboxEvent.objects.filter(id__in=done).delete()
+        if changed:
+            OutboxEvent.objects.bulk_update(changed, ['attempts', 'last_error', 'available_at', 'failed_at'])
+    return result
+
+
+def drain_all(batch_size=100):
+    """Drain until nothing is due (tests, and the tail of a deploy)."""
+    total = DrainResult()
+    while True:
+        result = drain(batch_size)
+        total.processed += result.processed
+        total.retried += result.retried
+        total.failed += result.failed
+        total.lags += result.lags
+        if result.fetched < batch_size:
+            return total
+
+
+def backlog():
+    """(pending events, seconds since the oldest one was published)."""
+    stats = OutboxEvent.objects.filter(failed_at__isnull=True).aggregate(
+        oldest=Min('created_at'), pending=Count('id'),
+    )
+    lag = (timezone.now() - stats['oldest']).total_seconds() if stats['oldest'] else 0.0
+    return stats['pending'], lag
+
+
+def requeue_failed():
+    """Give parked events a fresh set of attempts."""
+    return OutboxEvent.objects.filter(failed_at__isnull=False).update(
+        failed_at=None, attempts=0, available_at=timezone.now(),
+    )
+
@@ -0,0 +1,149 @@
+import base64
+import json
+from dataclasses import dataclass, field
+from typing import Any, Optional
+
+from django.conf import settings
+from django.core.paginator import Paginator
+from django.db import connections
+from django.db.models import Q
+from django.utils.functional import cached_property
+
+# Keyset (cursor) pagination helpers shared by the list views.
+#
+# Instead of OFFSET, each page remembers the sort key of its last row and the
+# next page asks for rows strictly after it. With an index on the sort columns
+# every page costs the same no matter how deep the reader scrolls.
+
+
+@dataclass
+class KeysetPage:
+    items: list
+    next_cursor: Optional[str] = None
+    has_next: bool = False
+    ordering: tuple = field(default=())
+
+
+def encode_cursor(values):
+    """Encode the sort key of a row into an opaque, URL-safe cursor."""
+    raw = json.dumps(list(values), default=str, separators=(',', ':')).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip('=')
+
+
+def decode_cursor(token, size):
+    """Decode a cursor produced by encode_cursor, or return None if invalid."""
+    if not token:
+        return None
+    try:
+        padded = token + '=' * (-len(token) % 4)
+        values = json.loads(base64.urlsafe_b64decode(padded.encode()))
+    except (ValueError, TypeError):
+        return None
+    if not isinstance(values, list) or len(values) != size:
+        return None
+    return values
+
+
+def _after_filter(ordering, values):
+    """Build the lexicographic "row comes after values" filter for ordering."""
+    condition = Q()
+    for index, column in enumerate(ordering):
+        descending = column.startswith('-')
+        name = column.lstrip('-')
+        lookup = f'{name}__lt' if descending else f'{name}__gt'
+        clause = Q(**{lookup: values[index]})
+        for prev_column, prev_value in zip(ordering[:index], values[:index]):
+            clause &= Q(**{prev_column.lstrip('-'): prev_value})
+        condition |= clause
+    return condition
+
+
+def _row_key(obj, ordering):
+    key = []
+    for column in ordering:
+        value = obj
+        for part in column.lstrip('-').split('__'):
+            value = value[part] if isinstance(value, dict) else getattr(value, part)
+        key.append(value)
+    return key
+
+
+def _keyset_queryset(queryset, ordering, cursor, page_size):
+    values = decode_cursor(cursor, len(ordering))
+    queryset = queryset.order_by(*ordering)
+    if values is not None:
+        queryset = queryset.filter(_after_filter(ordering, values))
+    return queryset[:page_size + 1]
+
+
+def _keyset_page(rows, ordering, page_size):
+    has_next = len(rows) > page_size
+    rows = rows[:page_size]
+    next_cursor = encode_cursor(_row_key(rows[-1], ordering)) if has_next else None
+    return KeysetPage(items=rows, next_cursor=next_cursor, has_next=has_next, ordering=ordering)
+
+
+def keyset_paginate(queryset, ordering, cursor=None, page_size=24):
+    """Return one KeysetPage of queryset ordered by the given columns.
+
+    The last column in ``ordering`` must be unique (normally ``id``) so that
+    the cursor identifies exactly one position. Invalid cursors restart from
+    the first page.
+    """
+    ordering = tuple(ordering)
+    rows: list[Any] = list(_keyset_queryset(queryset, ordering, cursor, page_size))
+    return _keyset_page(rows, ordering, page_size)
+
+
+async def akeyset_paginate(queryset, ordering, cursor=None, page_size=24):
+    """Async keyset_paginate, using the async ORM."""
+    ordering = tuple(ordering)
+    rows: list[Any] = [row async for row in _keyset_queryset(queryset, ordering, cursor, page_size)]
+    return _keyset_page(rows, ordering, page_size)
+
+
+def estimated_count(queryset):
+    """Row estimate from the planner's statistics, or None where unsupported.
+
+    PostgreSQL only: pg_class.reltuples for a whole table, the planner's
+    row estimate (EXPLAIN) for a filtered queryset.
+    """
+    connection = connections[queryset.db]
+    if connection.vendor != 'postgresql':
+        return None
+    with connection.cursor() as cursor:
+        if not queryset.query.where:
+            cursor.execute(
+                'SELECT reltuples::bigint FROM pg_class WHERE oid = %s::regclass',
+                [queryset.model._meta.db_table],
+            )
+            row = cursor.fetchone()
+            if row and row[0] >= 0:  # -1 until the table is first analyzed
+                return row[0]
+        sql, params = queryset.query.sql_with_params()
+        cursor.execute(f'EXPLAIN (FORMAT JSON) {sql}', params)
+        plan = cursor.fetchone()[0]
+        if isinstance(plan, str):
+            plan = json.loads(plan)
+        return int(plan[0]['Plan']['Plan Rows'])
+
+
+class EstimatedCountPaginator(Paginator):
+    """Paginator that stops counting past ESTIMATED_COUNT_THRESHOLD rows.
+
+    Up to the threshold the count is exact (a COUNT over a LIMITed subquery,
+    so it never scans further). Beyond it the planner's estimate is used,
+    which keeps changelists of tables with millions of rows from spending
+    seconds in COUNT(*).
+    """
+
+    @cached_property
+    def count(self):
+        threshold = getattr(settings, 'ESTIMATED_COUNT_THRESHOLD', 10000)
+        counted = self.object_list[:threshold + 1].count()
+        if counted <= threshold:
+            return counted
+        estimate = estimated_count(self.object_list)
+        if estimate is None:
+            return self.object_list.count()
+        return max(estimate, counted)
@@ -0,0 +1,307 @@
+import json
+import logging
+import random
+import time
+from collections import Counter
+from contextlib import ExitStack
+from contextvars import ContextVar
+from dataclasses import dataclass, field
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction, sync_to_async
+from django.conf import settings
+from django.core.cache import cache
+from django.db import connections
+from django.template.backends.django import DjangoTemplates, Template
+
+from . import template_profile
+from .dbpool import pool_summary
+
+logger = logging.getLogger(__name__)
+
+# Per-request performance accounting.
+#
+# PerformanceMiddleware samples a fraction of requests (PERF_SAMPLE_RATE) and,
+# for those, records wall time, every SQL statement (via execute_wrapper),
+# time spent rendering templates (via InstrumentedDjangoTemplates) and the
+# cost of session reads/writes (queries against django_session); with
+# TEMPLATE_PROFILING also the self time of each template and tag. Each sampled
+# request is logged as one JSON line, summarised in a Server-Timing header,
+# and folded into per-view latency histograms kept in the cache (see the
+# perf_report command).
+#
+# The histograms are plain incr() counters. Views are listed in a registry
+# that is only ever appended to: the first request of a view wins a
+# cache.add() on perf:registered:<view> and writes the name into the next
+# perf:registry:<n> slot, so concurrent workers never overwrite each other.
+
+_current = ContextVar('perf_request_stats', default=None)
+
+HISTOGRAM_BUCKETS_MS = (5, 10, 25, 50, 100, 250, 500, 1000, 2500, 5000)
+STATS_TIMEOUT = 7 * 24 * 3600
+
+
+@dataclass
+class RequestStats:
+    started: float = field(default_factory=time.perf_counter)
+    view: str = ''
+    queries: int = 0
+    query_ms: float = 0.0
+    session_queries: int = 0
+    session_ms: float = 0.0
+    template_ms: float = 0.0
+    templates: list = field(default_factory=list)
+    template_profile: object = None
+    statements: Counter = field(default_factory=Counter)
+
+    def duplicates(self, threshold=None):
+        threshold = threshold or getattr(settings, 'PERF_DUPLICATE_THRESHOLD', 3)
+        return {sql: count for sql, count in self.statements.most_common() if count >= threshold}
+
+
+def current_stats():
+    return _current.get()
+
+
+def query_wrapper(execute, sql, params, many, context):
+    stats = _current.get()
+    if stats is None:
+        return execute(sql, params, many, context)
+    started = time.perf_counter()
+    try:
+        return execute(sql, params, many, context)
+    finally:
+        elapsed = (time.perf_counter() - started) * 1000
+        stats.queries += 1
+        stats.query_ms += elapsed
+        # the SQL still has its placeholders, so repeats of one statement with
+        # different parameters (the N+1 pattern) collapse onto one key
+        stats.statements[sql] += 1
+        if 'django_session' in sql:
+            stats.session_queries += 1
+            stats.session_ms += elapsed
+
+
+class TimedTemplate(Template):
+    def render(self, context=None, request=None):
+        stats = _current.get()
+        if stats is None:
+            return super().render(context, request)
+        started = time.perf_counter()
+        try:
+            return super().render(context, request)
+        finally:
+            elapsed = (time.perf_counter() - started) * 1000
+            stats.template_ms += elapsed
+            stats.templates.append((self.origin.template_name, round(elapsed, 2)))
+
+
+class InstrumentedDjangoTemplates(DjangoTemplates):
+    """The standard Django template backend, with render time accounting."""
+
+    def from_string(self, template_code):
+        return TimedTemplate(self.engine.from_string(template_code), self)
+
+    def get_template(self, template_name):
+        template = super().get_template(template_name)
+        return TimedTemplate(template.template, self)
+
+
+def _incr(key, delta=1):
+    try:
+        return cache.incr(key, delta)
+    except ValueError:
+        if cache.add(key, delta, timeout=STATS_TIMEOUT):
+            return delta
+        return cache.incr(key, delta)
+
+
+def _bucket(ms):
+    for bound in HISTOGRAM_BUCKETS_MS:
+        if ms <= bound:
+            return str(bound)
+    return 'inf'
+
+
+def _register(view):
+    if cache.add(f'perf:registered:{view}', 1, timeout=STATS_TIMEOUT):
+        slot = _incr('perf:registry:size')
+        cache.set(f'perf:registry:{slot}', view, timeout=STATS_TIMEOUT)
+
+
+def registered_views():
+    """Names of the views with histograms, in registration order."""
+    size = cache.get('perf:registry:size') or 0
+    slots = cache.get_many([f'perf:registry:{slot}' for slot in range(1, size + 1)])
+    # a view whose marker expired registers again under a new slot
+    return list(dict.fromkeys(slots.values()))
+
+
+def record_histogram(view, total_ms, queries):
+    _register(view)
+    _incr(f'perf:{view}:count')
+    _incr(f'perf:{view}:total_ms', int(round(total_ms)))
+    _incr(f'perf:{view}:queries', queries)
+    _incr(f'perf:{view}:bucket:{_bucket(total_ms)}')
+
+
+def histogram_report():
+    """Return {view: summary} from the cached histograms."""
+    report = {}
+    for view in sorted(registered_views()):
+        bucket_names = [str(bound) for bound in HISTOGRAM_BUCKETS_MS] + ['inf']
+        keys = [f'perf:{view}:{name}' for name in ('count', 'total_ms', 'queries')]
+        keys += [f'perf:{view}:bucket:{name}' for name in bucket_names]
+        values = cache.get_many(keys)
+        count = values.get(keys[0], 0)
+        if not count:
+            continue
+        buckets = {name: values.get(f'perf:{view}:bucket:{name}', 0) for name in bucket_names}
+        report[view] = {
+            'count': count,
+            'mean_ms': values.get(keys[1], 0) / count,
+            'mean_queries': values.get(keys[2], 0) / count,
+            'p50_ms': _histogram_percentile(buckets, count, 0.50),
+            'p95_ms': _histogram_percentile(buckets, count, 0.95),
+            'buckets': buckets,
+        }
+    return report
+
+
+def _histogram_percentile(buckets, count, fraction):
+    """Upper bound of the bucket that holds the given percentile."""
+    target = fraction * count
+    seen = 0
+    for name, hits in buckets.items():
+        seen += hits
+        if seen >= target:
+            return name
+    return 'inf'
+
+
+def reset_histograms():
+    views = registered_views()
+    size = cache.get('perf:registry:size') or 0
+    bucket_names = [str(bound) for bound in HISTOGRAM_BUCKETS_MS] + ['inf']
+    keys = ['perf:registry:size'] + [f'perf:registry:{slot}' for slot in range(1, size + 1)]
+    for view in views:
+        keys.append(f'perf:registered:{view}')
+        keys += [f'perf:{view}:{name}' for name in ('count', 'total_ms', 'queries')]
+        keys += [f'perf:{view}:bucket:{name}' for name in bucket_names]
+    cache.delete_many(keys)
+
+
+def _server_timing(stats, total_ms):
+    return ', '.join([
+        f'total;dur={total_ms:.2f}',
+        f'db;dur={stats.query_ms:.2f};desc="{stats.queries} queries"',
+        f'tpl;dur={stats.template_ms:.2f}',
+        f'session;dur={stats.session_ms:.2f};desc="{stats.session_queries} queries"',
+    ])
+
+
+def _push_query_wrappers():
+    for connection in connections.all():
+        connection.execute_wrappers.append(query_wrapper)
+
+
+def _pop_query_wrappers():
+    for connection in connections.all():
+        if query_wrapper in connection.execute_wrappers:
+            connection.execute_wrappers.remove(query_wrapper)
+
+
+class PerformanceMiddleware:
+    """Sampled per-request timing, query accounting and Server-Timing header.
+
+    Install it near the top of MIDDLEWARE, above SessionMiddleware, so that
+    session loads and saves are included in the numbers. Works under WSGI
+    and ASGI; under ASGI only sampled requests pay the two thread hops
+    needed to reach the request's database connections.
+    """
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.async_mode = iscoroutinefunction(get_response)
+        if self.async_mode:
+            markcoroutinefunction(self)
+
+    def _sampled(self):
+        rate = getattr(settings, 'PERF_SAMPLE_RATE', 0.0)
+        return rate > 0 and (rate >= 1 or random.random() < rate)
+
+    def __call__(self, request):
+        if self.async_mode:
+            return self.__acall__(request)
+        if not self._sampled():
+            return self.get_response(request)
+
+        stats = RequestStats()
+        token = _current.set(stats)
+        try:
+            with ExitStack() as stack:
+                for connection in connections.all():
+                    stack.enter_context(connection.execute_wrapper(query_wrapper))
+                if getattr(settings, 'TEMPLATE_PROFILING', False):
+                    stats.template_profile = stack.enter_context(template_profile.profile())
+                response = self.get_response(request)
+        finally:
+            _current.reset(token)
+        return self._finish(request, response, stats)
+
+    async def __acall__(self, request):
+        if not self._sampled():
+            return await self.get_response(request)
+
+        stats = RequestStats()
+        token = _current.set(stats)
+        # the async ORM runs queries on the request's sync thread, whose
+        # connections are not the ones visible from the event loop
+        await sync_to_async(_push_query_wrappers)()
+        try:
+            with ExitStack() as stack:
+                if getattr(settings, 'TEMPLATE_PROFILING', False):
+                    stats.template_profile = stack.enter_context(template_profile.profile())
+                response = await self.get_response(request)
+        finally:
+            await sync_to_async(_pop_query_wrappers)()
+            _current.reset(token)
+        return self._finish(request, response, stats)
+
+    def _finish(self, request, response, stats):
+        total_ms = (time.perf_counter() - stats.started) * 1000
+        match = getattr(request, 'resolver_match', None)
+        stats.view = (match.view_name if match else '') or 'unresolved'
+
+        timing = _server_timing(stats, total_ms)
+        existing = response.get('Server-Timing')
+        response['Server-Timing'] = f'{existing}, {timing}' if existing else timing
+
+        duplicates = stats.duplicates()
+        logger.info(json.dumps({
+            'event': 'request',
+            'view': stats.view,
+            'method': request.method,
+            'status': response.status_code,
+            'total_ms': round(total_ms, 2),
+            'queries': stats.queries,
+            'query_ms': round(stats.query_ms, 2),
+            'duplicate_queries': {sql[:200]: count for sql, count in duplicates.items()},
+            'template_ms': round(stats.template_ms, 2),
+            'templates': stats.templates,
+            **({
+                'template_self_ms': stats.template_profile.top_templates(),
+                'template_tags': stats.template_profile.top_tags(),
+            } if stats.template_profile else {}),
+            'session_queries': stats.session_queries,
+            'session_ms': round(stats.session_ms, 2),
+            'db_pool': pool_summary(),
+        }))
+        if duplicates:
+            logger.warning('possible N+1 in %s: %s', stats.view, ', '.join(
+                f'{count}x {sql[:120]}' for sql, count in duplicates.items()
+            ))
+        record_histogram(stats.view, total_ms, stats.queries)
+        return response
@@ -0,0 +1,226 @@
+import asyncio
+import random
+import time
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import DEFAULT_DB_ALIAS, connection, transaction
+
+from .models import Product
+
+# Per-product cache of what the product detail page shows (the product and
+# its supplier), built to survive a promoted link sending thousands of
+# requests to the same product at once.
+#
+# - Entries are tagged with the product's and the supplier's version tokens.
+#   core.signals bumps them on save/delete, and checkout and the importer
+#   bump them after their bulk writes. A token mismatch makes the entry
+#   stale; nothing has to be deleted. Inside a transaction the tokens are
+#   bumped again on commit, in case a request cached the old row meanwhile.
+# - Entries are fresh for a jittered PRODUCT_CACHE_TIMEOUT so products cached
+#   together do not all expire together, and are kept
+#   PRODUCT_CACHE_STALE_TIMEOUT longer to be served stale.
+# - Only the request that wins a cache.add() lock rebuilds a stale entry;
+#   everyone else is served the stale copy meanwhile. On a cold miss the
+#   others wait up to PRODUCT_CACHE_WAIT seconds for the rebuild instead of
+#   all querying the database.
+# - Rebuilds read the primary, so a lagging replica is never cached under a
+#   new version.
+#
+# Outcomes are counted in the cache (see stats(), shown by perf_report).
+
+DETAIL_FIELDS = (
+    'id', 'name', 'description', 'price', 'stock', 'supplier_id',
+    'supplier__id', 'supplier__name', 'supplier__contact_email',
+)
+OUTCOMES = ('hits', 'stale', 'misses', 'waits')
+COUNTER_TIMEOUT = 7 * 24 * 3600
+_POLL_SECONDS = 0.02
+
+
+def _entry_key(product_id):
+    return f'product:detail:{product_id}'
+
+
+def _lock_key(product_id):
+    return f'product:detail:{product_id}:lock'
+
+
+def _product_version_key(product_id):
+    return f'product:version:{product_id}'
+
+
+def _supplier_version_key(supplier_id):
+    return f'supplier:version:{supplier_id}'
+
+
+def _new_token():
+    return f'{time.time_ns():x}{random.getrandbits(16):04x}'
+
+
+def _bump(keys):
+    if not keys:
+        return
+    cache.set_many({key: _new_token() for key in keys}, timeout=None)
+    if connection.in_atomic_block:
+        transaction.on_commit(lambda: cache.set_many({key: _new_token() for key in keys}, timeout=None))
+
+
+def bump_products(product_ids):
+    """Mark the cached detail of these products as stale (one cache round trip)."""
+    _bump([_product_version_key(product_id) for product_id in product_ids])
+
+
+def bump_suppliers(supplier_ids):
+    """Mark the cached detail of every product of these suppliers as stale."""
+    _bump([_supplier_version_key(supplier_id) for supplier_id in supplier_ids])
+
+
+def _fresh_ttl():
+    base = getattr(settings, 'PRODUCT_CACHE_TIMEOUT', 300)
+    jitter = getattr(settings, 'PRODUCT_CACHE_JITTER', 0.1)
+    return base * random.uniform(1 - jitter, 1 + jitter)
+
+
+def _count(outcome):
+    key = f'product:detail:stats:{outcome}'
+    try:
+        cache.incr(key)
+    except ValueError:
+        if not cache.add(key, 1, timeout=COUNTER_TIMEOUT):
+            cache.incr(key)
+
+
+async def _acount(outcome):
+    key = f'product:detail:stats:{outcome}'
+    try:
+        await cache.aincr(key)
+    except ValueError:
+        if not await cache.aadd(key, 1, timeout=COUNTER_TIMEOUT):
+            await cache.aincr(key)
+
+
+def stats():
+    """Return {outcome: count} across all workers sharing the cache."""
+    values = cache.get_many([f'product:detail:stats:{outcome}' for outcome in OUTCOMES])
+    return {outcome: values.get(f'product:detail:stats:{outcome}', 0) for outcome in OUTCOMES}
+
+
+def reset_stats():
+    cache.delete_many([f'product:detail:stats:{outcome}' for outcome in OUTCOMES])
+
+
+def _is_fresh(entry, product_version, supplier_version):
+    return (
+        entry['product_version'] == product_version
+        and entry['supplier_version'] == supplier_version
+        and entry['fresh_until'] > time.time()
+    )
+
+
+def _make_entry(product, product_version, supplier_version):
+    ttl = _fresh_ttl()
+    entry = {
+        'product': product,
+        'product_version': product_version,
+        'supplier_version': supplier_version,
+        'fresh_until': time.time() + ttl,
+    }
+    return entry, ttl + getattr(settings, 'PRODUCT_CACHE_STALE_TIMEOUT', 600)
+
+
+def _query(product_id):
+    return Product.objects.using(DEFAULT_DB_ALIAS).select_related('supplier').only(*DETAIL_FIELDS).filter(pk=product_id)
+
+
+def _rebuild(product_id, product_version, previous):
+    # versions are read before the row, so a write that lands in between
+    # leaves the entry tagged with the old token and it is rebuilt again
+    supplier_id = previous['product'].supplier_id if previous and previous['product'] else None
+    supplier_version = cache.get(_supplier_version_key(supplier_id)) if supplier_id else None
+    product = _query(product_id).first()
+    if product is not None and product.supplier_id != supplier_id:
+        supplier_version = cache.get(_supplier_version_key(product.supplier_id))
+    entry, timeout = _make_entry(product, product_version, supplier_version)
+    cache.set(_entry_key(product_id), entry, timeout)
+    return product
+
+
+def get_product_detail(product_id):
+    """The product (with its supplier loaded) for the detail page, or None."""
+    entry_key, version_key = _entry_key(product_id), _product_version_key(product_id)
+    found = cache.get_many([entry_key, version_key])
+    entry, product_version = found.get(entry_key), found.get(version_key)
+    if entry is not None:
+        supplier_id = entry['product'].supplier_id if entry['product'] else None
+        supplier_version = cache.get(_supplier_version_key(supplier_id)) if supplier_id else None
+        if _is_fresh(entry, product_version, supplier_version):
+            _count('hits')
+            return entry['product']
+
+    lock_timeout = getattr(settings, 'PRODUCT_CACHE_LOCK_TIMEOUT', 10)
+    if cache.add(_lock_key(product_id), 1, timeout=lock_timeout):
+        try:
+            _count('misses')
+            return _rebuild(product_id, product_version, entry)
+        finally:
+            cache.delete(_lock_key(product_id))
+    if entry is not None:
+        _count('stale')
+        return entry['product']
+
+    # cold miss while another request is rebuilding: wait for its result
+    deadline = time.monotonic() + getattr(settings, 'PRODUCT_CACHE_WAIT', 0.5)
+    while time.monotonic() < deadline:
+        time.sleep(_POLL_SECONDS)
+        entry = cache.get(entry_key)
+        if entry is not None:
+            _count('waits')
+            return entry['product']
+    _count('misses')
+    return _query(product_id).first()
+
+
+async def _arebuild(product_id, product_version, previous):
+    supplier_id = previous['product'].supplier_id if previous and previous['product'] else None
+    supplier_version = await cache.aget(_supplier_version_key(supplier_id)) if supplier_id else None
+    product = await _query(product_id).afirst()
+    if product is not None and product.supplier_id != supplier_id:
+        supplier_version = await cache.aget(_supplier_version_key(product.supplier_id))
+    entry, timeout = _make_entry(product, product_version, supplier_version)
+    await cache.aset(_entry_key(product_id), entry, timeout)
+    return product
+
+
+async def aget_product_detail(product_id):
+    """Async get_product_detail()."""
+    entry_key, version_key = _entry_key(product_id), _product_version_key(product_id)
+    found = await cache.aget_many([entry_key, version_key])
+    entry, product_version = found.get(entry_key), found.get(version_key)
+    if entry is not None:
+        supplier_id = entry['product'].supplier_id if entry['product'] else None
+        supplier_version = await cache.aget(_supplier_version_key(supplier_id)) if supplier_id else None
+        if _is_fresh(entry, product_version, supplier_version):
+            await _acount('hits')
+            return entry['product']
+
+    lock_timeout = getattr(settings, 'PRODUCT_CACHE_LOCK_TIMEOUT', 10)
+    if await cache.aadd(_lock_key(product_id), 1, timeout=lock_timeout):
+        try:
+            await _acount('misses')
+            return await _arebuild(product_id, product_version, entry)
+        finally:
+            await cache.adelete(_lock_key(product_id))
+    if entry is not None:
+        await _acount('stale')
+        return entry['product']
+
+    deadline = time.monotonic() + getattr(settings, 'PRODUCT_CACHE_WAIT', 0.5)
+    while time.monotonic() < deadline:
+        await asyncio.sleep(_POLL_SECONDS)
+        entry = await cache.aget(entry_key)
+        if entry is not None:
+            await _acount('waits')
+            return entry['product']
+    await _acount('misses')
+    return await _query(product_id).afirst()
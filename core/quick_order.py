@@ -0,0 +1,204 @@
+import csv
+import io
+from dataclasses import asdict, dataclass
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Q
+
+from . import cart_store
+from .cart import CART_PRODUCT_FIELDS
+from .inventory import is_header
+from .models import CartItem, Product
+from .reservations import hold_many, oversold
+
+# Quick order pad: add many cart lines in one request.
+#
+# Lines come as JSON ({"lines": [{"sku"|"product_id": ..., "quantity": n}]} or
+# [[ref, n], ...]) or as pasted CSV ("ref,quantity" per row, where ref is a
+# SKU or a product id). All products are resolved in one query, held with
+# reservations.hold_many and written to the cart with one upsert, so the cost
+# does not grow with the number of round trips. Every input line gets its own
+# result: accepted, capped (less stock than asked for) or rejected.
+
+ACCEPTED = 'accepted'
+CAPPED = 'capped'
+REJECTED = 'rejected'
+
+
+class QuickOrderError(Exception):
+    """The request as a whole is unusable (too many lines, bad JSON, ...)."""
+
+
+@dataclass(slots=True)
+class QuickOrderLine:
+    line: int
+    ref: str
+    requested: int = 0
+    kind: str = ''
+    status: str = REJECTED
+    product_id: int = None
+    name: str = ''
+    quantity: int = 0
+    message: str = ''
+
+    def as_dict(self):
+        data = asdict(self)
+        data.pop('kind')
+        return data
+
+
+def max_lines():
+    return getattr(settings, 'QUICK_ORDER_MAX_LINES', 1000)
+
+
+def _quantity(raw):
+    try:
+        value = int(str(raw).strip())
+    except (TypeError, ValueError):
+        return 0
+    return value if value > 0 else 0
+
+
+def parse_csv(text):
+    """Turn pasted CSV/TSV text into QuickOrderLines; a header row is skipped.
+
+    Only a first row that names its columns counts as a header (see
+    inventory.is_header), so a first line with a mistyped quantity is
+    rejected like any other.
+    """
+    sample = text[:2048]
+    try:
+        dialect = csv.Sniffer().sniff(sample, delimiters=',;\t')
+    except csv.Error:
+        dialect = csv.excel
+    lines = []
+    for number, row in enumerate(csv.reader(io.StringIO(text), dialect), start=1):
+        cells = [cell.strip() for cell in row]
+        if not cells or not cells[0]:
+            continue
+        if not lines and is_header(cells) and not (len(cells) > 1 and cells[1].lstrip('-').isdigit()):
+            continue
+        raw_quantity = cells[1] if len(cells) > 1 and cells[1] else '1'
+        lines.append(QuickOrderLine(line=number, ref=cells[0], requested=_quantity(raw_quantity)))
+    return lines
+
+
+def parse_json(payload):
+    """Turn a decoded JSON payload into QuickOrderLines."""
+    items = payload.get('lines') if isinstance(payload, dict) else payload
+    if not isinstance(items, list):
+        raise QuickOrderError('Expected a list of lines.')
+    lines = []
+    for number, item in enumerate(items, start=1):
+        kind = ''
+        if isinstance(item, dict):
+            if item.get('sku') not in (None, ''):
+                ref, kind = item['sku'], 'sku'
+            else:
+                ref, kind = item.get('product_id'), 'id'
+            raw_quantity = item.get('quantity', 1)
+        elif isinstance(item, (list, tuple)) and item:
+            ref, raw_quantity = item[0], item[1] if len(item) > 1 else 1
+        else:
+            ref, raw_quantity = None, 0
+        lines.append(QuickOrderLine(
+            line=number, ref='' if ref is None else str(ref).strip(), requested=_quantity(raw_quantity), kind=kind,
+        ))
+    return lines
+
+
+def _resolve(lines):
+    """Attach product ids to lines, with a single product query."""
+    skus = {line.ref for line in lines if line.ref and line.kind != 'id'}
+    ids = {int(line.ref) for line in lines if line.ref.isdigit() and line.kind != 'sku'}
+    if not skus and not ids:
+        return {}
+    products = list(
+        Product.objects.only(*CART_PRODUCT_FIELDS, 'sku').filter(Q(sku__in=skus) | Q(id__in=ids))
+    )
+    by_sku = {product.sku: product for product in products if product.sku}
+    by_id = {product.id: product for product in products}
+    for line in lines:
+        product = None
+        if line.kind != 'id':
+            product = by_sku.get(line.ref)
+        if product is None and line.kind != 'sku' and line.ref.isdigit():
+            product = by_id.get(int(line.ref))
+        if product is not None:
+            line.product_id, line.name = product.id, product.name
+    return by_id
+
+
+def _allocate(lines, added):
+    """Share each product's granted units out over its lines, in input order."""
+    for line in lines:
+        if line.message:
+            continue  # rejected before allocation
+        units = min(line.requested, added.get(line.product_id, 0))
+        added[line.product_id] = added.get(line.product_id, 0) - units
+        line.quantity = units
+        if units == line.requested:
+            line.status = ACCEPTED
+        elif units:
+            line.status, line.message = CAPPED, f'Only {units} available.'
+        else:
+            line.status, line.message = REJECTED, 'Out of stock.'
+
+
+def apply_quick_order(request, lines):
+    """Add lines to the request user's cart; returns the lines with their results."""
+    if len(lines) > max_lines():
+        raise QuickOrderError(f'At most {max_lines()} lines per request.')
+    products = _resolve(lines)
+    for line in lines:
+        if not line.requested:
+            line.message = 'Quantity must be a positive whole number.'
+        elif line.product_id is None:
+            line.message = f'Unknown product {line.ref!r}.' if line.ref else 'Missing product.'
+
+    wanted = {}
+    for line in lines:
+        if not line.message:
+            wanted[line.product_id] = wanted.get(line.product_id, 0) + line.requested
+    if not wanted:
+        return lines
+
+    cart_id = cart_store.get_cart_id(request)
+    existing = dict(
+        CartItem.objects.filter(cart_id=cart_id, product_id__in=list(wanted)).values_list('product_id', 'quantity')
+    )
+    targets = {product_id: existing.get(product_id, 0) + quantity for product_id, quantity in wanted.items()}
+    touched = [products[product_id] for product_id in wanted]
+
+    with transaction.atomic():
+        granted, previous = hold_many(request.user, touched, targets)
+        cart_store.set_quantities(cart_id, {
+            product_id: quantity for product_id, quantity in granted.items()
+            if quantity > existing.get(product_id, 0)
+        })
+
+    # like set_hold: if a concurrent cart took the same units, give ours back
+    lost = oversold([product_id for product_id in wanted if granted[product_id] > previous[product_id]])
+    if lost:
+        with transaction.atomic():
+            hold_many(request.user, [products[product_id] for product_id in lost], previous)
+            restore = {product_id: existing[product_id] for product_id in lost if existing.get(product_id)}
+            cart_store.remove_lines(cart_id, [product_id for product_id in lost if product_id not in restore])
+            cart_store.set_quantities(cart_id, restore)
+        for line in lines:
+            if line.product_id in lost and not line.message:
+                line.message = 'Stock was taken by another order.'
+
+    _allocate(lines, {
+        product_id: 0 if product_id in lost else max(granted[product_id] - existing.get(product_id, 0), 0)
+        for product_id in wanted
+    })
+    return lines
+
+
+def summarize(lines):
+    counts = {ACCEPTED: 0, CAPPED: 0, REJECTED: 0}
+    for line in lines:
+        counts[line.status] += 1
+    return counts
@@ -0,0 +1,258 @@
+from collections import defaultdict
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import connection, transaction
+from django.db.models import Sum
+from django.utils import timezone
+
+from .models import HoldShard, Product, StockHold
+
+# Stock reservation ledger.
+#
+# Every cart line is backed by a StockHold row with an expiry time. The held
+# quantity per product is also kept in HoldShard counter rows so that
+# "available to promise" (stock minus active holds) is a tiny aggregate over
+# at most STOCK_HOLD_SHARDS rows. Counters are only decremented when a hold is
+# released or swept, so a hold that expired but has not been swept yet keeps
+# counting as reserved until the sweeper (expire_holds command) runs.
+
+
+SHARD_UPDATE_CHUNK = 250
+
+
+class HoldRejected(Exception):
+    pass
+
+
+def hold_ttl():
+    return timedelta(seconds=getattr(settings, 'STOCK_HOLD_TTL_SECONDS', 900))
+
+
+def shard_count():
+    return max(1, getattr(settings, 'STOCK_HOLD_SHARDS', 8))
+
+
+def shard_for(user_id):
+    return user_id % shard_count()
+
+
+def reserved_quantities(product_ids):
+    """Return {product_id: held quantity} for the given products."""
+    rows = (
+        HoldShard.objects.filter(product_id__in=list(product_ids))
+        .values('product_id')
+        .annotate(total=Sum('reserved'))
+    )
+    return {row['product_id']: row['total'] or 0 for row in rows}
+
+
+def available_to_promise(products, user=None):
+    """Return {product_id: stock not held by other carts} for the products.
+
+    Holds placed by ``user`` do not count against that user's availability.
+    """
+    products = list(products)
+    product_ids = [product.id for product in products]
+    reserved = reserved_quantities(product_ids)
+    own = {}
+    if user is not None and user.is_authenticated:
+        own = dict(
+            StockHold.objects.filter(user=user, product_id__in=product_ids)
+            .values_list('product_id', 'quantity')
+        )
+    return {
+        product.id: max(product.stock - reserved.get(product.id, 0) + own.get(product.id, 0), 0)
+        for product in products
+    }
+
+
+def _apply_shard_deltas(deltas):
+    """Add {(product_id, shard): delta} to the counters, one UPDATE per shard."""
+    deltas = {key: delta for key, delta in deltas.items() if delta}
+    if not deltas:
+        return
+    HoldShard.objects.bulk_create(
+        [HoldShard(product_id=product_id, shard=shard) for product_id, shard in deltas],
+        ignore_conflicts=True,
+    )
+    by_shard = defaultdict(list)
+    for (product_id, shard), delta in deltas.items():
+        by_shard[shard].append((product_id, delta))
+    table = HoldShard._meta.db_table
+    # raw SQL: building a CASE of hundreds of When() objects through the ORM
+    # costs far more than the UPDATE itself
+    with connection.cursor() as cursor:
+        for shard, rows in by_shard.items():
+            for start in range(0, len(rows), SHARD_UPDATE_CHUNK):
+                chunk = rows[start:start + SHARD_UPDATE_CHUNK]
+                params = [value for row in chunk for value in row]
+                params += [shard] + [product_id for product_id, _ in chunk]
+                cursor.execute(
+                    f'UPDATE {table} SET reserved = reserved + CASE product_id '
+                    + ' '.join(['WHEN %s THEN %s'] * len(chunk))
+                    + ' ELSE 0 END WHERE shard = %s AND product_id IN ('
+                    + ', '.join(['%s'] * len(chunk)) + ')',
+                    params,
+                )
+
+
+def _write_hold(user, product, quantity, hold):
+    """Move user's hold on product from ``hold`` (or nothing) to quantity."""
+    shard = shard_for(user.pk)
+    deltas = defaultdict(int)
+    if hold:
+        deltas[(product.id, hold.shard)] -= hold.quantity
+    deltas[(product.id, shard)] += quantity
+    _apply_shard_deltas(deltas)
+
+    if quantity <= 0:
+        StockHold.objects.filter(user=user, product=product).delete()
+        return
+    expires_at = timezone.now() + hold_ttl()
+    updated = StockHold.objects.filter(user=user, product=product).update(
+        quantity=quantity, shard=shard, expires_at=expires_at
+    )
+    if not updated:
+        StockHold.objects.create(
+            user=user, product=product, quantity=quantity, shard=shard, expires_at=expires_at
+        )
+
+
+def set_hold(user, product, quantity):
+    """Hold ``quantity`` units of product for user, replacing any earlier hold.
+
+    Returns the number of units left for other carts, or raises HoldRejected
+    (carrying what the user could still hold) when other carts' holds leave
+    too little stock.
+
+    Holds are checked optimistically instead of locking the product row: the
+    counter is bumped and committed first, then availability is re-read and
+    the hold is rolled back if a concurrent cart took the last units. At
+    worst both racing carts are refused; stock is never promised twice.
+    """
+    if quantity <= 0:
+        release_holds(user, [product.id])
+        return None
+
+    with transaction.atomic():
+        hold = StockHold.objects.select_for_update().filter(user=user, product=product).first()
+        previous = hold.quantity if hold else 0
+        available = product.stock - reserved_quantities([product.id]).get(product.id, 0) + previous
+        if quantity > available:
+            raise HoldRejected(max(available, 0))
+        _write_hold(user, product, quantity, hold)
+
+    stock = Product.objects.filter(pk=product.pk).values_list('stock', flat=True).first() or 0
+    remaining = stock - reserved_quantities([product.id]).get(product.id, 0)
+    if remaining < 0:
+        with transaction.atomic():
+            current = StockHold.objects.select_for_update().filter(user=user, product=product).first()
+            _write_hold(user, product, previous, current)
+        raise HoldRejected(max(quantity + remaining, 0))
+    return remaining
+
+
+def hold_many(user, products, quantities):
+    """Hold up to ``quantities[product.id]`` units of each product for user.
+
+    The batch counterpart of set_hold: one transaction and a fixed number of
+    queries however many products, and each hold is capped to what is
+    available instead of being refused. The optimistic re-check is left to
+    the caller, via oversold(), once its own transaction has committed.
+    Returns ({product_id: units held}, {product_id: units held before}).
+    """
+    products = list(products)
+    product_ids = [product.id for product in products]
+    shard = shard_for(user.pk)
+    expires_at = timezone.now() + hold_ttl()
+    granted, previous = {}, {}
+    deltas = defaultdict(int)
+    keep, drop = [], []
+
+    with transaction.atomic():
+        holds = {
+            hold.product_id: hold
+            for hold in StockHold.objects.select_for_update().filter(user=user, product_id__in=product_ids)
+        }
+        reserved = reserved_quantities(product_ids)
+        for product in products:
+            hold = holds.get(product.id)
+            held = hold.quantity if hold else 0
+            available = max(product.stock - reserved.get(product.id, 0) + held, 0)
+            quantity = min(quantities.get(product.id, held), available)
+            granted[product.id], previous[product.id] = quantity, held
+            if hold:
+                deltas[(product.id, hold.shard)] -= held
+            deltas[(product.id, shard)] += quantity
+            if quantity > 0:
+                keep.append(StockHold(
+                    user=user, product=product, quantity=quantity, shard=shard, expires_at=expires_at,
+                ))
+            elif hold:
+                drop.append(product.id)
+
+        _apply_shard_deltas(deltas)
+        if keep:
+            StockHold.objects.bulk_create(
+                keep, update_conflicts=True, unique_fields=['user', 'product'],
+                update_fields=['quantity', 'shard', 'expires_at'],
+            )
+        if drop:
+            StockHold.objects.filter(user=user, product_id__in=drop).delete()
+    return granted, previous
+
+
+def oversold(product_ids):
+    """Return {product_id: units held beyond stock} for products promised twice."""
+    product_ids = list(product_ids)
+    stock = dict(Product.objects.filter(id__in=product_ids).values_list('id', 'stock'))
+    reserved = reserved_quantities(product_ids)
+    return {
+        product_id: reserved.get(product_id, 0) - on_hand
+        for product_id, on_hand in stock.items()
+        if reserved.get(product_id, 0) > on_hand
+    }
+
+
+def _delete_holds(holds):
+    deltas = defaultdict(int)
+    for hold_id, product_id, shard, quantity in holds:
+        deltas[(product_id, shard)] -= quantity
+    _apply_shard_deltas(deltas)
+    StockHold.objects.filter(id__in=[hold[0] for hold in holds]).delete()
+
+
+def release_holds(user, product_ids=None):
+    """Drop user's holds (all of them, or only for product_ids)."""
+    with transaction.atomic():
+        queryset = StockHold.objects.select_for_update().filter(user=user)
+        if product_ids is not None:
+            queryset = queryset.filter(product_id__in=list(product_ids))
+        holds = list(queryset.values_list('id', 'product_id', 'shard', 'quantity'))
+        if holds:
+            _delete_holds(holds)
+    return len(holds)
+
+
+def expire_holds(batch_size=1000, now=None):
+    """Delete expired holds in batches and return how many were swept.
+
+    Each batch is its own short transaction and skips rows locked by a
+    concurrent sweeper or by a cart that is refreshing its hold.
+    """
+    now = now or timezone.now()
+    swept = 0
+    while True:
+        with transaction.atomic():
+            holds = list(
+                StockHold.objects.select_for_update(skip_locked=True)
+                .filter(expires_at__lte=now)
+                .order_by('expires_at')
+                .values_list('id', 'product_id', 'shard', 'quantity')[:batch_size]
+            )
+            if holds:
+                _delete_holds(holds)
+        swept += len(holds)
+        if len(holds) < batch_size:
+            return swept
@@ -0,0 +1,70 @@
+from django.conf import settings
+from django.core.cache import cache
+from django.db import connection, transaction
+
+# Group membership lookups for templates and view decorators.
+#
+# A user's group names are read once per request (memoised on the user
+# object) and cached across requests; core.signals drops the cached entry
+# whenever the user's groups or a group they belong to changes, and again
+# when that transaction commits.
+
+
+def _cache_key(user_id):
+    return f'roles:user:{user_id}'
+
+
+def get_group_names(user):
+    """Return the frozenset of group names ``user`` belongs to."""
+    if user is None or not user.is_authenticated:
+        return frozenset()
+    names = getattr(user, '_group_names', None)
+    if names is not None:
+        return names
+
+    key = _cache_key(user.pk)
+    names = cache.get(key)
+    if names is None:
+        names = frozenset(user.groups.values_list('name', flat=True))
+        cache.set(key, names, getattr(settings, 'ROLE_CACHE_TIMEOUT', 3600))
+    user._group_names = names
+    return names
+
+
+async def aget_group_names(user):
+    """Async get_group_names, sharing its per-request memo and cache entry."""
+    if user is None or not user.is_authenticated:
+        return frozenset()
+    names = getattr(user, '_group_names', None)
+    if names is not None:
+        return names
+
+    key = _cache_key(user.pk)
+    names = await cache.aget(key)
+    if names is None:
+        names = frozenset([name async for name in user.groups.values_list('name', flat=True)])
+        await cache.aset(key, names, getattr(settings, 'ROLE_CACHE_TIMEOUT', 3600))
+    user._group_names = names
+    return names
+
+
+def user_in_group(user, group_name):
+    return group_name in get_group_names(user)
+
+
+def invalidate_user_groups(user_ids):
+    keys = [_cache_key(user_id) for user_id in user_ids]
+    if not keys:
+        return
+    cache.delete_many(keys)
+    if connection.in_atomic_block:
+        # a request running before the commit still reads the old groups
+        # and caches them again; drop them once the change is visible
+        transaction.on_commit(lambda: cache.delete_many(keys))
+
+
+def nav_role(user):
+    """The role that decides which links the site nav shows."""
+    if user is None or not user.is_authenticated:
+        return 'anonymous'
+    return 'seller' if user_in_group(user, 'seller') else 'member'
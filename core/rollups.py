@@ -0,0 +1,210 @@
+from dataclasses import dataclass, field
+from datetime import datetime, time as dt_time, timedelta
+from decimal import Decimal
+
+from django.conf import settings
+from django.db import connection, transaction
+from django.db.models import Count, DecimalField, ExpressionWrapper, F, Sum
+from django.db.models.functions import TruncDay, TruncHour
+from django.utils import timezone
+
+from .models import OrderItem, OutboxEvent, Product, SalesRollup, Supplier
+from .outbox import ORDER_PLACED
+
+# Pre-aggregated sales for the seller dashboard.
+#
+# SalesRollup holds one row per product per hour and per day. The outbox
+# worker adds each placed order to its rows incrementally with one INSERT ...
+# ON CONFLICT DO UPDATE (units = units + excluded.units), and the
+# compact_sales_rollups command rebuilds closed hours/days from OrderItem
+# (dropping cancelled orders, and orders whose order.placed event the worker
+# has yet to handle) and prunes hourly rows past
+# SALES_HOURLY_RETENTION_DAYS. The dashboard reads nothing but rollup rows,
+# plus the handful of products and suppliers it names.
+
+TRUNC = {SalesRollup.HOUR: TruncHour, SalesRollup.DAY: TruncDay}
+
+
+def bucket_start(moment, granularity):
+    local = timezone.localtime(moment)
+    if granularity == SalesRollup.HOUR:
+        return local.replace(minute=0, second=0, microsecond=0)
+    return local.replace(hour=0, minute=0, second=0, microsecond=0)
+
+
+def day_start(day):
+    return timezone.make_aware(datetime.combine(day, dt_time.min))
+
+
+def record_sales(order, items):
+    """Add a placed order's lines to its hour and day rollups, in one statement."""
+    lines = {}
+    for item in items:
+        line = lines.setdefault(item.product_id, [item.product.supplier_id, 0, Decimal('0'), 0])
+        line[1] += item.quantity
+        line[2] += item.price * item.quantity
+        line[3] += 1
+    if not lines:
+        return
+    ops = connection.ops
+    values, params = [], []
+    for granularity in (SalesRollup.HOUR, SalesRollup.DAY):
+        bucket = ops.adapt_datetimefield_value(bucket_start(order.created_at, granularity))
+        for product_id, (supplier_id, units, revenue, order_lines) in lines.items():
+            values.append('(%s, %s, %s, %s, %s, %s, %s)')
+            params += [
+                granularity, bucket, product_id, supplier_id, units,
+                ops.adapt_decimalfield_value(revenue, 14, 2), order_lines,
+            ]
+    table = SalesRollup._meta.db_table
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f'INSERT INTO {table} (granularity, bucket, product_id, supplier_id, units, revenue, order_lines) '
+            f'VALUES {", ".join(values)} '
+            'ON CONFLICT (granularity, bucket, product_id) DO UPDATE SET '
+            f'units = {table}.units + excluded.units, '
+            f'revenue = {table}.revenue + excluded.revenue, '
+            f'order_lines = {table}.order_lines + excluded.order_lines',
+            params,
+        )
+
+
+def _unrecorded_orders():
+    """Ids of orders whose order.placed event has not been handled yet.
+
+    Call it inside the rebuild's transaction: the events are locked, so a
+    worker either handled one before (and the rebuild recounts its order) or
+    handles it after the rebuild commits (and adds the order to the new rows).
+    """
+    payloads = OutboxEvent.objects.select_for_update().filter(topic=ORDER_PLACED).values_list('payload', flat=True)
+    return {payload.get('order_id') for payload in payloads}
+
+
+def rebuild(since, until=None, batch_size=1000):
+    """Recompute the rollups of closed hours and days from ``since`` on.
+
+    Only buckets that have fully ended are rewritten (hours before the
+    current hour, days before today), so orders still coming in are left to
+    the incremental path, as are orders whose event is still in the outbox.
+    Returns the number of rows written.
+    """
+    now = until or timezone.now()
+    ends = {
+        SalesRollup.HOUR: bucket_start(now, SalesRollup.HOUR),
+        SalesRollup.DAY: bucket_start(now, SalesRollup.DAY),
+    }
+    written = 0
+    for granularity, end in ends.items():
+        start = bucket_start(since, granularity)
+        if start >= end:
+            continue
+        revenue = ExpressionWrapper(F('price') * F('quantity'), output_field=DecimalField(max_digits=14, decimal_places=2))
+        rows = (
+            OrderItem.objects
+            .filter(order__created_at__gte=start, order__created_at__lt=end)
+            .exclude(order__status='cancelled')
+            .annotate(bucket=TRUNC[granularity]('order__created_at'))
+            .values('bucket', 'product_id', 'product__supplier_id')
+            .annotate(units=Sum('quantity'), revenue=Sum(revenue), order_lines=Count('id'))
+            .order_by()
+        )
+        with transaction.atomic():
+            unrecorded = _unrecorded_orders()
+            if unrecorded:
+                rows = rows.exclude(order_id__in=unrecorded)
+            SalesRollup.objects.filter(granularity=granularity, bucket__gte=start, bucket__lt=end).delete()
+            batch = []
+            for row in rows.iterator(chunk_size=batch_size):
+                batch.append(SalesRollup(
+                    granularity=granularity, bucket=row['bucket'], product_id=row['product_id'],
+                    supplier_id=row['product__supplier_id'], units=row['units'],
+                    revenue=row['revenue'], order_lines=row['order_lines'],
+                ))
+                if len(batch) >= batch_size:
+                    SalesRollup.objects.bulk_create(batch)
+                    written += len(batch)
+                    batch = []
+            SalesRollup.objects.bulk_create(batch)
+            written += len(batch)
+    return written
+
+
+def prune_hourly(now=None):
+    days = getattr(settings, 'SALES_HOURLY_RETENTION_DAYS', 35)
+    cutoff = bucket_start((now or timezone.now()) - timedelta(days=days), SalesRollup.DAY)
+    return SalesRollup.objects.filter(granularity=SalesRollup.HOUR, bucket__lt=cutoff).delete()[0]
+
+
+@dataclass
+class Dashboard:
+    date_from: object
+    date_to: object
+    granularity: str
+    supplier: object = None
+    revenue: Decimal = Decimal('0')
+    units: int = 0
+    order_lines: int = 0
+    series: list = field(default_factory=list)
+    top_products: list = field(default_factory=list)
+    top_suppliers: list = field(default_factory=list)
+    low_stock: list = field(default_factory=list)
+
+
+def dashboard_granularity(date_from, date_to):
+    retention = getattr(settings, 'SALES_HOURLY_RETENTION_DAYS', 35)
+    recent = date_from >= timezone.localdate() - timedelta(days=retention)
+    return SalesRollup.HOUR if recent and (date_to - date_from).days < 2 else SalesRollup.DAY
+
+
+def build_dashboard(date_from, date_to, supplier_id=None, top=10):
+    """Sales between two dates (inclusive) from the rollup tables only."""
+    granularity = dashboard_granularity(date_from, date_to)
+    days = (date_to - date_from).days + 1
+    rollups = SalesRollup.objects.filter(
+        granularity=granularity,
+        bucket__gte=day_start(date_from),
+        bucket__lt=day_start(date_to + timedelta(days=1)),
+    )
+    if supplier_id:
+        rollups = rollups.filter(supplier_id=supplier_id)
+    result = Dashboard(date_from=date_from, date_to=date_to, granularity=granularity)
+    sums = {'units': Sum('units'), 'revenue': Sum('revenue'), 'order_lines': Sum('order_lines')}
+
+    series = list(rollups.values('bucket').annotate(**sums).order_by('bucket'))
+    # the totals are the chart's buckets added up; no second pass over the rows
+    result.units = sum(row['units'] for row in series)
+    result.revenue = sum((row['revenue'] for row in series), Decimal('0'))
+    result.order_lines = sum(row['order_lines'] for row in series)
+    peak = max((row['revenue'] for row in series), default=0) or 1
+    for row in series:
+        row['percent'] = round(float(row['revenue'] / peak) * 100, 1)
+    result.series = series
+
+    by_product = rollups.values('product_id').annotate(**sums)
+    top_rows = list(by_product.order_by('-revenue')[:top])
+    # restock alerts look at the fastest movers, whatever their revenue
+    movers = list(by_product.order_by('-units')[:getattr(settings, 'LOW_STOCK_CANDIDATES', 200)])
+    products = Product.objects.only('id', 'name', 'stock').in_bulk(
+        {row['product_id'] for row in top_rows} | {row['product_id'] for row in movers}
+    )
+    result.top_products = [
+        {**row, 'product': products.get(row['product_id'])} for row in top_rows
+    ]
+    cover_days = getattr(settings, 'LOW_STOCK_COVER_DAYS', 7)
+    for row in movers:
+        product = products.get(row['product_id'])
+        per_day = row['units'] / days
+        if product is None or not per_day:
+            continue
+        days_left = product.stock / per_day
+        if days_left < cover_days:
+            result.low_stock.append({'product': product, 'per_day': round(per_day, 1), 'days_left': round(days_left, 1)})
+    result.low_stock.sort(key=lambda alert: alert['days_left'])
+
+    if supplier_id:
+        result.supplier = Supplier.objects.only('id', 'name').filter(pk=supplier_id).first()
+    else:
+        supplier_rows = list(rollups.values('supplier_id').annotate(**sums).order_by('-revenue')[:top])
+        suppliers = Supplier.objects.only('id', 'name').in_bulk([row['supplier_id'] for row in supplier_rows])
+        result.top_suppliers = [{**row, 'supplier': suppliers.get(row['supplier_id'])} for row in supplier_rows]
+    return result
@@ -0,0 +1,156 @@
+import random
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from dataclasses import dataclass
+from functools import wraps
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS, connections
+
+# Primary/replica database routing.
+#
+# Every query goes to the primary ("default") unless it runs inside a view
+# marked with @replica_reads or a use_replica() block; only then are reads
+# sent to one of REPLICA_DATABASE_ALIASES (configured from *_DATABASE_URL env
+# vars). Writes always go to the primary. After a request writes, the
+# ReplicaPinMiddleware sets a short-lived cookie that keeps that client's
+# reads on the primary for PRIMARY_PIN_SECONDS, so a buyer never reads back a
+# replica that has not caught up with their own change yet.
+
+PIN_COOKIE = 'db_pin'
+SAFE_METHODS = ('GET', 'HEAD', 'OPTIONS', 'TRACE')
+# sessions, users and permissions are read-then-written within one request
+PRIMARY_APPS = {'sessions', 'auth', 'contenttypes', 'admin'}
+
+
+@dataclass
+class RoutingState:
+    replica: str = None
+    wrote: bool = False
+
+
+_state = ContextVar('db_routing_state', default=None)
+
+
+def replica_aliases():
+    return [alias for alias in getattr(settings, 'REPLICA_DATABASE_ALIASES', []) if alias != DEFAULT_DB_ALIAS]
+
+
+def is_pinned(request):
+    try:
+        return float(request.COOKIES.get(PIN_COOKIE, 0)) > time.time()
+    except ValueError:
+        return False
+
+
+@contextmanager
+def use_replica(alias=None):
+    """Send reads in this block to a replica (a random one unless ``alias`` is given)."""
+    aliases = replica_aliases()
+    state = _state.get()
+    if state is None:
+        state = RoutingState()
+        token = _state.set(state)
+    else:
+        token = None
+    previous = state.replica
+    if alias is None and aliases:
+        alias = previous if previous in aliases else random.choice(aliases)
+    state.replica = alias
+    try:
+        yield alias
+    finally:
+        state.replica = previous
+        if token is not None:
+            _state.reset(token)
+
+
+def _use_replica_for(request):
+    return request.method in SAFE_METHODS and not is_pinned(request) and bool(replica_aliases())
+
+
+def replica_reads(view_func):
+    """Mark a read-only view (sync or async) whose queries may be served from a replica."""
+    if iscoroutinefunction(view_func):
+        @wraps(view_func)
+        async def _awrapped(request, *args, **kwargs):
+            if not _use_replica_for(request):
+                return await view_func(request, *args, **kwargs)
+            with use_replica():
+                return await view_func(request, *args, **kwargs)
+        return _awrapped
+
+    @wraps(view_func)
+    def _wrapped(request, *args, **kwargs):
+        if not _use_replica_for(request):
+            return view_func(request, *args, **kwargs)
+        with use_replica():
+            return view_func(request, *args, **kwargs)
+    return _wrapped
+
+
+class PrimaryReplicaRouter:
+    def db_for_read(self, model, **hints):
+        state = _state.get()
+        if state is None or not state.replica or model._meta.app_label in PRIMARY_APPS:
+            return DEFAULT_DB_ALIAS
+        if connections[DEFAULT_DB_ALIAS].in_atomic_block:
+            # reads inside a transaction must see its own uncommitted writes
+            return DEFAULT_DB_ALIAS
+        return state.replica
+
+    def db_for_write(self, model, **hints):
+        state = _state.get()
+        if state is not None and model._meta.app_label not in PRIMARY_APPS:
+            state.wrote = True
+        return DEFAULT_DB_ALIAS
+
+    def allow_relation(self, obj1, obj2, **hints):
+        pool = {DEFAULT_DB_ALIAS, *replica_aliases()}
+        if obj1._state.db in pool and obj2._state.db in pool:
+            return True
+        return None
+
+
+class ReplicaPinMiddleware:
+    """Pin a client to the primary for PRIMARY_PIN_SECONDS after it writes."""
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.async_mode = iscoroutinefunction(get_response)
+        if self.async_mode:
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if self.async_mode:
+            return self.__acall__(request)
+        state = RoutingState()
+        token = _state.set(state)
+        try:
+            response = self.get_response(request)
+        finally:
+            _state.reset(token)
+        return self._pin(request, response, state)
+
+    async def __acall__(self, request):
+        state = RoutingState()
+        token = _state.set(state)
+        try:
+            response = await self.get_response(request)
+        finally:
+            _state.reset(token)
+        return self._pin(request, response, state)
+
+    def _pin(self, request, response, state):
+        if replica_aliases() and (state.wrote or request.method not in SAFE_METHODS):
+            seconds = getattr(settings, 'PRIMARY_PIN_SECONDS', 5)
+            response.set_cookie(
+                PIN_COOKIE, f'{time.time() + seconds:.3f}', max_age=seconds,
+                httponly=True, samesite='Lax', secure=request.is_secure(),
+            )
+        return response
@@ -0,0 +1,155 @@
+import re
+
+from django.db import connection, connections, router
+
+from .models import Product
+
+# Product search backed by a precomputed index table that lives next to
+# core_product and is kept current from the Product/Supplier save signals.
+#
+# * PostgreSQL: core_product_search holds a weighted tsvector (name > supplier
+#   > description) with a GIN index, plus a lower-cased name/supplier string
+#   with a pg_trgm GIN index so misspelt queries still match.
+# * SQLite: core_product_search is an FTS5 table keyed by the product rowid,
+#   ranked with bm25 and with prefix indexes for short prefixes.
+#
+# The table is created by migration 0006 and is not a Django model; other
+# databases simply have no search index and search() falls back to icontains.
+
+SEARCH_TABLE = 'core_product_search'
+MAX_TERMS = 8
+TOKEN_RE = re.compile(r'\w+', re.UNICODE)
+INDEXED_FIELDS = {'name', 'description', 'supplier', 'supplier_id'}
+
+
+def is_supported():
+    return connection.vendor in ('sqlite', 'postgresql')
+
+
+def search_terms(query):
+    return TOKEN_RE.findall((query or '').lower())[:MAX_TERMS]
+
+
+def _where_clause(product_ids=None, supplier_id=None):
+    if product_ids is not None:
+        placeholders = ', '.join(['%s'] * len(product_ids))
+        return f'WHERE p.id IN ({placeholders})', list(product_ids)
+    if supplier_id is not None:
+        return 'WHERE p.supplier_id = %s', [supplier_id]
+    return '', []
+
+
+def _reindex(product_ids=None, supplier_id=None):
+    if not is_supported():
+        return
+    if product_ids is not None and not product_ids:
+        return
+    where, params = _where_clause(product_ids, supplier_id)
+    source = (
+        'FROM core_product p INNER JOIN core_supplier s ON s.id = p.supplier_id '
+        f'{where}'
+    )
+    with connection.cursor() as cursor:
+        if connection.vendor == 'sqlite':
+            cursor.execute(f'DELETE FROM {SEARCH_TABLE} WHERE rowid IN (SELECT p.id {source})', params)
+            cursor.execute(
+                f'INSERT INTO {SEARCH_TABLE} (rowid, name, description, supplier) '
+                f'SELECT p.id, p.name, p.description, s.name {source}',
+                params,
+            )
+        else:
+            cursor.execute(
+                f'INSERT INTO {SEARCH_TABLE} (product_id, document, body) '
+                "SELECT p.id, "
+                "setweight(to_tsvector('simple', p.name), 'A') || "
+                "setweight(to_tsvector('simple', s.name), 'B') || "
+                "setweight(to_tsvector('simple', coalesce(p.description, '')), 'C'), "
+                "lower(p.name || ' ' || s.name) "
+                f'{source} '
+                'ON CONFLICT (product_id) DO UPDATE SET document = EXCLUDED.document, body = EXCLUDED.body',
+                params,
+            )
+
+
+def index_products(product_ids):
+    """Refresh the index rows for the given products in one statement."""
+    _reindex(product_ids=list(product_ids))
+
+
+def index_supplier(supplier_id):
+    """Refresh the index rows of every product of a supplier."""
+    _reindex(supplier_id=supplier_id)
+
+
+def remove_products(product_ids):
+    product_ids = list(product_ids)
+    if not product_ids or connection.vendor != 'sqlite':
+        # PostgreSQL rows go away with the product (ON DELETE CASCADE)
+        return
+    placeholders = ', '.join(['%s'] * len(product_ids))
+    with connection.cursor() as cursor:
+        cursor.execute(f'DELETE FROM {SEARCH_TABLE} WHERE rowid IN ({placeholders})', product_ids)
+
+
+def rebuild_index():
+    """Rebuild the whole index from core_product; returns the row count."""
+    if not is_supported():
+        return 0
+    with connection.cursor() as cursor:
+        cursor.execute(f'DELETE FROM {SEARCH_TABLE}')
+    _reindex()
+    return Product.objects.count()
+
+
+def _ranked_ids(terms, limit):
+    # the index table is not a model, so follow wherever Product reads are routed
+    reader = connections[router.db_for_read(Product)]
+    with reader.cursor() as cursor:
+        if reader.vendor == 'sqlite':
+            match = ' '.join(f'"{term}"*' for term in terms)
+            cursor.execute(
+                f'SELECT rowid FROM {SEARCH_TABLE} WHERE {SEARCH_TABLE} MATCH %s '
+                f'ORDER BY bm25({SEARCH_TABLE}, 10.0, 1.0, 3.0) LIMIT %s',
+                [match, limit],
+            )
+        else:
+            tsquery = ' & '.join(f'{term}:*' for term in terms)
+            text = ' '.join(terms)
+            cursor.execute(
+                "SELECT product_id FROM ("
+                "SELECT product_id, "
+                "ts_rank_cd(document, to_tsquery('simple', %s)) + similarity(body, %s) AS rank "
+                f"FROM {SEARCH_TABLE} "
+                "WHERE document @@ to_tsquery('simple', %s) OR body %% %s"
+                ") ranked ORDER BY rank DESC, product_id LIMIT %s",
+                [tsquery, text, tsquery, text, limit],
+            )
+        return [row[0] for row in cursor.fetchall()]
+
+
+def search_ids(query, limit=50):
+    """Ids of the products matching query, best match first (index only)."""
+    terms = search_terms(query)
+    if not terms or not is_supported():
+        return None
+    return _ranked_ids(terms, limit)
+
+
+def search(query, limit=50):
+    """Return products matching every term of query, best match first.
+
+    Each term matches as a prefix of a word in the product name,
+    description or supplier name.
+    """
+    terms = search_terms(query)
+    if not terms:
+        return []
+    queryset = Product.objects.select_related('supplier')
+    if not is_supported():
+        for term in terms:
+            queryset = queryset.filter(name__icontains=term)
+        return list(queryset.order_by('name', 'id')[:limit])
+
+    ids = _ranked_ids(terms, limit)
+    products = queryset.in_bulk(ids)
+    return [products[product_id] for product_id in ids if product_id in products]
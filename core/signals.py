@@ -0,0 +1,122 @@
+from django.contrib.auth.models import Group, User
+from django.contrib.auth.signals import user_logged_in
+from django.db.backends.signals import connection_created
+from django.db.models.signals import m2m_changed, post_delete, post_save, pre_delete, pre_save
+from django.dispatch import receiver
+
+from . import api, cart_store, dbpool, inventory, product_cache, search
+from .catalog import bump_catalog_version
+from .models import Product, StockMovement, Supplier
+from .roles import invalidate_user_groups
+
+
+@receiver(post_save, sender=Product)
+@receiver(post_delete, sender=Product)
+@receiver(post_save, sender=Supplier)
+@receiver(post_delete, sender=Supplier)
+def invalidate_catalog(sender, **kwargs):
+    bump_catalog_version()
+
+
+@receiver(post_save, sender=Product)
+@receiver(post_delete, sender=Product)
+def invalidate_product_detail(sender, instance, **kwargs):
+    product_cache.bump_products([instance.pk])
+
+
+@receiver(post_save, sender=Supplier)
+@receiver(post_delete, sender=Supplier)
+def invalidate_supplier_details(sender, instance, **kwargs):
+    product_cache.bump_suppliers([instance.pk])
+
+
+@receiver(pre_save, sender=Product)
+def remember_stock(sender, instance, update_fields=None, **kwargs):
+    # loaded products carry their stock as read (Product.from_db); only one
+    # built by hand with an existing pk has to read it
+    if instance.pk is None or getattr(instance, '_loaded_stock', None) is not None:
+        return
+    if update_fields and 'stock' not in update_fields:
+        return
+    instance._loaded_stock = Product.objects.filter(pk=instance.pk).values_list('stock', flat=True).first()
+
+
+@receiver(post_save, sender=Product)
+def record_stock_edit(sender, instance, created, update_fields=None, **kwargs):
+    # stock set by hand (admin, seed data): record the difference in the ledger
+    if update_fields and 'stock' not in update_fields:
+        return
+    before = 0 if created else getattr(instance, '_loaded_stock', None) or 0
+    if instance.stock != before:
+        reference = 'opening balance' if created else 'edited'
+        inventory.record_movements(StockMovement.ADJUSTMENT, {instance.pk: instance.stock - before}, reference=reference)
+    instance._loaded_stock = instance.stock
+
+
+@receiver(post_delete, sender=Product)
+def tombstone_product(sender, instance, **kwargs):
+    api.record_tombstone(api.PRODUCTS, instance.pk)
+
+
+@receiver(post_delete, sender=Supplier)
+def tombstone_supplier(sender, instance, **kwargs):
+    api.record_tombstone(api.SUPPLIERS, instance.pk)
+
+
+@receiver(post_save, sender=Supplier)
+def touch_supplier_products(sender, instance, created, update_fields=None, **kwargs):
+    if created or (update_fields and 'name' not in update_fields):
+        return
+    api.touch_supplier_products(instance.pk)
+
+
+@receiver(post_save, sender=Product)
+def index_product(sender, instance, update_fields=None, **kwargs):
+    if update_fields and not search.INDEXED_FIELDS.intersection(update_fields):
+        return
+    search.index_products([instance.pk])
+
+
+@receiver(post_delete, sender=Product)
+def unindex_product(sender, instance, **kwargs):
+    search.remove_products([instance.pk])
+
+
+@receiver(post_save, sender=Supplier)
+def index_supplier_products(sender, instance, update_fields=None, **kwargs):
+    if update_fields and 'name' not in update_fields:
+        return
+    search.index_supplier(instance.pk)
+
+
+@receiver(m2m_changed, sender=User.groups.through)
+def invalidate_roles_on_membership_change(sender, instance, action, reverse, pk_set, **kwargs):
+    if action == 'pre_clear' and reverse:
+        # group.user_set.clear(): remember the members before they are gone
+        instance._cleared_member_ids = list(instance.user_set.values_list('pk', flat=True))
+        return
+    if action not in ('post_add', 'post_remove', 'post_clear'):
+        return
+    if not reverse:
+        invalidate_user_groups([instance.pk])
+    elif action == 'post_clear':
+        invalidate_user_groups(getattr(instance, '_cleared_member_ids', []))
+    else:
+        invalidate_user_groups(pk_set or [])
+
+
+@receiver(post_save, sender=Group)
+@receiver(pre_delete, sender=Group)
+def invalidate_roles_on_group_change(sender, instance, **kwargs):
+    invalidate_user_groups(instance.user_set.values_list('pk', flat=True))
+
+
+@receiver(connection_created)
+def count_connection(sender, connection, **kwargs):
+    dbpool.record_connect(connection.alias)
+
+
+@receiver(user_logged_in)
+def adopt_session_cart(sender, request, user, **kwargs):
+    if request is not None and hasattr(request, 'session') and cart_store.LEGACY_SESSION_KEY in request.session:
+        cart_store.get_cart_id(request, user)
@@ -0,0 +1,183 @@
+import gzip
+import mimetypes
+import os
+import re
+from email.utils import formatdate
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction, sync_to_async
+from django.conf import settings
+from django.contrib.staticfiles.storage import ManifestStaticFilesStorage, staticfiles_storage
+from django.core.exceptions import MiddlewareNotUsed, SuspiciousFileOperation
+from django.http import FileResponse, HttpResponse, HttpResponseNotModified
+from django.utils._os import safe_join
+from django.utils.http import parse_etags, parse_http_date_safe
+
+try:
+    import brotli
+except ImportError:  # optional: without it only .gz variants are written
+    brotli = None
+
+# Static asset pipeline.
+#
+# CompressedManifestStaticFilesStorage is ManifestStaticFilesStorage (content
+# hashes in file names, references inside CSS rewritten) that also writes
+# .gz and, with the brotli package installed, .br next to every compressible
+# file at collectstatic time. PrecompressedStaticMiddleware serves
+# STATIC_ROOT itself: it picks the smallest variant the client accepts, marks
+# hashed names as immutable for a year, and never compresses at request time.
+
+COMPRESSIBLE_EXTENSIONS = {'.css', '.js', '.mjs', '.svg', '.json', '.txt', '.xml', '.map', '.ttf', '.eot', '.ico'}
+# a variant has to save at least this fraction to be worth a separate file
+MIN_SAVING = 0.05
+IMMUTABLE = 'public, max-age=31536000, immutable'
+
+
+def compress(path):
+    """Write path.gz (and path.br) when they are meaningfully smaller."""
+    with open(path, 'rb') as fh:
+        data = fh.read()
+    written = []
+    variants = [('.gz', lambda raw: gzip.compress(raw, compresslevel=9, mtime=0))]
+    if brotli is not None:
+        variants.append(('.br', lambda raw: brotli.compress(raw, quality=11)))
+    for suffix, encode in variants:
+        packed = encode(data)
+        if len(packed) <= len(data) * (1 - MIN_SAVING):
+            with open(path + suffix, 'wb') as fh:
+                fh.write(packed)
+            written.append(path + suffix)
+    return written
+
+
+class CompressedManifestStaticFilesStorage(ManifestStaticFilesStorage):
+    def post_process(self, paths, dry_run=False, **options):
+        yield from super().post_process(paths, dry_run=dry_run, **options)
+        if dry_run:
+            return
+        # the unhashed copies are collected too (and served with a short TTL)
+        names = set(paths) | set(self.hashed_files.values())
+        for name in sorted(names):
+            if os.path.splitext(name)[1].lower() in COMPRESSIBLE_EXTENSIONS and self.exists(name):
+                compress(self.path(name))
+
+
+ENCODINGS = (('br', '.br'), ('gzip', '.gz'))
+_QVALUE = re.compile(r'^\s*([^;\s]+)\s*(?:;\s*q=([0-9.]+))?')
+
+
+def accepted_encodings(header):
+    accepted = set()
+    for part in (header or '').split(','):
+        match = _QVALUE.match(part)
+        if not match:
+            continue
+        coding, quality = match.group(1).lower(), match.group(2)
+        try:
+            if quality is None or float(quality) > 0:
+                accepted.add(coding)
+        except ValueError:
+            continue
+    return accepted
+
+
+class PrecompressedStaticMiddleware:
+    """Serve collected static files with precompressed variants.
+
+    Place it right after SecurityMiddleware. It is switched off (Django drops
+    it) unless SERVE_STATIC is set, which is the default without DEBUG; in
+    development runserver serves static files from the app directories.
+    """
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        if not getattr(settings, 'SERVE_STATIC', False):
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+        self.async_mode = iscoroutinefunction(get_response)
+        if self.async_mode:
+            markcoroutinefunction(self)
+        self.prefix = '/' + settings.STATIC_URL.lstrip('/')
+        self.root = str(settings.STATIC_ROOT)
+        # content-hashed names (from the manifest) can be cached forever
+        self.immutable = set(getattr(staticfiles_storage, 'hashed_files', {}).values())
+
+    def __call__(self, request):
+        if self.async_mode:
+            return self.__acall__(request)
+        found = self._find(request)
+        if found is None:
+            return self.get_response(request)
+        return self._respond(request, *found, streaming=True)
+
+    async def __acall__(self, request):
+        found = await sync_to_async(self._find)(request) if request.path.startswith(self.prefix) else None
+        if found is None:
+            return await self.get_response(request)
+        # a FileResponse would iterate a sync file under ASGI; these are small
+        return await sync_to_async(self._respond)(request, *found, streaming=False)
+
+    def _find(self, request):
+        if request.method not in ('GET', 'HEAD') or not request.path.startswith(self.prefix):
+            return None
+        name = request.path[len(self.prefix):]
+        try:
+            path = safe_join(self.root, name)
+        except SuspiciousFileOperation:
+            return None
+        if not os.path.isfile(path):
+            return None
+        return name, path
+
+    def _respond(self, request, name, path, streaming=True):
+        served, encoding = path, None
+        accepted = accepted_encodings(request.headers.get('Accept-Encoding'))
+        has_variants = False
+        for coding, suffix in ENCODINGS:
+            if os.path.isfile(path + suffix):
+                has_variants = True
+                if encoding is None and coding in accepted:
+                    served, encoding = path + suffix, coding
+
+        stat = os.stat(path)
+        # each encoding is its own representation and needs its own strong validator
+        etag = f'"{stat.st_mtime_ns:x}-{stat.st_size:x}{"-" + encoding if encoding else ""}"'
+        headers = {
+            'Cache-Control': IMMUTABLE if name in self.immutable else
+            f'public, max-age={getattr(settings, "STATIC_MAX_AGE", 60)}',
+            'ETag': etag,
+            'Last-Modified': formatdate(stat.st_mtime, usegmt=True),
+        }
+        if has_variants:
+            headers['Vary'] = 'Accept-Encoding'
+
+        if_none_match = request.headers.get('If-None-Match')
+        since = parse_http_date_safe(request.headers.get('If-Modified-Since') or '')
+        # If-None-Match uses the weak comparison
+        tags = {tag.removeprefix('W/') for tag in parse_etags(if_none_match or '')}
+        if (if_none_match and (etag in tags or '*' in tags)) or (
+            not if_none_match and since is not None and int(stat.st_mtime) <= since
+        ):
+            response = HttpResponseNotModified()
+            for header, value in headers.items():
+                response[header] = value
+            return response
+
+        content_type, _ = mimetypes.guess_type(path)
+        content_type = content_type or 'application/octet-stream'
+        if content_type.startswith('text/') or content_type in ('application/javascript', 'text/javascript'):
+            content_type += '; charset=utf-8'
+        if request.method == 'HEAD':
+            response = HttpResponse(content_type=content_type)
+            response['Content-Length'] = os.path.getsize(served)
+        elif streaming:
+            response = FileResponse(open(served, 'rb'), content_type=content_type)
+        else:
+            with open(served, 'rb') as fh:
+                response = HttpResponse(fh.read(), content_type=content_type)
+        if encoding:
+            response['Content-Encoding'] = encoding
+        for header, value in headers.items():
+            response[header] = value
+        return response
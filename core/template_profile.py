@@ -0,0 +1,90 @@
+import time
+from collections import Counter
+from contextlib import contextmanager
+from contextvars import ContextVar
+from dataclasses import dataclass, field
+
+from django.template.base import Node, TextNode, VariableNode
+
+# Template render profiling (TEMPLATE_PROFILING=1, or the profile_templates
+# command).
+#
+# install() wraps Node.render_annotated, the entry point Django uses for
+# every node it renders. Inside profile() each node's self time (its own
+# time minus that of the nodes nested in it) is added up per template and per
+# tag, so "{% for %}" only gets the loop overhead and the work done inside it
+# is charged to the tags that did it. Outside profile() the wrapper is one
+# ContextVar lookup per node.
+
+_current = ContextVar('template_profile', default=None)
+_original_render_annotated = Node.render_annotated
+
+
+@dataclass
+class TemplateProfile:
+    by_template: Counter = field(default_factory=Counter)
+    by_tag: Counter = field(default_factory=Counter)
+    tag_calls: Counter = field(default_factory=Counter)
+    # child time accumulated for each node still being rendered
+    _stack: list = field(default_factory=list)
+
+    def top_tags(self, limit=10):
+        return [(tag, round(ms, 2), self.tag_calls[tag]) for tag, ms in self.by_tag.most_common(limit)]
+
+    def top_templates(self, limit=10):
+        return [(name, round(ms, 2)) for name, ms in self.by_template.most_common(limit)]
+
+
+def tag_name(node):
+    """A short label for the node: '{% url %}', '{{ |truncatewords }}'..."""
+    if isinstance(node, VariableNode):
+        filters = ''.join(f'|{func.__name__}' for func, _ in node.filter_expression.filters)
+        return f'{{{{ {filters} }}}}' if filters else '{{ }}'
+    token = getattr(node, 'token', None)
+    if token is not None and token.contents:
+        return f'{{% {token.contents.split()[0]} %}}'
+    return type(node).__name__
+
+
+def _profiled_render_annotated(self, context):
+    profile = _current.get()
+    if profile is None or isinstance(self, TextNode):
+        return _original_render_annotated(self, context)
+    profile._stack.append(0.0)
+    started = time.perf_counter()
+    try:
+        return _original_render_annotated(self, context)
+    finally:
+        elapsed = (time.perf_counter() - started) * 1000
+        children = profile._stack.pop()
+        if profile._stack:
+            profile._stack[-1] += elapsed
+        own = elapsed - children
+        origin = getattr(self, 'origin', None)
+        profile.by_template[getattr(origin, 'template_name', None) or '<string>'] += own
+        label = tag_name(self)
+        profile.by_tag[label] += own
+        profile.tag_calls[label] += 1
+
+
+def install():
+    Node.render_annotated = _profiled_render_annotated
+
+
+def uninstall():
+    Node.render_annotated = _original_render_annotated
+
+
+def current_profile():
+    return _current.get()
+
+
+@contextmanager
+def profile():
+    """Collect a TemplateProfile for everything rendered in the block."""
+    result = TemplateProfile()
+    token = _current.set(result)
+    try:
+        yield result
+    finally:
+        _current.reset(token)
@@ -0,0 +1,58 @@
+from django import template
+from django.conf import settings
+from django.core.cache import cache
+from django.template import Context, Engine
+from django.utils.safestring import mark_safe
+
+from core.catalog import render_product_cards
+from core.roles import nav_role
+
+register = template.Library()
+
+# Cached fragments of the shared layout (see base.html and product_grid.html).
+
+
+def _nav_key(role):
+    return f'fragment:nav:{getattr(settings, "TEMPLATE_FRAGMENT_VERSION", "1")}:{role}'
+
+
+def _render_nav(engine, role):
+    return engine.get_template('includes/nav.html').render(Context({'role': role}))
+
+
+@register.simple_tag(takes_context=True)
+def site_nav(context):
+    """The navbar, rendered once per role rather than once per request."""
+    request = context.get('request')
+    html = getattr(request, '_site_nav', None)
+    if html is None:
+        role = nav_role(getattr(request, 'user', None))
+        key = _nav_key(role)
+        html = cache.get(key)
+        if html is None:
+            html = _render_nav(context.template.engine, role)
+            cache.set(key, html, getattr(settings, 'NAV_CACHE_TIMEOUT', 3600))
+    return mark_safe(html)
+
+
+async def aload_site_nav(request):
+    """Fetch the navbar for an async view before it renders, as templates cannot await.
+
+    request.user and its groups must be loaded already.
+    """
+    role = nav_role(request.user)
+    key = _nav_key(role)
+    html = await cache.aget(key)
+    if html is None:
+        html = _render_nav(Engine.get_default(), role)
+        await cache.aset(key, html, getattr(settings, 'NAV_CACHE_TIMEOUT', 3600))
+    request._site_nav = html
+
+
+@register.simple_tag(takes_context=True)
+def product_cards(context, products):
+    # async views pass the cards they fetched with arender_product_cards
+    cards = context.get('rendered_cards')
+    if cards is None:
+        cards = render_product_cards(products)
+    return mark_safe(''.join(cards))
@@ -1,11 +1,11 @@
 from django import template
 
+from core.roles import user_in_group
+
 register = template.Library()
 
 @register.filter
 
 def in_group(user, group_name):
     """Return True if the user is in the given group."""
-    if not user.is_authenticated:
-        return False
-    return user.groups.filter(name=group_name).exists()
+    return user_in_group(user, group_name)
@@ -1,5 +1,8 @@
-from django.test import TestCase
+from django.db import connection
+from django.test import RequestFactory, SimpleTestCase, TestCase
+from django.test.utils import CaptureQueriesContext
 from django.urls import reverse
+from .cart_store import load_items
 from .models import Order, Supplier, Product, OrderItem
 from django.contrib.auth.models import User
 
@@ -9,6 +12,9 @@ class BuyerPagesTests(TestCase):
         # create two orders by two buyers
         Order.objects.create(buyer_name="Alice", buyer_email="alice@example.com", buyer_phone="123", status='completed')
         Order.objects.create(buyer_name="Bob", buyer_email="bob@example.com", buyer_phone="456", status='completed')
+        # orders inserted directly bypass checkout, so rebuild the directory
+        from .buyers import rebuild_buyers
+        rebuild_buyers()
 
     def test_buyer_list_page(self):
         # ensure authenticated user can view buyer list
@@ -201,3 +207,1595 @@ class SignupTests(TestCase):
         self.assertEqual(response.url, reverse('home'))
         user = User.objects.get(username='selleruser')
         self.assertTrue(user.groups.filter(name='seller').exists())
+
+
+class ProductCatalogTests(TestCase):
+    def setUp(self):
+        from django.core.cache import cache
+        cache.clear()
+        self.supplier = Supplier.objects.create(name='ACME Supplies')
+        for name in ['Bolts', 'Anchors', 'Clamps', 'Drills', 'Epoxy']:
+            Product.objects.create(name=name, price='1.00', supplier=self.supplier, stock=10)
+
+    def test_keyset_pages_follow_name_order(self):
+        with self.settings(CATALOG_PAGE_SIZE=2):
+            response = self.client.get(reverse('product_list'))
+            self.assertContains(response, 'Anchors')
+            self.assertContains(response, 'Bolts')
+            self.assertNotContains(response, 'Clamps')
+            self.assertContains(response, '?after=')
+
+            from .catalog import get_catalog_page
+            first = get_catalog_page()
+            second = get_catalog_page(first.next_cursor)
+            third = get_catalog_page(second.next_cursor)
+        self.assertEqual([p.name for p in second.items], ['Clamps', 'Drills'])
+        self.assertEqual([p.name for p in third.items], ['Epoxy'])
+        self.assertFalse(third.has_next)
+
+    def test_supplier_is_joined_and_page_is_cached(self):
+        from .catalog import get_catalog_page
+        with self.assertNumQueries(1):
+            page = get_catalog_page()
+            names = [product.supplier.name for product in page.items]
+        self.assertEqual(names, ['ACME Supplies'] * 5)
+
+        self.client.get(reverse('product_list'))
+        with self.assertNumQueries(0):
+            response = self.client.get(reverse('product_list'))
+        self.assertContains(response, 'Anchors')
+
+    def test_saving_product_or_supplier_invalidates_cached_page(self):
+        self.client.get(reverse('product_list'))
+        product = Product.objects.get(name='Bolts')
+        product.name = 'Hex Bolts'
+        product.save()
+        self.assertContains(self.client.get(reverse('product_list')), 'Hex Bolts')
+
+        self.supplier.name = 'ACME Industrial'
+        self.supplier.save()
+        self.assertContains(self.client.get(reverse('product_list')), 'ACME Industrial')
+
+    def test_invalid_cursor_restarts_from_first_page(self):
+        response = self.client.get(reverse('product_list'), {'after': 'not-a-cursor'})
+        self.assertEqual(response.status_code, 200)
+        self.assertContains(response, 'Anchors')
+
+    def test_page_cache_is_keyed_by_decoded_cursor(self):
+        from .catalog import get_catalog_page, render_catalog_page
+        with self.settings(CATALOG_PAGE_SIZE=2):
+            cursor = get_catalog_page().next_cursor
+            render_catalog_page(cursor)
+            # the same cursor with its base64 padding restored hits the same entry
+            with self.assertNumQueries(0):
+                _, page = render_catalog_page(cursor + '=' * (-len(cursor) % 4))
+            self.assertIsNone(page)
+            for junk in ('not-a-cursor', 'junk-1', 'junk-2'):
+                _, page = render_catalog_page(junk)
+                self.assertEqual([p.name for p in page.items], ['Anchors', 'Bolts'])
+            _, page = render_catalog_page('not-a-cursor')
+        self.assertIsNotNone(page)
+
+
+
+class SupplierDirectoryTests(TestCase):
+    def setUp(self):
+        self.suppliers = [Supplier.objects.create(name=f'Supplier {letter}') for letter in 'CAB']
+        for index, supplier in enumerate(self.suppliers):
+            for n in range(index + 1):
+                Product.objects.create(name=f'{supplier.name} item {n}', price=f'{n + 1}.50', supplier=supplier, stock=2)
+
+    def test_directory_summaries_take_two_queries_per_page(self):
+        from decimal import Decimal
+        from .catalog import get_supplier_page
+        with self.assertNumQueries(2):
+            page = get_supplier_page(page_size=2)
+        self.assertEqual([s.name for s in page.items], ['Supplier A', 'Supplier B'])
+        supplier_a = page.items[0]
+        self.assertEqual(supplier_a.product_count, 2)
+        self.assertEqual((supplier_a.min_price, supplier_a.max_price), (Decimal('1.50'), Decimal('2.50')))
+        self.assertEqual(supplier_a.stock_value, Decimal('8.00'))
+        last = get_supplier_page(page.next_cursor, page_size=2)
+        self.assertEqual([s.name for s in last.items], ['Supplier C'])
+        self.assertFalse(last.has_next)
+
+    def test_directory_query_count_does_not_grow_with_suppliers(self):
+        self.client.get(reverse('supplier_list'))
+        with CaptureQueriesContext(connection) as few:
+            self.client.get(reverse('supplier_list'))
+        Supplier.objects.create(name='Supplier Z')
+        with CaptureQueriesContext(connection) as more:
+            response = self.client.get(reverse('supplier_list'))
+        self.assertContains(response, 'No products from this supplier yet.')
+        self.assertEqual(len(more.captured_queries), len(few.captured_queries))
+
+    def test_supplier_catalog_pages_only_its_products(self):
+        supplier_b = self.suppliers[2]
+        url = reverse('supplier_detail', args=[supplier_b.id])
+        with self.settings(CATALOG_PAGE_SIZE=2):
+            response = self.client.get(url)
+            self.assertContains(response, 'Supplier B item 1')
+            self.assertNotContains(response, 'Supplier A item')
+            page = response.context['page']
+            self.assertContains(response, f'{url}?after={page.next_cursor}')
+            response = self.client.get(url, {'after': page.next_cursor})
+        self.assertEqual([p.name for p in response.context['page'].items], ['Supplier B item 2'])
+        self.assertEqual(response.context['supplier'].product_count, 3)
+        self.assertEqual(self.client.get(reverse('supplier_detail', args=[0])).status_code, 404)
+
+
+class CartSnapshotTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user('bulkbuyer', 'bulk@example.com', 'pw')
+        self.supplier = Supplier.objects.create(name='Bulk Supplier')
+        self.products = [
+            Product.objects.create(name=f'Item {i}', price='2.50', supplier=self.supplier, stock=10)
+            for i in range(30)
+        ]
+
+    def test_snapshot_uses_one_query_and_keeps_cart_order(self):
+        from .cart import build_cart_snapshot
+        cart_items = {str(product.id): 2 for product in reversed(self.products)}
+        cart_items['999999'] = 1
+        cart_items['not-an-id'] = 1
+        with self.assertNumQueries(1):
+            snapshot = build_cart_snapshot(cart_items)
+        self.assertEqual([line.product.id for line in snapshot.lines], [p.id for p in reversed(self.products)])
+        self.assertEqual(str(snapshot.total_price), '150.00')
+        self.assertEqual(snapshot.count, 60)
+        self.assertEqual(snapshot.missing, [999999])
+
+    def test_snapshot_caps_to_stock(self):
+        from .cart import build_cart_snapshot
+        snapshot = build_cart_snapshot({str(self.products[0].id): 25})
+        self.assertEqual(snapshot.normalized, {str(self.products[0].id): 10})
+        self.assertTrue(snapshot.lines[0].capped)
+
+    def test_cart_page_query_count_does_not_grow_with_lines(self):
+        from .cart_store import set_quantities
+        self.client.login(username='bulkbuyer', password='pw')
+        self.client.get(reverse('cart'))
+        cart_id = self.client.session['cart_id']
+        set_quantities(cart_id, {self.products[0].id: 1})
+        with CaptureQueriesContext(connection) as small:
+            self.client.get(reverse('cart'))
+
+        set_quantities(cart_id, {product.id: 1 for product in self.products})
+        with CaptureQueriesContext(connection) as large:
+            response = self.client.get(reverse('cart'))
+        self.assertContains(response, 'Item 29')
+        self.assertEqual(len(small.captured_queries), len(large.captured_queries))
+
+    def test_checkout_reports_stock_that_ran_out(self):
+        self.client.login(username='bulkbuyer', password='pw')
+        session = self.client.session
+        session['cart'] = {str(self.products[0].id): 4}
+        session.save()
+        Product.objects.filter(id=self.products[0].id).update(stock=3)
+
+        response = self.client.post(reverse('checkout'), data={
+            'buyer_name': 'Bulk Buyer',
+            'buyer_email': 'bulk@example.com',
+        })
+        self.assertContains(response, 'Insufficient stock for Item 0')
+        self.assertEqual(Order.objects.count(), 0)
+        self.assertEqual(load_items(self.client.session['cart_id']), {str(self.products[0].id): 3})
+
+
+class CheckoutPipelineTests(TestCase):
+    def setUp(self):
+        self.supplier = Supplier.objects.create(name='Flash Sale Supplier')
+        self.products = [
+            Product.objects.create(name=f'Deal {i}', price='4.00', supplier=self.supplier, stock=5)
+            for i in range(20)
+        ]
+
+    def _buyer(self):
+        return {'buyer_name': 'Flash Buyer', 'buyer_email': 'flash@example.com'}
+
+    def test_stock_is_decremented_in_one_update(self):
+        from .checkout import place_order
+        cart_items = {str(product.id): 2 for product in self.products}
+        with CaptureQueriesContext(connection) as captured:
+            result = place_order(cart_items, **self._buyer())
+        updates = [q for q in captured.captured_queries if q['sql'].startswith('UPDATE "core_product"')]
+        self.assertEqual(len(updates), 1)
+        self.assertEqual(str(result.order.total_price), '160.00')
+        self.assertEqual(set(Product.objects.values_list('stock', flat=True)), {3})
+
+    def test_conditional_update_refuses_to_oversell(self):
+        from .checkout import decrement_stock
+        first, second = self.products[:2]
+        self.assertEqual(decrement_stock({first.id: 5, second.id: 6}), 1)
+        first.refresh_from_db()
+        second.refresh_from_db()
+        self.assertEqual((first.stock, second.stock), (0, 5))
+
+    def test_lock_conflicts_are_retried(self):
+        from unittest import mock
+        from django.db import OperationalError
+        from . import checkout
+
+        calls = []
+        real_place_order_once = checkout._place_order_once
+
+        def flaky(cart_items, buyer, user=None):
+            calls.append(1)
+            if len(calls) == 1:
+                raise OperationalError('database is locked')
+            return real_place_order_once(cart_items, buyer, user)
+
+        with mock.patch.object(checkout, '_place_order_once', side_effect=flaky), \
+                mock.patch.object(checkout, 'connection', mock.Mock(in_atomic_block=False)), \
+                mock.patch.object(checkout.time, 'sleep') as sleep:
+            result = checkout.place_order({str(self.products[0].id): 1}, **self._buyer())
+        self.assertEqual(result.attempts, 2)
+        sleep.assert_called_once()
+
+    def test_non_retryable_errors_are_raised(self):
+        from unittest import mock
+        from django.db import OperationalError
+        from . import checkout
+
+        with mock.patch.object(checkout, '_place_order_once', side_effect=OperationalError('no such table')), \
+                mock.patch.object(checkout, 'connection', mock.Mock(in_atomic_block=False)):
+            with self.assertRaises(OperationalError):
+                checkout.place_order({str(self.products[0].id): 1}, **self._buyer())
+
+
+class StockReservationTests(TestCase):
+    def setUp(self):
+        self.supplier = Supplier.objects.create(name='Hold Supplier')
+        self.product = Product.objects.create(name='Pallet Wrap', price='3.00', supplier=self.supplier, stock=10)
+        self.alice = User.objects.create_user('alice', 'alice@example.com', 'pw')
+        self.bob = User.objects.create_user('bob', 'bob@example.com', 'pw')
+
+    def test_add_to_cart_counts_other_carts_holds(self):
+        self.client.login(username='alice', password='pw')
+        response = self.client.post(reverse('add_to_cart', args=[self.product.id]), data={'quantity': 7})
+        self.assertEqual(response.status_code, 200)
+
+        self.client.login(username='bob', password='pw')
+        response = self.client.post(reverse('add_to_cart', args=[self.product.id]), data={'quantity': 4})
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(response.json()['message'], 'Insufficient stock')
+        response = self.client.post(reverse('add_to_cart', args=[self.product.id]), data={'quantity': 3})
+        self.assertEqual(response.status_code, 200)
+
+    def test_update_cart_caps_to_available_to_promise(self):
+        from .reservations import set_hold
+        set_hold(self.alice, self.product, 6)
+        self.client.login(username='bob', password='pw')
+        self.client.post(reverse('update_cart', args=[self.product.id]), data={'quantity': 9})
+        self.assertEqual(load_items(self.client.session['cart_id']), {str(self.product.id): 4})
+
+    def test_holds_are_sharded_per_user_and_released(self):
+        from .models import HoldShard
+        from .reservations import available_to_promise, release_holds, set_hold
+        with self.settings(STOCK_HOLD_SHARDS=4):
+            set_hold(self.alice, self.product, 2)
+            set_hold(self.bob, self.product, 3)
+            set_hold(self.alice, self.product, 5)
+        self.assertEqual(
+            dict(HoldShard.objects.values_list('shard', 'reserved')),
+            {self.alice.pk % 4: 5, self.bob.pk % 4: 3},
+        )
+        self.assertEqual(available_to_promise([self.product])[self.product.id], 2)
+        self.assertEqual(available_to_promise([self.product], self.alice)[self.product.id], 7)
+
+        release_holds(self.alice)
+        self.assertEqual(available_to_promise([self.product])[self.product.id], 7)
+
+    def test_sweeper_expires_stale_holds_in_batches(self):
+        from datetime import timedelta
+        from django.utils import timezone
+        from .models import StockHold
+        from .reservations import available_to_promise, expire_holds, set_hold
+        for index in range(5):
+            user = User.objects.create_user(f'carter{index}', password='pw')
+            set_hold(user, self.product, 1)
+        set_hold(self.alice, self.product, 2)
+        StockHold.objects.exclude(user=self.alice).update(expires_at=timezone.now() - timedelta(minutes=1))
+
+        self.assertEqual(expire_holds(batch_size=2), 5)
+        self.assertEqual(StockHold.objects.count(), 1)
+        self.assertEqual(available_to_promise([self.product])[self.product.id], 8)
+
+    def test_checkout_releases_holds(self):
+        from .models import StockHold
+        self.client.login(username='alice', password='pw')
+        self.client.post(reverse('add_to_cart', args=[self.product.id]), data={'quantity': 2})
+        self.client.post(reverse('checkout'), data={'buyer_name': 'Alice', 'buyer_email': 'alice@example.com'})
+        self.assertFalse(StockHold.objects.exists())
+        self.product.refresh_from_db()
+        self.assertEqual(self.product.stock, 8)
+
+    def test_checkout_respects_other_carts_holds(self):
+        from datetime import timedelta
+        from django.utils import timezone
+        from .checkout import CheckoutError, place_order
+        from .models import StockHold
+        from .reservations import expire_holds, set_hold
+        set_hold(self.alice, self.product, 2)
+        StockHold.objects.filter(user=self.alice).update(expires_at=timezone.now() - timedelta(minutes=1))
+        expire_holds()
+        set_hold(self.bob, self.product, 10)
+
+        with self.assertRaises(CheckoutError):
+            place_order({str(self.product.id): 2}, 'Alice', 'alice@example.com', user=self.alice)
+        self.product.refresh_from_db()
+        self.assertEqual(self.product.stock, 10)
+        order = place_order({str(self.product.id): 10}, 'Bob', 'bob@example.com', user=self.bob).order
+        self.assertEqual(order.items.count(), 1)
+
+
+class BuyerDirectoryTests(TestCase):
+    def setUp(self):
+        User.objects.create_user('clerk', 'clerk@example.com', 'pw')
+        self.client.login(username='clerk', password='pw')
+
+    def test_checkout_maintains_buyer_summary(self):
+        from .models import Buyer
+        supplier = Supplier.objects.create(name='Directory Supplier')
+        product = Product.objects.create(name='Crate', price='12.50', supplier=supplier, stock=10)
+        for name, phone in [('Dana', '111'), ('Dana K.', '222')]:
+            session = self.client.session
+            session['cart'] = {str(product.id): 2}
+            session.save()
+            self.client.post(reverse('checkout'), data={
+                'buyer_name': name, 'buyer_email': 'dana@example.com', 'buyer_phone': phone,
+            })
+        from .outbox import drain_all
+        drain_all()
+        buyer = Buyer.objects.get(email='dana@example.com')
+        self.assertEqual((buyer.name, buyer.phone, buyer.order_count), ('Dana K.', '222', 2))
+        self.assertEqual(str(buyer.lifetime_value), '50.00')
+        self.assertEqual(buyer.last_order_at, Order.objects.latest('created_at').created_at)
+
+    def test_backfill_command_is_idempotent(self):
+        from django.core.management import call_command
+        from io import StringIO
+        from .models import Buyer
+        Order.objects.create(buyer_name='Old Name', buyer_email='eve@example.com', total_price='5.00')
+        Order.objects.create(buyer_name='Eve', buyer_email='eve@example.com', buyer_phone='9', total_price='7.00')
+        for _ in range(2):
+            call_command('backfill_buyers', stdout=StringIO())
+        buyer = Buyer.objects.get()
+        self.assertEqual((buyer.name, buyer.phone, buyer.order_count), ('Eve', '9', 2))
+        self.assertEqual(str(buyer.lifetime_value), '12.00')
+
+    def test_buyer_list_is_paginated_without_scanning_orders(self):
+        from .buyers import rebuild_buyers
+        for index in range(5):
+            Order.objects.create(buyer_name=f'Buyer {index}', buyer_email=f'b{index}@example.com')
+        rebuild_buyers()
+        with self.settings(BUYER_PAGE_SIZE=2):
+            with CaptureQueriesContext(connection) as captured:
+                response = self.client.get(reverse('buyer_list'))
+            self.assertContains(response, 'Buyer 4')
+            self.assertContains(response, 'Buyer 3')
+            self.assertNotContains(response, 'Buyer 2')
+            self.assertFalse(any('core_order' in q['sql'] for q in captured.captured_queries))
+
+            response = self.client.get(reverse('buyer_list'), {'after': response.context['page'].next_cursor})
+            self.assertContains(response, 'Buyer 2')
+            self.assertNotContains(response, 'Buyer 4')
+
+
+class ProductSearchTests(TestCase):
+    def setUp(self):
+        self.acme = Supplier.objects.create(name='ACME Safety')
+        self.other = Supplier.objects.create(name='Hardware Hub')
+        self.gloves = Product.objects.create(
+            name='Nitrile Gloves', description='Disposable, powder free', price='4.00', supplier=self.acme, stock=5)
+        self.tape = Product.objects.create(
+            name='Duct Tape', description='Pairs well with gloves', price='2.00', supplier=self.other, stock=5)
+
+    def test_prefix_match_ranks_name_above_description(self):
+        from .search import search
+        self.assertEqual(search('glov'), [self.gloves, self.tape])
+        self.assertEqual(search('nitr dispos'), [self.gloves])
+        self.assertEqual(search('acme'), [self.gloves])
+        self.assertEqual(search('  '), [])
+
+    def test_index_follows_product_and_supplier_changes(self):
+        from .search import search
+        self.tape.name = 'Gaffer Tape'
+        self.tape.save()
+        self.assertEqual(search('gaffer'), [self.tape])
+        self.assertEqual(search('duct'), [])
+
+        self.other.name = 'Builders Depot'
+        self.other.save()
+        self.assertEqual(search('builders'), [self.tape])
+
+        self.tape.delete()
+        self.assertEqual(search('gaffer'), [])
+
+    def test_search_page(self):
+        response = self.client.get(reverse('product_search'), {'q': 'gloves'})
+        self.assertContains(response, 'Nitrile Gloves')
+        self.assertContains(response, 'Duct Tape')
+        response = self.client.get(reverse('product_search'), {'q': 'zzz'})
+        self.assertContains(response, 'No products match')
+
+
+class CatalogImportTests(TestCase):
+    CSV = (
+        'sku,name,description,price,stock,supplier,supplier_email\n'
+        'A-1,Hex Bolt,M8 zinc,0.25,1000,Fastener Co,sales@fastener.example\n'
+        'A-2,Hex Nut,M8 zinc,0.10,2000,Fastener Co,\n'
+        'B-1,Cable Tie,200mm,"1,5",10,Wire World,\n'
+        ',Nameless,,1.00,1,Wire World,\n'
+    )
+
+    def _import(self, text, **kwargs):
+        from io import StringIO
+        from .importer import import_catalog
+        return import_catalog(StringIO(text), **kwargs)
+
+    def test_import_upserts_and_reports_invalid_rows(self):
+        stats = self._import(self.CSV, chunk_size=2)
+        self.assertEqual((stats.read, stats.written, stats.invalid), (4, 2, 2))
+        self.assertEqual(Supplier.objects.get(name='Fastener Co').contact_email, 'sales@fastener.example')
+        self.assertEqual(Product.objects.get(sku='A-2').supplier.name, 'Fastener Co')
+
+    def test_reimport_skips_unchanged_rows_and_updates_changed_ones(self):
+        self._import(self.CSV)
+        changed = self.CSV.replace('Hex Nut,M8 zinc,0.10', 'Hex Nut,M8 zinc,0.12')
+        with CaptureQueriesContext(connection) as captured:
+            stats = self._import(changed)
+        self.assertEqual((stats.written, stats.unchanged), (1, 1))
+        self.assertEqual(str(Product.objects.get(sku='A-2').price), '0.12')
+        self.assertEqual(Product.objects.count(), 2)
+        self.assertLess(len(captured.captured_queries), 10)
+
+        stats = self._import(changed)
+        self.assertEqual((stats.written, stats.unchanged), (0, 2))
+
+    def test_jsonl_import_updates_search_index(self):
+        from .search import search
+        lines = '\n'.join([
+            '{"sku": "J-1", "name": "Jute Twine", "price": "3.50", "stock": 4, "supplier": "Rope Works"}',
+            'not json',
+        ])
+        stats = self._import(lines, fmt='jsonl')
+        self.assertEqual((stats.written, stats.invalid), (1, 1))
+        self.assertEqual([p.sku for p in search('jute')], ['J-1'])
+
+
+class BenchmarkSuiteTests(TestCase):
+    def _call(self, *args, **kwargs):
+        from io import StringIO
+        from django.core.management import call_command
+        out = StringIO()
+        call_command(*args, stdout=out, stderr=StringIO(), **kwargs)
+        return out.getvalue()
+
+    def test_generator_is_deterministic(self):
+        from .models import Buyer
+        self._call('generate_load_data', suppliers=3, products=20, orders=15, buyers=4, seed=7, batch_size=8)
+        first = list(Product.objects.order_by('sku').values_list('name', 'price', 'stock'))
+        self.assertEqual(len(first), 20)
+        self.assertEqual(Order.objects.count(), 15)
+        self.assertTrue(OrderItem.objects.exists())
+        self.assertEqual(Buyer.objects.count(), len(set(Order.objects.values_list('buyer_email', flat=True))))
+
+        self._call('generate_load_data', suppliers=3, products=20, orders=15, buyers=4, seed=7, clear=True)
+        self.assertEqual(list(Product.objects.order_by('sku').values_list('name', 'price', 'stock')), first)
+
+    def test_runner_writes_json_and_enforces_budgets(self):
+        import json
+        import os
+        import tempfile
+        from django.core.management.base import CommandError
+        self._call('generate_load_data', suppliers=2, products=10, orders=5, buyers=2)
+        with tempfile.TemporaryDirectory() as tmp:
+            output = os.path.join(tmp, 'results.json')
+            self._call('run_benchmarks', repeat=1, warmup=0, only='product_list,cart', output=output)
+            with open(output) as fh:
+                report = json.load(fh)
+            self.assertEqual(set(report['results']), {'product_list', 'cart'})
+            self.assertEqual(report['results']['cart']['unexpected_status'], [])
+
+            budgets = os.path.join(tmp, 'budgets.json')
+            with open(budgets, 'w') as fh:
+                json.dump({'cart': {'queries': 0}}, fh)
+            with self.assertRaises(CommandError):
+                self._call('run_benchmarks', repeat=1, warmup=0, only='cart', budgets=budgets, enforce=True)
+
+
+class PerformanceMiddlewareTests(TestCase):
+    def setUp(self):
+        from django.core.cache import cache
+        cache.clear()
+        supplier = Supplier.objects.create(name='Perf Supplier')
+        self.product = Product.objects.create(name='Perf Widget', price='1.00', supplier=supplier, stock=3)
+
+    def test_sampled_request_gets_server_timing_and_histogram(self):
+        from .perf import histogram_report
+        with self.settings(PERF_SAMPLE_RATE=1.0):
+            response = self.client.get(reverse('product_detail', args=[self.product.id]))
+        self.assertIn('db;dur=', response['Server-Timing'])
+        self.assertIn('tpl;dur=', response['Server-Timing'])
+        report = histogram_report()
+        self.assertEqual(report['product_detail']['count'], 1)
+        self.assertGreaterEqual(report['product_detail']['mean_queries'], 1)
+
+    def test_perf_report_needs_a_shared_cache(self):
+        import shutil
+        import tempfile
+        from io import StringIO
+        from django.core.management import call_command
+        from django.core.management.base import CommandError
+        from .perf import record_histogram, registered_views
+        with self.assertRaisesMessage(CommandError, 'LocMemCache'):
+            call_command('perf_report', stdout=StringIO())
+
+        location = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, location)
+        with self.settings(CACHES={'default': {
+            'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache', 'LOCATION': location,
+        }}):
+            for view in ('cart', 'product_list', 'cart'):
+                record_histogram(view, 12.0, 2)
+            self.assertEqual(registered_views(), ['cart', 'product_list'])
+            out = StringIO()
+            call_command('perf_report', '--reset', stdout=out)
+            self.assertIn('product_list', out.getvalue())
+            self.assertEqual(registered_views(), [])
+
+    def test_unsampled_requests_are_untouched(self):
+        with self.settings(PERF_SAMPLE_RATE=0):
+            response = self.client.get(reverse('product_detail', args=[self.product.id]))
+        self.assertNotIn('Server-Timing', response)
+
+    def test_repeated_statements_and_session_cost_are_reported(self):
+        from .perf import RequestStats, _current, query_wrapper
+        stats = RequestStats()
+        token = _current.set(stats)
+        try:
+            with connection.execute_wrapper(query_wrapper):
+                for product_id in range(4):
+                    list(Product.objects.filter(id=product_id))
+                self.client.session.save()
+        finally:
+            _current.reset(token)
+        self.assertEqual(list(stats.duplicates().values()), [4])
+        self.assertGreaterEqual(stats.session_queries, 1)
+
+
+class RoleCacheTests(TestCase):
+    def setUp(self):
+        from django.contrib.auth.models import Group
+        from django.core.cache import cache
+        cache.clear()
+        self.seller_group, _ = Group.objects.get_or_create(name='seller')
+        self.user = User.objects.create_user(username='roles', password='pw')
+        self.client.login(username='roles', password='pw')
+
+    def _group_queries(self, path):
+        with CaptureQueriesContext(connection) as ctx:
+            response = self.client.get(path)
+        return response, [q['sql'] for q in ctx.captured_queries if 'auth_group' in q['sql']]
+
+    def test_warm_cache_serves_pages_without_group_queries(self):
+        self.user.groups.add(self.seller_group)
+        self.client.get(reverse('seller_dashboard'))
+        response, queries = self._group_queries(reverse('seller_dashboard'))
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(queries, [])
+
+    def test_membership_change_invalidates_cached_roles(self):
+        response, _ = self._group_queries(reverse('seller_dashboard'))
+        self.assertEqual(response.status_code, 403)
+        self.seller_group.user_set.add(self.user)
+        response, _ = self._group_queries(reverse('seller_dashboard'))
+        self.assertEqual(response.status_code, 200)
+        self.seller_group.user_set.clear()
+        response, _ = self._group_queries(reverse('seller_dashboard'))
+        self.assertEqual(response.status_code, 403)
+
+    def test_roles_cached_before_the_commit_are_dropped_on_commit(self):
+        from django.core.cache import cache
+        from .roles import _cache_key, get_group_names
+        self.user.groups.add(self.seller_group)
+        get_group_names(self.user)
+        with self.captureOnCommitCallbacks(execute=True):
+            self.user.groups.remove(self.seller_group)
+            # a request that read the groups before the removal committed
+            cache.set(_cache_key(self.user.pk), frozenset({'seller'}))
+        self.assertIsNone(cache.get(_cache_key(self.user.pk)))
+
+
+class TemplateRenderTests(TestCase):
+    def setUp(self):
+        from django.core.cache import cache
+        cache.clear()
+        self.supplier = Supplier.objects.create(name='Render Supplier')
+        self.products = [
+            Product.objects.create(name=f'Card {i}', description='word ' * 40, price='2.00', supplier=self.supplier, stock=4)
+            for i in range(3)
+        ]
+
+    def _profiled(self, path):
+        from . import template_profile
+        template_profile.install()
+        self.addCleanup(template_profile.uninstall)
+        with template_profile.profile() as result:
+            response = self.client.get(path)
+        return response, result
+
+    def test_product_cards_are_only_rendered_when_the_product_changes(self):
+        from .catalog import bump_catalog_version
+        response, result = self._profiled(reverse('product_list'))
+        self.assertContains(response, 'Card 2')
+        self.assertIn('includes/product_card.html', result.by_template)
+
+        bump_catalog_version()
+        response, result = self._profiled(reverse('product_list'))
+        self.assertContains(response, 'Card 2')
+        self.assertNotIn('includes/product_card.html', result.by_template)
+
+        self.products[1].stock = 1
+        self.products[1].save()
+        response, result = self._profiled(reverse('product_list'))
+        self.assertContains(response, 'Stock: 1')
+        self.assertEqual(result.tag_calls['{{ |truncatewords }}'], 1)
+
+    def test_nav_is_cached_per_role(self):
+        from django.contrib.auth.models import Group
+        dashboard = reverse('seller_dashboard')
+        self.assertNotContains(self.client.get(reverse('home')), dashboard)
+        member = User.objects.create_user(username='member', password='pw')
+        self.client.login(username='member', password='pw')
+        self.assertContains(self.client.get(reverse('home')), reverse('logout'))
+        self.assertNotContains(self.client.get(reverse('home')), dashboard)
+        member.groups.add(Group.objects.get_or_create(name='seller')[0])
+        response, result = self._profiled(reverse('home'))
+        self.assertContains(response, dashboard)
+        self.client.get(reverse('home'))
+        response, result = self._profiled(reverse('home'))
+        self.assertContains(response, dashboard)
+        self.assertNotIn('includes/nav.html', result.by_template)
+
+    def test_profiling_reports_self_time_per_template_and_tag(self):
+        import json
+        from . import template_profile
+        response, result = self._profiled(reverse('product_detail', args=[self.products[0].id]))
+        self.assertEqual(response.status_code, 200)
+        self.assertIn('product_detail.html', result.by_template)
+        self.assertIn('{% url %}', result.by_tag)
+        self.assertGreater(result.tag_calls['{{ }}'], 0)
+
+        template_profile.install()
+        with self.settings(PERF_SAMPLE_RATE=1.0, TEMPLATE_PROFILING=True), \
+                self.assertLogs('core.perf', 'INFO') as logs:
+            self.client.get(reverse('product_detail', args=[self.products[0].id]))
+        line = json.loads(logs.records[0].getMessage())
+        self.assertIn('product_detail.html', dict(line['template_self_ms']))
+
+    def test_pages_load_vendored_assets(self):
+        response = self.client.get(reverse('home'))
+        self.assertNotContains(response, 'cdn.jsdelivr.net')
+        self.assertNotContains(response, 'cdnjs.cloudflare.com')
+        self.assertContains(response, '/static/vendor/bootstrap/css/bootstrap.min.css')
+
+    def test_profile_templates_command(self):
+        from django.core.management import call_command
+        from io import StringIO
+        out = StringIO()
+        call_command('profile_templates', reverse('product_list'), '--repeat', '2', '--cold', stdout=out)
+        self.assertIn('includes/product_card.html', out.getvalue())
+        self.assertIn('{{ |truncatewords }}', out.getvalue())
+
+
+def _routed_alias(request, model=Product):
+    from django.db import router
+    from .routers import replica_reads
+
+    @replica_reads
+    def view(request):
+        return router.db_for_read(model)
+    return view(request)
+
+
+class ReplicaRoutingTests(SimpleTestCase):
+    # not a TestCase: its wrapping transaction would keep every read on the
+    # primary. Nothing here writes; 'default' is only needed for atomic().
+    databases = {'default'}
+
+    def setUp(self):
+        self.factory = RequestFactory()
+
+    def test_reads_stay_on_primary_without_replicas_or_outside_marked_views(self):
+        from django.db import router
+        self.assertEqual(_routed_alias(self.factory.get('/')), 'default')
+        with self.settings(REPLICA_DATABASE_ALIASES=['replica']):
+            self.assertEqual(router.db_for_read(Product), 'default')
+            self.assertEqual(router.db_for_write(Product), 'default')
+
+    def test_marked_views_read_from_replica_except_auth_and_transactions(self):
+        from django.db import router, transaction
+        from .routers import use_replica
+        with self.settings(REPLICA_DATABASE_ALIASES=['replica']):
+            self.assertEqual(_routed_alias(self.factory.get('/')), 'replica')
+            self.assertEqual(_routed_alias(self.factory.get('/'), model=User), 'default')
+            self.assertEqual(_routed_alias(self.factory.post('/')), 'default')
+            with use_replica(), transaction.atomic():
+                self.assertEqual(router.db_for_read(Product), 'default')
+
+
+class ReplicaPinTests(TestCase):
+    def test_writes_pin_the_client_to_the_primary(self):
+        from .routers import PIN_COOKIE
+        supplier = Supplier.objects.create(name='Pin Supplier')
+        product = Product.objects.create(name='Pin Widget', price='1.00', supplier=supplier, stock=5)
+        User.objects.create_user(username='pinned', password='pw')
+        self.client.login(username='pinned', password='pw')
+        with self.settings(REPLICA_DATABASE_ALIASES=['replica']):
+            response = self.client.post(reverse('add_to_cart', args=[product.id]), {'quantity': 1})
+            self.assertIn(PIN_COOKIE, response.cookies)
+            request = RequestFactory().get('/')
+            request.COOKIES[PIN_COOKIE] = response.cookies[PIN_COOKIE].value
+            self.assertEqual(_routed_alias(request), 'default')
+
+
+class ConnectionPoolStatsTests(TestCase):
+    def test_connects_are_counted_per_alias(self):
+        from django.db import connections
+        from django.db.backends.signals import connection_created
+        from .dbpool import pool_stats, reset_connects
+        reset_connects()
+        connection = connections['default']
+        connection_created.send(sender=connection.__class__, connection=connection)
+        stats = pool_stats()
+        self.assertEqual(stats['default'], {'pooled': False, 'connects': 1})
+
+    def test_benchmark_reports_connection_reuse(self):
+        from io import StringIO
+        from django.core.management import call_command
+        out = StringIO()
+        call_command('benchmark_db_pool', threads=2, requests=3, stdout=out)
+        self.assertIn('6 requests from 2 workers', out.getvalue())
+        self.assertIn('requests per connection', out.getvalue())
+
+
+class CartStoreTests(TestCase):
+    def setUp(self):
+        supplier = Supplier.objects.create(name='Store Supplier')
+        self.products = [
+            Product.objects.create(name=f'Store Item {i}', price='2.00', supplier=supplier, stock=20)
+            for i in range(3)
+        ]
+        self.user = User.objects.create_user(username='keeper', password='pw')
+
+    def test_line_changes_write_cart_rows_not_the_session(self):
+        from .models import CartItem
+        self.client.login(username='keeper', password='pw')
+        self.client.post(reverse('add_to_cart', args=[self.products[0].id]), {'quantity': 1})
+        with CaptureQueriesContext(connection) as ctx:
+            response = self.client.post(reverse('add_to_cart', args=[self.products[0].id]), {'quantity': 2})
+        self.assertEqual(response.json()['cart_count'], 3)
+        self.assertFalse([q for q in ctx.captured_queries if q['sql'].startswith('UPDATE "django_session"')])
+        self.assertNotIn('cart', self.client.session)
+
+        self.client.post(reverse('update_cart', args=[self.products[0].id]), {'quantity': 5})
+        self.client.post(reverse('add_to_cart', args=[self.products[1].id]), {'quantity': 1})
+        self.client.post(reverse('remove_from_cart', args=[self.products[1].id]))
+        self.assertEqual(
+            list(CartItem.objects.filter(cart__user=self.user).values_list('product_id', 'quantity')),
+            [(self.products[0].id, 5)],
+        )
+
+    def test_session_cart_is_moved_into_the_store_at_login(self):
+        session = self.client.session
+        session['cart'] = {str(self.products[0].id): 2, str(self.products[2].id): 1, '999999': 1}
+        session.save()
+        self.client.login(username='keeper', password='pw')
+        self.assertNotIn('cart', self.client.session)
+        self.assertEqual(
+            load_items(self.client.session['cart_id']),
+            {str(self.products[0].id): 2, str(self.products[2].id): 1},
+        )
+
+    def test_cart_follows_the_user_across_devices(self):
+        from django.test import Client
+        self.client.login(username='keeper', password='pw')
+        self.client.post(reverse('add_to_cart', args=[self.products[2].id]), {'quantity': 4})
+        other_device = Client()
+        other_device.login(username='keeper', password='pw')
+        response = other_device.get(reverse('cart'))
+        self.assertContains(response, 'Store Item 2')
+        self.assertEqual(response.context['cart_count'], 4)
+
+
+class QuickOrderTests(TestCase):
+    def setUp(self):
+        supplier = Supplier.objects.create(name='Pad Supplier')
+        self.products = Product.objects.bulk_create([
+            Product(name=f'Pad Item {i}', sku=f'PAD-{i:04d}', price='1.00', supplier=supplier, stock=5)
+            for i in range(1000)
+        ])
+        User.objects.create_user(username='padder', password='pw')
+        self.client.login(username='padder', password='pw')
+
+    def _post_json(self, lines):
+        import json
+        return self.client.post(reverse('quick_order'), json.dumps({'lines': lines}), content_type='application/json')
+
+    def test_each_line_is_accepted_capped_or_rejected(self):
+        from .models import StockHold
+        first, second = self.products[0], self.products[1]
+        response = self._post_json([
+            {'sku': first.sku, 'quantity': 3},
+            {'product_id': second.id, 'quantity': 9},
+            {'sku': 'NOPE', 'quantity': 1},
+            {'sku': first.sku, 'quantity': 0},
+            {'sku': first.sku, 'quantity': 4},
+        ])
+        payload = response.json()
+        self.assertEqual([line['status'] for line in payload['lines']],
+                         ['accepted', 'capped', 'rejected', 'rejected', 'capped'])
+        self.assertEqual([line['quantity'] for line in payload['lines']], [3, 5, 0, 0, 2])
+        self.assertEqual((payload['accepted'], payload['capped'], payload['rejected']), (1, 2, 2))
+        self.assertEqual(load_items(self.client.session['cart_id']), {str(first.id): 5, str(second.id): 5})
+        self.assertEqual(StockHold.objects.get(product=first).quantity, 5)
+
+    def test_pasted_csv_renders_the_results(self):
+        csv_text = f'sku;quantity\n{self.products[2].sku};2\n{self.products[3].id};1\n'
+        response = self.client.post(reverse('quick_order'), {'csv': csv_text})
+        self.assertContains(response, '2 accepted, 0 capped, 0 rejected')
+        self.assertEqual(
+            load_items(self.client.session['cart_id']),
+            {str(self.products[2].id): 2, str(self.products[3].id): 1},
+        )
+
+    def test_first_line_with_a_typo_is_rejected_not_skipped(self):
+        from .quick_order import parse_csv
+        lines = parse_csv(f'{self.products[0].sku},1O\n{self.products[1].sku},2\n')
+        self.assertEqual([(line.line, line.requested) for line in lines], [(1, 0), (2, 2)])
+        self.assertEqual([line.line for line in parse_csv('SKU\tQty\nPAD-0001\t2\n')], [2])
+
+    def test_a_thousand_lines_take_a_handful_of_statements(self):
+        with CaptureQueriesContext(connection) as ctx:
+            response = self._post_json([[product.sku, 1] for product in self.products])
+        self.assertEqual(response.json()['accepted'], 1000)
+        # only bulk_create's own batching (SQLite parameter limits) adds statements
+        self.assertLess(len(ctx.captured_queries), 40)
+
+    def test_too_many_lines_are_refused(self):
+        with self.settings(QUICK_ORDER_MAX_LINES=2):
+            response = self._post_json([['PAD-0000', 1]] * 3)
+        self.assertEqual(response.status_code, 400)
+
+
+def _async_urlconf():
+    from django.urls import include, path
+    from . import async_views
+    from .urls import build_urlpatterns
+    return type('AsyncURLConf', (), {'urlpatterns': [path('', include(build_urlpatterns(async_views)))]})
+
+
+class AsyncViewTests(TestCase):
+    def setUp(self):
+        from django.core.cache import cache
+        cache.clear()
+        supplier = Supplier.objects.create(name='Async Supplier')
+        self.product = Product.objects.create(name='Async Item', price='4.00', supplier=supplier, stock=3)
+        self.user = User.objects.create_user(username='awaiter', password='pw')
+        urlconf = self.settings(ROOT_URLCONF=_async_urlconf())
+        urlconf.enable()
+        self.addCleanup(urlconf.disable)
+
+    async def test_catalog_and_detail_render(self):
+        response = await self.async_client.get(reverse('product_list'))
+        self.assertContains(response, 'Async Item')
+        response = await self.async_client.get(reverse('product_detail', args=[self.product.id]))
+        self.assertContains(response, 'Async Supplier')
+        response = await self.async_client.get(reverse('product_detail', args=[999999]))
+        self.assertEqual(response.status_code, 404)
+
+    async def test_pages_make_no_blocking_cache_calls_on_the_event_loop(self):
+        import asyncio
+        from unittest import mock
+        from django.core.cache.backends.locmem import LocMemCache
+        on_loop = []
+
+        def guard(name):
+            real = getattr(LocMemCache, name)
+
+            def call(backend, *args, **kwargs):
+                try:
+                    asyncio.get_running_loop()
+                    on_loop.append(name)
+                except RuntimeError:
+                    pass  # a worker thread, via the a* methods
+                return real(backend, *args, **kwargs)
+            return call
+
+        names = ('get', 'set', 'add', 'get_many', 'set_many', 'incr')
+        with mock.patch.multiple(LocMemCache, **{name: guard(name) for name in names}):
+            with self.settings(PERF_SAMPLE_RATE=0):
+                for _ in range(2):
+                    await self.async_client.get(reverse('product_list'))
+                    await self.async_client.get(reverse('product_detail', args=[self.product.id]))
+        self.assertEqual(on_loop, [])
+
+    async def test_add_to_cart_holds_stock_and_counts(self):
+        await self.async_client.alogin(username='awaiter', password='pw')
+        url = reverse('add_to_cart', args=[self.product.id])
+        response = await self.async_client.post(url, {'quantity': 2})
+        self.assertEqual(response.json()['cart_count'], 2)
+        response = await self.async_client.post(url, {'quantity': 2})
+        self.assertEqual(response.status_code, 400)
+        response = await self.async_client.get(reverse('cart_count'))
+        self.assertEqual(response.json(), {'cart_count': 2})
+
+    async def test_sampled_async_request_counts_its_queries(self):
+        from .perf import histogram_report
+        with self.settings(PERF_SAMPLE_RATE=1.0):
+            response = await self.async_client.get(reverse('product_detail', args=[self.product.id]))
+        self.assertIn('db;dur=', response['Server-Timing'])
+        self.assertGreaterEqual(histogram_report()['product_detail']['mean_queries'], 1)
+
+    def test_sync_cart_count_matches(self):
+        self.client.login(username='awaiter', password='pw')
+        with self.settings(ROOT_URLCONF='wholeseller.urls'):
+            self.client.post(reverse('add_to_cart', args=[self.product.id]), {'quantity': 3})
+            self.assertEqual(self.client.get(reverse('cart_count')).json(), {'cart_count': 3})
+
+
+class CatalogApiTests(TestCase):
+    def setUp(self):
+        self.supplier = Supplier.objects.create(name='Api Supplier')
+        self.products = [
+            Product.objects.create(name=f'Api Item {i}', sku=f'API-{i}', price='3.50', supplier=self.supplier, stock=9)
+            for i in range(5)
+        ]
+
+    def test_pages_follow_the_cursor_with_selected_fields(self):
+        url = reverse('api_products')
+        first = self.client.get(url, {'fields': 'id,name,supplier', 'limit': 3}).json()
+        self.assertEqual(first['results'][0], {
+            'id': self.products[0].id, 'name': 'Api Item 0',
+            'supplier': {'id': self.supplier.id, 'name': 'Api Supplier'},
+        })
+        second = self.client.get(first['next']).json()
+        self.assertEqual([item['name'] for item in second['results']], ['Api Item 3', 'Api Item 4'])
+        self.assertIsNone(second['next'])
+        response = self.client.get(url, {'fields': 'id,cost'})
+        self.assertEqual(response.status_code, 400)
+
+    def test_unchanged_page_is_not_modified(self):
+        url = reverse('api_products')
+        response = self.client.get(url)
+        etag = response['ETag']
+        with CaptureQueriesContext(connection) as ctx:
+            again = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(again.status_code, 304)
+        self.assertLessEqual(len(ctx.captured_queries), 2)
+        since = self.client.get(url, HTTP_IF_MODIFIED_SINCE=response['Last-Modified'])
+        self.assertEqual(since.status_code, 304)
+
+        self.products[1].price = '4.00'
+        self.products[1].save()
+        changed = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(changed.status_code, 200)
+        self.assertNotEqual(changed['ETag'], etag)
+
+    def test_changed_since_returns_updates_and_deletions(self):
+        from datetime import timedelta
+        from django.utils import timezone
+        from .checkout import decrement_stock
+        url = reverse('api_products')
+        yesterday = (timezone.now() - timedelta(days=1)).isoformat()
+        with self.settings(API_SYNC_SETTLE_SECONDS=0):
+            token = self.client.get(url, {'changed_since': yesterday}).json()['sync_token']
+            unchanged = self.client.get(url, {'changed_since': token}).json()
+            self.assertEqual((unchanged['results'], unchanged['deleted']), ([], []))
+
+            decrement_stock({self.products[2].id: 4})
+            deleted_id = self.products[4].id
+            self.products[4].delete()
+            feed = self.client.get(url, {'changed_since': token, 'fields': 'id,stock'}).json()
+            self.assertEqual(feed['results'], [{'id': self.products[2].id, 'stock': 5}])
+            self.assertEqual(feed['deleted'], [deleted_id])
+            self.assertGreater(feed['sync_token'], token)
+
+    def test_renaming_a_supplier_changes_its_products(self):
+        from django.utils import timezone
+        before = timezone.now()
+        self.supplier.name = 'Renamed Supplier'
+        self.supplier.save()
+        self.assertEqual(Product.objects.filter(updated_at__gt=before).count(), 5)
+        response = self.client.get(reverse('api_suppliers'), {'fields': 'name'})
+        self.assertEqual(response.json()['results'], [{'name': 'Renamed Supplier'}])
+
+    def test_stale_changed_since_requires_a_full_sync(self):
+        response = self.client.get(reverse('api_products'), {'changed_since': '2001-01-01T00:00:00Z'})
+        self.assertEqual(response.status_code, 410)
+
+
+class OrderExportTests(TestCase):
+    def setUp(self):
+        from datetime import datetime, timezone as dt_timezone
+        from django.contrib.auth.models import Permission
+        supplier = Supplier.objects.create(name='Export Supplier')
+        product = Product.objects.create(name='Ledger', sku='LED-1', price='2.50', supplier=supplier, stock=100)
+        for day, status, email in [(3, 'completed', 'a@example.com'), (15, 'completed', 'b@example.com'),
+                                   (20, 'cancelled', 'a@example.com')]:
+            order = Order.objects.create(buyer_name='Buyer', buyer_email=email, status=status, total_price='5.00')
+            Order.objects.filter(pk=order.pk).update(created_at=datetime(2026, 9, day, 12, tzinfo=dt_timezone.utc))
+            OrderItem.objects.create(order=order, product=product, quantity=2, price='2.50')
+        self.accountant = User.objects.create_user(username='accountant', password='pw')
+        self.accountant.user_permissions.add(Permission.objects.get(codename='view_order'))
+        User.objects.create_user(username='clerk', password='pw')
+
+    def test_items_stream_as_csv_with_filters(self):
+        import csv
+        self.client.login(username='accountant', password='pw')
+        response = self.client.get(reverse('export_orders', args=['items']),
+                                   {'from': '2026-09-01', 'to': '2026-09-15', 'status': 'completed'})
+        self.assertTrue(response.streaming)
+        self.assertIn('order-items-2026-09-01-to-2026-09-15-completed.csv', response['Content-Disposition'])
+        rows = list(csv.DictReader(b''.join(response.streaming_content).decode().splitlines()))
+        self.assertEqual([row['buyer_email'] for row in rows], ['a@example.com', 'b@example.com'])
+        self.assertEqual((rows[0]['sku'], rows[0]['quantity'], rows[0]['unit_price']), ('LED-1', '2', '2.50'))
+
+    def test_orders_as_jsonl_for_one_buyer(self):
+        import json
+        self.client.login(username='accountant', password='pw')
+        response = self.client.get(reverse('export_orders', args=['orders']),
+                                   {'format': 'jsonl', 'buyer': 'A@example.com'})
+        lines = [json.loads(line) for line in b''.join(response.streaming_content).decode().splitlines()]
+        self.assertEqual([line['status'] for line in lines], ['completed', 'cancelled'])
+        self.assertEqual(lines[0]['total_price'], '5.00')
+
+    def test_buyer_filter_is_an_indexable_exact_match(self):
+        from .exports import ExportFilters
+        sql = str(ExportFilters.parse(buyer=' A@Example.com ').apply(Order.objects.all()).query)
+        self.assertNotIn('UPPER(', sql)
+        self.assertIn('a@example.com', sql)
+
+    def test_export_needs_permission_and_valid_filters(self):
+        self.client.login(username='clerk', password='pw')
+        self.assertEqual(self.client.get(reverse('export_orders', args=['items'])).status_code, 403)
+        self.client.login(username='accountant', password='pw')
+        response = self.client.get(reverse('export_orders', args=['items']), {'from': 'September'})
+        self.assertEqual(response.status_code, 400)
+
+    def test_without_server_side_cursors_rows_are_paged_by_key(self):
+        from .exports import ExportFilters, ExportStats, stream_export
+        settings_dict = connection.settings_dict
+        settings_dict['DISABLE_SERVER_SIDE_CURSORS'] = True
+        self.addCleanup(settings_dict.pop, 'DISABLE_SERVER_SIDE_CURSORS')
+        stats = ExportStats()
+        with CaptureQueriesContext(connection) as ctx:
+            chunks = list(stream_export('items', 'csv', ExportFilters(), stats=stats, size=2))
+        self.assertEqual(stats.rows, 3)
+        self.assertEqual(len(chunks), 2)
+        self.assertEqual(len(ctx.captured_queries), 2)
+
+    def test_command_writes_a_file(self):
+        import io
+        import os
+        import tempfile
+        from django.core.management import call_command
+        path = os.path.join(tempfile.mkdtemp(), 'items.csv')
+        stderr = io.StringIO()
+        call_command('export_orders', 'items', '--output', path, '--status', 'cancelled', stderr=stderr)
+        with open(path) as handle:
+            self.assertEqual(len(handle.read().splitlines()), 2)
+        self.assertIn('Exported 1 rows', stderr.getvalue())
+
+
+class AdminChangelistTests(TestCase):
+    def setUp(self):
+        supplier = Supplier.objects.create(name='Admin Supplier')
+        self.products = [
+            Product.objects.create(name=f'Admin Item {i}', sku=f'ADM-{i}', price='1.00', supplier=supplier, stock=5)
+            for i in range(3)
+        ]
+        self.orders = []
+        for i in range(6):
+            order = Order.objects.create(buyer_name=f'Buyer {i}', buyer_email=f'b{i}@example.com', total_price='3.00')
+            OrderItem.objects.bulk_create([
+                OrderItem(order=order, product=product, quantity=1, price='1.00') for product in self.products
+            ])
+            self.orders.append(order)
+        User.objects.create_superuser(username='admin', password='pw', email='admin@example.com')
+        self.client.login(username='admin', password='pw')
+
+    def test_order_item_changelist_has_no_per_row_queries(self):
+        url = reverse('admin:core_orderitem_changelist')
+        self.client.get(url)
+        with CaptureQueriesContext(connection) as few:
+            self.client.get(url)
+        OrderItem.objects.bulk_create([
+            OrderItem(order=self.orders[0], product=self.products[0], quantity=2, price='1.00') for _ in range(20)
+        ])
+        with CaptureQueriesContext(connection) as many:
+            response = self.client.get(url)
+        self.assertContains(response, 'Admin Item 0 x 2')
+        self.assertEqual(len(many.captured_queries), len(few.captured_queries))
+
+    def test_order_search_matches_id_or_exact_email(self):
+        url = reverse('admin:core_order_changelist')
+        response = self.client.get(url, {'q': str(self.orders[2].id)})
+        self.assertEqual(response.context['cl'].result_count, 1)
+        response = self.client.get(url, {'q': ' B4@Example.com '})
+        self.assertEqual([order.id for order in response.context['cl'].result_list], [self.orders[4].id])
+        response = self.client.get(url, {'q': 'example'})
+        self.assertEqual(response.context['cl'].result_count, 0)
+
+    def test_order_change_form_uses_autocomplete_for_products(self):
+        response = self.client.get(reverse('admin:core_order_change', args=[self.orders[0].id]))
+        self.assertContains(response, 'admin-autocomplete')
+        self.assertNotContains(response, f'<option value="{self.products[1].id}">Admin Item 1</option>')
+
+    def test_counts_stop_at_the_threshold(self):
+        from .pagination import EstimatedCountPaginator, estimated_count
+        queryset = OrderItem.objects.order_by('-pk')
+        with self.settings(ESTIMATED_COUNT_THRESHOLD=5):
+            with CaptureQueriesContext(connection) as ctx:
+                self.assertEqual(EstimatedCountPaginator(queryset.filter(order=self.orders[0]), 2).count, 3)
+            self.assertIn('LIMIT', ctx.captured_queries[0]['sql'])
+            # no planner statistics on SQLite: falls back to an exact count
+            self.assertIsNone(estimated_count(queryset))
+            self.assertEqual(EstimatedCountPaginator(queryset, 2).count, 18)
+
+
+class SalesRollupTests(TestCase):
+    def setUp(self):
+        from django.contrib.auth.models import Group
+        self.supplier = Supplier.objects.create(name='Rollup Supplier')
+        self.fast = Product.objects.create(name='Fast Mover', price='2.50', supplier=self.supplier, stock=12)
+        self.slow = Product.objects.create(name='Slow Mover', price='10.00', supplier=self.supplier, stock=500)
+        self.user = User.objects.create_user(username='seller', password='pw')
+        self.user.groups.add(Group.objects.get_or_create(name='seller')[0])
+
+    def _buy(self, quantities):
+        from .checkout import place_order
+        from .outbox import drain_all
+        cart = {str(product.id): quantity for product, quantity in quantities.items()}
+        order = place_order(cart, buyer_name='Rollup Buyer', buyer_email='rollup@example.com').order
+        drain_all()
+        return order
+
+    def _rollups(self):
+        from .models import SalesRollup
+        return {
+            (row.granularity, row.product_id): (row.units, row.revenue, row.order_lines)
+            for row in SalesRollup.objects.all()
+        }
+
+    def test_checkout_adds_to_hour_and_day_rollups(self):
+        from decimal import Decimal
+        self._buy({self.fast: 4, self.slow: 1})
+        self._buy({self.fast: 2})
+        rollups = self._rollups()
+        for granularity in ('hour', 'day'):
+            self.assertEqual(rollups[(granularity, self.fast.id)], (6, Decimal('15.00'), 2))
+            self.assertEqual(rollups[(granularity, self.slow.id)], (1, Decimal('10.00'), 1))
+
+    def test_rebuild_matches_incremental_rollups_without_cancelled_orders(self):
+        from datetime import timedelta
+        from django.utils import timezone
+        from .rollups import rebuild
+        self._buy({self.fast: 4, self.slow: 1})
+        cancelled = self._buy({self.fast: 2})
+        incremental = self._rollups()
+        Order.objects.filter(pk=cancelled.pk).update(status='cancelled')
+        written = rebuild(timezone.now() - timedelta(days=1), until=timezone.now() + timedelta(days=1))
+        self.assertEqual(written, 4)
+        rebuilt = self._rollups()
+        self.assertEqual(rebuilt[('day', self.slow.id)], incremental[('day', self.slow.id)])
+        self.assertEqual(rebuilt[('day', self.fast.id)][0], 4)
+
+    def test_rebuild_leaves_orders_with_pending_events_to_the_worker(self):
+        from datetime import timedelta
+        from django.db.models import Sum
+        from django.utils import timezone
+        from .checkout import place_order
+        from .models import SalesRollup
+        from .outbox import drain_all
+        from .rollups import rebuild
+        order = place_order({str(self.fast.id): 3}, buyer_name='Late', buyer_email='late@example.com').order
+        Order.objects.filter(pk=order.pk).update(created_at=timezone.now() - timedelta(hours=2))
+        rebuild(timezone.now() - timedelta(days=1))
+        drain_all()
+        for granularity in ('hour', 'day'):
+            units = SalesRollup.objects.filter(granularity=granularity).aggregate(units=Sum('units'))['units']
+            self.assertEqual(units, 3)
+
+    def test_dashboard_reads_only_rollups(self):
+        self._buy({self.fast: 10, self.slow: 1})
+        self.client.login(username='seller', password='pw')
+        self.client.get(reverse('seller_dashboard'))
+        with CaptureQueriesContext(connection) as ctx:
+            response = self.client.get(reverse('seller_dashboard'))
+        self.assertContains(response, 'Fast Mover')
+        tables = {'core_orderitem', 'core_order'}
+        self.assertFalse([q['sql'] for q in ctx.captured_queries if any(f'"{t}"' in q['sql'] for t in tables)])
+        dashboard = response.context['dashboard']
+        self.assertEqual(dashboard.units, 11)
+        # 2 left after selling 10 in 30 days: under a week of cover
+        self.assertEqual([alert['product'].id for alert in dashboard.low_stock], [self.fast.id])
+
+    def test_dashboard_filters_by_supplier_and_dates(self):
+        from datetime import timedelta
+        from django.utils import timezone
+        other = Supplier.objects.create(name='Other Supplier')
+        elsewhere = Product.objects.create(name='Elsewhere', price='1.00', supplier=other, stock=50)
+        self._buy({self.fast: 1, elsewhere: 3})
+        self.client.login(username='seller', password='pw')
+        response = self.client.get(reverse('seller_dashboard'), {'supplier': other.id})
+        self.assertEqual(response.context['dashboard'].units, 3)
+        self.assertEqual(response.context['dashboard'].supplier, other)
+        last_week = (timezone.localdate() - timedelta(days=7)).isoformat()
+        response = self.client.get(reverse('seller_dashboard'), {'from': last_week, 'to': last_week})
+        self.assertEqual(response.context['dashboard'].units, 0)
+        self.assertContains(response, 'No sales in this period.')
+
+
+class OutboxTests(TestCase):
+    def setUp(self):
+        supplier = Supplier.objects.create(name='Outbox Supplier')
+        self.product = Product.objects.create(name='Pallet', price='3.00', supplier=supplier, stock=12)
+
+    def _checkout(self):
+        from .checkout import place_order
+        return place_order({str(self.product.id): 4}, buyer_name='Olga', buyer_email='olga@example.com').order
+
+    def test_checkout_publishes_one_event_for_the_worker(self):
+        from django.core import mail
+        from .models import Buyer, OutboxEvent, SalesRollup
+        from .outbox import drain_all
+        with self.captureOnCommitCallbacks(execute=True):
+            order = self._checkout()
+        self.assertEqual(list(OutboxEvent.objects.values_list('topic', 'payload')), [('order.placed', {'order_id': order.id})])
+        self.assertFalse(Buyer.objects.exists())
+        self.assertFalse(SalesRollup.objects.exists())
+
+        with self.settings(ORDER_CONFIRMATION_EMAILS=True, LOW_STOCK_NOTICE_LEVEL=8), \
+                self.assertLogs('core.consumers', 'WARNING') as logs, \
+                self.captureOnCommitCallbacks(execute=True):
+            result = drain_all()
+        self.assertEqual((result.processed, result.retried), (1, 0))
+        self.assertFalse(OutboxEvent.objects.exists())
+        self.assertEqual(Buyer.objects.get().order_count, 1)
+        self.assertEqual(SalesRollup.objects.filter(product=self.product).count(), 2)
+        self.assertIn('low stock: Pallet', logs.output[0])
+        self.assertEqual(mail.outbox[0].to, ['olga@example.com'])
+
+    def test_checkout_cost_does_not_grow_with_consumers(self):
+        from unittest import mock
+        from . import outbox
+        with CaptureQueriesContext(connection) as before:
+            self._checkout()
+        extra = dict(outbox.CONSUMERS)
+        extra['order.placed'] = extra['order.placed'] + [lambda event: None] * 5
+        with mock.patch.dict(outbox.CONSUMERS, extra):
+            with CaptureQueriesContext(connection) as after:
+                self._checkout()
+        self.assertEqual(len(after.captured_queries), len(before.captured_queries))
+
+    def test_failed_event_is_rolled_back_retried_and_parked(self):
+        from unittest import mock
+        from .models import Buyer, OutboxEvent
+        from . import outbox
+        self._checkout()
+
+        def broken(event):
+            raise RuntimeError('mail server down')
+
+        failing = {'order.placed': outbox.CONSUMERS['order.placed'] + [broken]}
+        with mock.patch.dict(outbox.CONSUMERS, failing), self.settings(OUTBOX_MAX_ATTEMPTS=2):
+            with self.assertLogs('core.outbox', 'WARNING'):
+                self.assertEqual(outbox.drain().retried, 1)
+            event = OutboxEvent.objects.get()
+            self.assertEqual(event.attempts, 1)
+            self.assertIn('mail server down', event.last_error)
+            # the consumers that did run were rolled back with the failure
+            self.assertFalse(Buyer.objects.exists())
+            self.assertEqual(outbox.drain().fetched, 0)  # backing off
+            OutboxEvent.objects.update(available_at=event.created_at)
+            with self.assertLogs('core.outbox', 'ERROR'):
+                self.assertEqual(outbox.drain().failed, 1)
+        self.assertIsNotNone(OutboxEvent.objects.get().failed_at)
+        self.assertEqual(outbox.backlog()[0], 0)
+
+        self.assertEqual(outbox.requeue_failed(), 1)
+        self.assertEqual(outbox.drain_all().processed, 1)
+        self.assertEqual(Buyer.objects.get().order_count, 1)
+
+    def test_run_worker_once_reports_the_backlog(self):
+        from django.core.management import call_command
+        from io import StringIO
+        self._checkout()
+        self._checkout()
+        out = StringIO()
+        call_command('run_worker', '--once', '--batch-size', '1', stdout=out)
+        self.assertIn('Handled 2 events (0 retried, 0 failed)', out.getvalue())
+        self.assertIn('0 pending', out.getvalue())
+
+
+class ProductDetailCacheTests(TestCase):
+    def setUp(self):
+        from django.core.cache import cache
+        cache.clear()
+        self.supplier = Supplier.objects.create(name='Cached Supplier', contact_email='sales@cached.example')
+        self.product = Product.objects.create(name='Cached Crate', price='9.00', supplier=self.supplier, stock=30)
+
+    def test_repeat_views_skip_the_database(self):
+        from .product_cache import stats
+        url = reverse('product_detail', args=[self.product.id])
+        self.assertContains(self.client.get(url), 'sales@cached.example')
+        with self.assertNumQueries(0):
+            response = self.client.get(url)
+        self.assertContains(response, 'Cached Supplier')
+        self.assertEqual(self.client.get(reverse('product_detail', args=[999999])).status_code, 404)
+        with self.assertNumQueries(0):
+            self.assertEqual(self.client.get(reverse('product_detail', args=[999999])).status_code, 404)
+        self.assertEqual(stats(), {'hits': 2, 'stale': 0, 'misses': 2, 'waits': 0})
+
+    def test_saves_and_checkout_bump_the_version(self):
+        from .checkout import place_order
+        from .product_cache import get_product_detail
+        get_product_detail(self.product.id)
+        self.product.name = 'Renamed Crate'
+        self.product.save()
+        self.assertEqual(get_product_detail(self.product.id).name, 'Renamed Crate')
+        self.supplier.name = 'Renamed Supplier'
+        self.supplier.save()
+        self.assertEqual(get_product_detail(self.product.id).supplier.name, 'Renamed Supplier')
+        # checkout decrements stock with a bulk UPDATE, which sends no signals
+        with self.captureOnCommitCallbacks(execute=True):
+            place_order({str(self.product.id): 5}, buyer_name='Cy', buyer_email='cy@example.com')
+        self.assertEqual(get_product_detail(self.product.id).stock, 25)
+
+    def test_only_one_request_rebuilds_an_expired_entry(self):
+        from django.core.cache import cache
+        from .product_cache import _lock_key, get_product_detail, stats
+        with self.settings(PRODUCT_CACHE_TIMEOUT=0):
+            get_product_detail(self.product.id)
+            Product.objects.filter(pk=self.product.pk).update(stock=7)
+            # another worker holds the rebuild lock: serve the stale copy
+            cache.add(_lock_key(self.product.id), 1)
+            with self.assertNumQueries(0):
+                self.assertEqual(get_product_detail(self.product.id).stock, 30)
+            cache.delete(_lock_key(self.product.id))
+            self.assertEqual(get_product_detail(self.product.id).stock, 7)
+        self.assertEqual(stats(), {'hits': 0, 'stale': 1, 'misses': 2, 'waits': 0})
+
+    def test_cold_miss_waits_for_the_rebuilding_request(self):
+        from django.core.cache import cache
+        from .product_cache import _lock_key, get_product_detail, stats
+        cache.add(_lock_key(self.product.id), 1)
+        with self.settings(PRODUCT_CACHE_WAIT=0.05), self.assertNumQueries(1):
+            # nobody finishes the rebuild in time, so it falls back to the database
+            self.assertEqual(get_product_detail(self.product.id).name, 'Cached Crate')
+        self.assertEqual(stats()['misses'], 1)
+
+    def test_ttls_are_jittered(self):
+        from .product_cache import _fresh_ttl
+        with self.settings(PRODUCT_CACHE_TIMEOUT=100, PRODUCT_CACHE_JITTER=0.2):
+            ttls = {_fresh_ttl() for _ in range(20)}
+        self.assertGreater(len(ttls), 1)
+        self.assertTrue(all(80 <= ttl <= 120 for ttl in ttls))
+
+class StockLedgerTests(TestCase):
+    def setUp(self):
+        from django.contrib.auth.models import Group
+        self.supplier = Supplier.objects.create(name='Ledger Supplier')
+        self.products = [
+            Product.objects.create(name=f'Bin {i}', sku=f'BIN-{i}', price='1.00', supplier=self.supplier, stock=10)
+            for i in range(3)
+        ]
+        self.user = User.objects.create_user(username='stocker', password='pw')
+        self.user.groups.add(Group.objects.get_or_create(name='seller')[0])
+
+    def _ledger(self, product):
+        from django.db.models import Sum
+        from .models import StockMovement
+        return StockMovement.objects.filter(product=product).aggregate(total=Sum('quantity'))['total']
+
+    def test_checkout_and_edits_are_recorded(self):
+        from .checkout import place_order
+        from .inventory import find_drift
+        from .models import StockMovement
+        product = self.products[0]
+        order = place_order({str(product.id): 4}, buyer_name='Lee', buyer_email='lee@example.com').order
+        sale = StockMovement.objects.get(product=product, kind=StockMovement.SALE)
+        self.assertEqual((sale.quantity, sale.order_id), (-4, order.id))
+        product.refresh_from_db()
+        product.stock = 20
+        product.save()
+        self.assertEqual(self._ledger(product), 20)
+        product.name = 'Renamed bin'
+        product.save(update_fields=['name', 'updated_at'])
+        self.assertEqual(StockMovement.objects.filter(product=product).count(), 3)
+        self.assertEqual(find_drift(), [])
+
+    def test_edits_use_the_loaded_stock_instead_of_reading_it_again(self):
+        from .models import StockMovement
+        product = Product.objects.get(pk=self.products[0].pk)
+        with CaptureQueriesContext(connection) as captured:
+            product.name = 'Renamed bin'
+            product.save()
+        self.assertFalse([q for q in captured.captured_queries if q['sql'].startswith('SELECT "core_product"."stock"')])
+        self.assertEqual(StockMovement.objects.filter(product=product).count(), 1)
+
+        Product.objects.filter(pk=product.pk).update(stock=4)
+        product.refresh_from_db()
+        product.stock = 9
+        product.save()
+        product.stock = 7
+        product.save()
+        self.assertEqual(
+            list(StockMovement.objects.filter(product=product).order_by('id').values_list('quantity', flat=True)),
+            [10, 5, -2],
+        )
+
+    def test_restock_applies_chunks_in_bulk(self):
+        from .inventory import parse_lines, receive_stock
+        from .models import StockMovement
+        lines, invalid = parse_lines(
+            'sku,quantity\nBIN-0,5\nBIN-1,7\nBIN-0,1\nNOPE,3\nBIN-2,zero\n' + f'{self.products[2].id},2\n'
+        )
+        # savepoint + per chunk: SKU lookup, id lookup (only for numeric refs), UPDATE, INSERT
+        with self.assertNumQueries(2 + 3 + 4):
+            result = receive_stock(lines, reference='PO-1', invalid=invalid, size=2)
+        self.assertEqual((result.lines, result.products, result.units), (5, 3, 15))
+        self.assertEqual(result.unknown, ['NOPE'])
+        self.assertEqual(result.invalid, [{'line': 6, 'ref': 'BIN-2', 'quantity': 'zero'}])
+        self.assertEqual(
+            [Product.objects.get(pk=product.pk).stock for product in self.products], [16, 17, 12],
+        )
+        restocks = StockMovement.objects.filter(kind=StockMovement.RESTOCK, reference='PO-1')
+        self.assertEqual(sorted(restocks.values_list('quantity', flat=True)), [2, 6, 7])
+
+    def test_header_row_is_skipped_but_a_first_line_typo_is_invalid(self):
+        from .inventory import parse_lines
+        lines, invalid = parse_lines('BIN-0,1O\nBIN-1,2\n')
+        self.assertEqual((lines, invalid), ([(2, 'BIN-1', 2)], [{'line': 1, 'ref': 'BIN-0', 'quantity': '1O'}]))
+        lines, invalid = parse_lines('Product_ID,Units\nBIN-1,2\n')
+        self.assertEqual((lines, invalid), ([(2, 'BIN-1', 2)], []))
+
+    def test_restock_endpoint(self):
+        url = reverse('restock')
+        self.client.login(username='stocker', password='pw')
+        response = self.client.post(
+            url, {'reference': 'PO-9', 'lines': [{'sku': 'BIN-1', 'quantity': 5}, {'sku': 'BIN-2'}]},
+            content_type='application/json',
+        )
+        self.assertEqual(response.json()['units'], 5)
+        self.assertEqual(response.json()['invalid_count'], 1)
+        response = self.client.post(url + '?reference=PO-10', 'BIN-1,1\nBIN-2,2\n', content_type='text/csv')
+        self.assertEqual(response.json()['products'], 2)
+        self.assertEqual(Product.objects.get(pk=self.products[1].pk).stock, 16)
+        self.assertEqual(self.client.post(url, 'sku,quantity\n', content_type='text/csv').status_code, 400)
+        self.client.logout()
+        User.objects.create_user(username='buyer', password='pw')
+        self.client.login(username='buyer', password='pw')
+        self.assertEqual(self.client.post(url, 'BIN-1,1', content_type='text/csv').status_code, 403)
+
+    def test_out_of_range_lines_are_invalid_or_unknown(self):
+        url = reverse('restock')
+        self.client.login(username='stocker', password='pw')
+        response = self.client.post(url, {'lines': [
+            {'sku': 'BIN-1', 'quantity': 10 ** 20}, {'product_id': '9' * 30, 'quantity': 1},
+            {'sku': 'BIN-2', 'quantity': 1},
+        ]}, content_type='application/json')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()['invalid_count'], 1)
+        self.assertEqual(response.json()['unknown'], ['9' * 30])
+        response = self.client.post(url, f'BIN-1,{10 ** 20}\n{"9" * 30},1\nBIN-2,1\n', content_type='text/csv')
+        self.assertEqual((response.status_code, response.json()['invalid_count']), (200, 1))
+        self.assertEqual(Product.objects.get(pk=self.products[2].pk).stock, 12)
+
+    def test_reconcile_reports_and_fixes_drift(self):
+        from django.core.management import call_command
+        from django.core.management.base import CommandError
+        from io import StringIO
+        Product.objects.filter(pk=self.products[1].pk).update(stock=3)
+        with self.assertRaisesMessage(CommandError, '1 products drifted'):
+            call_command('reconcile_stock', stdout=StringIO())
+        out = StringIO()
+        call_command('reconcile_stock', '--fix', stdout=out)
+        self.assertIn('recorded 1 adjustments', out.getvalue())
+        self.assertEqual(self._ledger(self.products[1]), 3)
+        call_command('reconcile_stock', stdout=out)
+        self.assertIn('matches the ledger', out.getvalue())
+
+    def test_restock_command(self):
+        import os
+        import tempfile
+        from django.core.management import call_command
+        from io import StringIO
+        path = os.path.join(tempfile.mkdtemp(), 'shipment.csv')
+        with open(path, 'w') as fh:
+            fh.write('sku,quantity\n' + ''.join(f'BIN-{i},{i + 1}\n' for i in range(3)))
+        out = StringIO()
+        call_command('restock', path, '--reference', 'PO-7', '--chunk-size', '2', stdout=out)
+        self.assertIn('Applied 3 lines to 3 products (+6 units)', out.getvalue())
+        self.assertEqual(Product.objects.get(pk=self.products[2].pk).stock, 13)
+
+class StaticAssetTests(SimpleTestCase):
+    def setUp(self):
+        import os
+        import shutil
+        import tempfile
+        source = tempfile.mkdtemp()
+        self.root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, source)
+        self.addCleanup(shutil.rmtree, self.root)
+        os.makedirs(os.path.join(source, 'css'))
+        os.makedirs(os.path.join(source, 'img'))
+        with open(os.path.join(source, 'css', 'site.css'), 'w') as fh:
+            fh.write('body { background: url("../img/dot.png"); }\n' + '.row { margin: 0 auto; }\n' * 200)
+        with open(os.path.join(source, 'img', 'dot.png'), 'wb') as fh:
+            fh.write(os.urandom(256))
+        self.settings_override = self.settings(
+            STATICFILES_DIRS=[source], STATIC_ROOT=self.root, SERVE_STATIC=True,
+            STATICFILES_FINDERS=['django.contrib.staticfiles.finders.FileSystemFinder'],
+            STORAGES={
+                'default': {'BACKEND': 'django.core.files.storage.FileSystemStorage'},
+                'staticfiles': {'BACKEND': 'core.staticfiles.CompressedManifestStaticFilesStorage'},
+            },
+        )
+        self.settings_override.enable()
+        self.addCleanup(self.settings_override.disable)
+        from django.core.management import call_command
+        from io import StringIO
+        call_command('collectstatic', '--noinput', stdout=StringIO())
+
+    def _get(self, path, **headers):
+        from django.http import HttpResponse
+        from .staticfiles import PrecompressedStaticMiddleware
+        middleware = PrecompressedStaticMiddleware(lambda request: HttpResponse('app'))
+        return middleware(RequestFactory().get(path, headers=headers))
+
+    def test_collectstatic_writes_hashed_and_compressed_variants(self):
+        import gzip
+        import os
+        from django.templatetags.static import static
+        url = static('css/site.css')
+        self.assertRegex(url, r'^/static/css/site\.[0-9a-f]{12}\.css$')
+        path = os.path.join(self.root, url[len('/static/'):])
+        with open(path, 'rb') as fh, gzip.open(path + '.gz') as packed:
+            self.assertEqual(packed.read(), fh.read())
+        self.assertIn(b'../img/dot.', open(path, 'rb').read())
+        # incompressible files are not duplicated
+        self.assertFalse([name for name in os.listdir(os.path.join(self.root, 'img')) if name.endswith('.gz')])
+
+    def test_middleware_serves_the_best_accepted_encoding(self):
+        from django.templatetags.static import static
+        from .staticfiles import brotli
+        url = static('css/site.css')
+        response = self._get(url, accept_encoding='gzip, deflate, br')
+        self.assertEqual(response['Content-Encoding'], 'br' if brotli else 'gzip')
+        self.assertEqual(response['Vary'], 'Accept-Encoding')
+        self.assertEqual(response['Cache-Control'], 'public, max-age=31536000, immutable')
+        self.assertTrue(response['Content-Type'].startswith('text/css'))
+
+        response = self._get(url, accept_encoding='br;q=0, gzip')
+        self.assertEqual(response['Content-Encoding'], 'gzip')
+        self.assertTrue(response['ETag'].endswith('-gzip"'))
+        gzip_etag = response['ETag']
+        # a revalidation only matches the representation it was served
+        self.assertEqual(self._get(url, accept_encoding='gzip', if_none_match=gzip_etag).status_code, 304)
+        self.assertEqual(self._get(url, if_none_match=gzip_etag).status_code, 200)
+        response = self._get(url)
+        self.assertFalse(response.has_header('Content-Encoding'))
+        self.assertIn(b'margin', b''.join(response.streaming_content))
+
+    def test_unhashed_names_revalidate_and_misses_fall_through(self):
+        response = self._get('/static/css/site.css')
+        self.assertEqual(response['Cache-Control'], 'public, max-age=60')
+        response = self._get('/static/css/site.css', if_none_match=response['ETag'])
+        self.assertEqual(response.status_code, 304)
+        self.assertEqual(self._get('/static/css/missing.css').content, b'app')
+        self.assertEqual(self._get('/static/../manage.py').content, b'app')
+        self.assertEqual(self._get('/products/').content, b'app')
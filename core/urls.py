@@ -1,24 +1,42 @@
+from django.conf import settings
 from django.urls import path
-from . import views
+from . import async_views, views
 from django.contrib.auth import views as auth_views
 
-urlpatterns = [
-    path('', views.home, name='home'),
-    path('signup/', views.signup, name='signup'),
-    path('products/', views.product_list, name='product_list'),
-    path('products/<int:pk>/', views.product_detail, name='product_detail'),
-    path('suppliers/', views.supplier_list, name='supplier_list'),
-    path('cart/', views.cart, name='cart'),
-    path('add-to-cart/<int:product_id>/', views.add_to_cart, name='add_to_cart'),
-    path('remove-from-cart/<int:product_id>/', views.remove_from_cart, name='remove_from_cart'),
-    path('update-cart/<int:product_id>/', views.update_cart, name='update_cart'),
-    path('checkout/', views.checkout, name='checkout'),
-    path('buyers/', views.buyer_list, name='buyer_list'),
-    # use path converter to safely capture emails (including @ and periods)
-    path('buyers/<path:email>/', views.buyer_detail, name='buyer_detail'),
-    # authentication
-    path('login/', auth_views.LoginView.as_view(template_name='login.html'), name='login'),
-    path('logout/', auth_views.LogoutView.as_view(next_page='home'), name='logout'),
-    # seller routes
-    path('seller/dashboard/', views.seller_dashboard, name='seller_dashboard'),
-]
+
+def build_urlpatterns(hot=views):
+    """URL patterns with the hot catalog/cart endpoints taken from ``hot``
+    (``views``, or ``async_views`` for ASGI deployments)."""
+    return [
+        path('', views.home, name='home'),
+        path('signup/', views.signup, name='signup'),
+        path('products/', hot.product_list, name='product_list'),
+        path('products/<int:pk>/', hot.product_detail, name='product_detail'),
+        path('search/', views.product_search, name='product_search'),
+        path('suppliers/', views.supplier_list, name='supplier_list'),
+        path('suppliers/<int:pk>/', views.supplier_detail, name='supplier_detail'),
+        path('cart/', views.cart, name='cart'),
+        path('cart/count/', hot.cart_count, name='cart_count'),
+        path('cart/quick-order/', views.quick_order, name='quick_order'),
+        path('add-to-cart/<int:product_id>/', hot.add_to_cart, name='add_to_cart'),
+        path('remove-from-cart/<int:product_id>/', views.remove_from_cart, name='remove_from_cart'),
+        path('update-cart/<int:product_id>/', views.update_cart, name='update_cart'),
+        path('checkout/', views.checkout, name='checkout'),
+        path('buyers/', views.buyer_list, name='buyer_list'),
+        # use path converter to safely capture emails (including @ and periods)
+        path('buyers/<path:email>/', views.buyer_detail, name='buyer_detail'),
+        # authentication
+        path('login/', auth_views.LoginView.as_view(template_name='login.html'), name='login'),
+        path('logout/', auth_views.LogoutView.as_view(next_page='home'), name='logout'),
+        # read-only JSON catalog API
+        path('api/v1/products/', views.api_products, name='api_products'),
+        path('api/v1/suppliers/', views.api_suppliers, name='api_suppliers'),
+        # accounting exports (orders or items)
+        path('exports/<str:kind>/', views.export_orders, name='export_orders'),
+        # seller routes
+        path('seller/dashboard/', views.seller_dashboard, name='seller_dashboard'),
+        path('seller/restock/', views.restock, name='restock'),
+    ]
+
+
+urlpatterns = build_urlpatterns(async_views if settings.ASYNC_VIEWS else views)
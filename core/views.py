@@ -1,16 +1,35 @@
+from django.conf import settings
 from django.shortcuts import render, get_object_or_404, redirect
-from django.http import JsonResponse
-from django.views.decorators.http import require_POST
-from django.contrib.auth.decorators import login_required
+from django.http import Http404, JsonResponse, StreamingHttpResponse
+from django.views.decorators.http import require_POST, require_safe
+from django.contrib.auth.decorators import login_required, permission_required
 from django.contrib.auth.forms import UserCreationForm
 from django.contrib.auth import login
 from django.contrib.auth.models import Group
 from django.core.exceptions import ValidationError
 from django.core.validators import validate_email
-from django.db import transaction
-from decimal import Decimal, InvalidOperation
+from django.utils.cache import get_conditional_response, patch_cache_control
+from django.utils import timezone
+from django.utils.dateparse import parse_date
+from django.utils.http import http_date
+from django.utils.safestring import mark_safe
+from datetime import timedelta
+from decimal import InvalidOperation
+import json
 from functools import wraps
-from .models import Product, Supplier, Order, OrderItem
+from .models import Buyer, Product, StockMovement, Supplier, Order
+from . import api, cart_store, exports, inventory
+from . import quick_order as order_pad
+from .cart import build_cart_snapshot, parse_positive_int
+from .catalog import get_supplier_catalog, get_supplier_page, render_catalog_page
+from .checkout import CheckoutError, EmptyCart, place_order
+from .pagination import keyset_paginate
+from .product_cache import get_product_detail
+from .roles import user_in_group
+from .routers import replica_reads
+from .search import search as search_products
+from .rollups import build_dashboard
+from .reservations import HoldRejected, available_to_promise, release_holds, set_hold
 
 # Create your views here.
 
@@ -39,73 +58,60 @@ def signup(request):
     return render(request, 'signup.html', {'form': form, 'account_type': account_type})
 
 
+@replica_reads
 def product_list(request):
-    products = Product.objects.all()
-    return render(request, 'product_list.html', {'products': products})
+    cursor = request.GET.get('after')
+    product_grid, _ = render_catalog_page(cursor)
+    return render(request, 'product_list.html', {
+        'product_grid': mark_safe(product_grid),
+        'cursor': cursor,
+    })
+
 
+@replica_reads
+def product_search(request):
+    """Ranked prefix search over product name, description and supplier."""
+    query = (request.GET.get('q') or '').strip()
+    products = search_products(query) if query else []
+    return render(request, 'search_results.html', {'query': query, 'products': products})
 
+
+@replica_reads
 def product_detail(request, pk):
-    product = get_object_or_404(Product, pk=pk)
+    product = get_product_detail(pk)
+    if product is None:
+        raise Http404('No Product matches the given query.')
     return render(request, 'product_detail.html', {'product': product})
 
 
+@replica_reads
 def supplier_list(request):
-    suppliers = Supplier.objects.all()
-    return render(request, 'supplier_list.html', {'suppliers': suppliers})
+    cursor = request.GET.get('after')
+    page = get_supplier_page(cursor)
+    return render(request, 'supplier_list.html', {'page': page, 'cursor': cursor})
 
 
-def _parse_positive_int(raw_value, default=1):
-    try:
-        value = int(raw_value)
-    except (TypeError, ValueError):
-        return default
-    return value if value > 0 else default
-
-
-def _build_cart_snapshot(cart_items):
-    products_in_cart = []
-    total_price = Decimal('0')
-    normalized_cart = {}
-
-    for product_id, raw_quantity in cart_items.items():
-        quantity = _parse_positive_int(raw_quantity, default=0)
-        if quantity <= 0:
-            continue
-        try:
-            product = Product.objects.get(id=int(product_id))
-        except (Product.DoesNotExist, ValueError, TypeError):
-            continue
-
-        capped_quantity = min(quantity, max(product.stock, 0))
-        if capped_quantity <= 0:
-            continue
-
-        subtotal = product.price * capped_quantity
-        normalized_cart[str(product.id)] = capped_quantity
-        products_in_cart.append({
-            'product': product,
-            'quantity': capped_quantity,
-            'subtotal': subtotal,
-        })
-        total_price += subtotal
-
-    return products_in_cart, total_price, normalized_cart
+@replica_reads
+def supplier_detail(request, pk):
+    supplier = get_object_or_404(Supplier.objects.only('id', 'name', 'contact_email'), pk=pk)
+    cursor = request.GET.get('after')
+    page = get_supplier_catalog(supplier, cursor)
+    return render(request, 'supplier_detail.html', {'supplier': supplier, 'page': page, 'cursor': cursor})
 
 
 @login_required
 
 def cart(request):
     """Display shopping cart"""
-    cart_items = request.session.get('cart', {})
-    products_in_cart, total_price, normalized_cart = _build_cart_snapshot(cart_items)
-    if normalized_cart != cart_items:
-        request.session['cart'] = normalized_cart
-        request.session.modified = True
+    cart_id = cart_store.get_cart_id(request)
+    cart_items = cart_store.load_items(cart_id)
+    snapshot = build_cart_snapshot(cart_items)
+    cart_store.save_normalized(cart_id, cart_items, snapshot)
 
     return render(request, 'cart.html', {
-        'cart_items': products_in_cart,
-        'total_price': total_price,
-        'cart_count': sum(normalized_cart.values()) if normalized_cart else 0
+        'cart_items': snapshot.lines,
+        'total_price': snapshot.total_price,
+        'cart_count': snapshot.count,
     })
 
 
@@ -115,28 +121,75 @@ def cart(request):
 def add_to_cart(request, product_id):
     """Add product to cart (AJAX)"""
     product = get_object_or_404(Product, id=product_id)
-    quantity = _parse_positive_int(request.POST.get('quantity'), default=0)
+    quantity = parse_positive_int(request.POST.get('quantity'), default=0)
 
     if quantity <= 0:
         return JsonResponse({'success': False, 'message': 'Quantity must be greater than 0.'}, status=400)
 
-    cart = request.session.get('cart', {})
-    product_id_str = str(product_id)
-    current_quantity = _parse_positive_int(cart.get(product_id_str), default=0)
-    new_quantity = current_quantity + quantity
+    cart_id = cart_store.get_cart_id(request)
+    new_quantity = cart_store.get_quantity(cart_id, product_id) + quantity
 
-    if product.stock < new_quantity:
+    try:
+        set_hold(request.user, product, new_quantity)
+    except HoldRejected:
         return JsonResponse({'success': False, 'message': 'Insufficient stock'}, status=400)
 
-    cart[product_id_str] = new_quantity
-    request.session['cart'] = cart
-    request.session.modified = True
+    cart_store.set_quantity(cart_id, product_id, new_quantity)
 
-    cart_count = sum(cart.values())
     return JsonResponse({
         'success': True,
         'message': f'{product.name} added to cart!',
-        'cart_count': cart_count
+        'cart_count': cart_store.item_count(cart_id)
+    })
+
+
+@login_required
+def cart_count(request):
+    """Number of units in the cart (AJAX)"""
+    return JsonResponse({'cart_count': cart_store.item_count(cart_store.get_cart_id(request))})
+
+
+@login_required
+
+def quick_order(request):
+    """Add many lines at once, from JSON or pasted CSV; reports each line's result.
+
+    The pad's form posts a ``csv`` field and gets the page back; API clients
+    post a JSON or text/csv body and get JSON.
+    """
+    if request.method != 'POST':
+        return render(request, 'quick_order.html', {'max_lines': order_pad.max_lines()})
+
+    from_form = 'csv' in request.POST
+    try:
+        if from_form:
+            lines = order_pad.parse_csv(request.POST['csv'])
+        elif request.content_type == 'application/json':
+            try:
+                payload = json.loads(request.body or b'null')
+            except ValueError:
+                raise order_pad.QuickOrderError('Request body is not valid JSON.')
+            lines = order_pad.parse_json(payload)
+        else:
+            lines = order_pad.parse_csv(request.body.decode('utf-8', 'replace'))
+        lines = order_pad.apply_quick_order(request, lines)
+    except order_pad.QuickOrderError as exc:
+        if not from_form:
+            return JsonResponse({'success': False, 'message': str(exc)}, status=400)
+        return render(request, 'quick_order.html', {
+            'max_lines': order_pad.max_lines(), 'error': str(exc), 'csv': request.POST['csv'],
+        }, status=400)
+
+    summary = order_pad.summarize(lines)
+    if not from_form:
+        return JsonResponse({
+            'success': True,
+            **summary,
+            'cart_count': cart_store.item_count(cart_store.get_cart_id(request)),
+            'lines': [line.as_dict() for line in lines],
+        })
+    return render(request, 'quick_order.html', {
+        'max_lines': order_pad.max_lines(), 'lines': lines, 'summary': summary,
     })
 
 
@@ -145,11 +198,8 @@ def add_to_cart(request, product_id):
 
 def remove_from_cart(request, product_id):
     """Remove product from cart"""
-    cart = request.session.get('cart', {})
-    if str(product_id) in cart:
-        del cart[str(product_id)]
-        request.session['cart'] = cart
-        request.session.modified = True
+    cart_store.remove_lines(cart_store.get_cart_id(request), [product_id])
+    release_holds(request.user, [product_id])
     
     return redirect('cart')
 
@@ -159,35 +209,104 @@ def remove_from_cart(request, product_id):
 
 def update_cart(request, product_id):
     """Update product quantity in cart"""
-    quantity = _parse_positive_int(request.POST.get('quantity'), default=0)
-    cart = request.session.get('cart', {})
+    quantity = parse_positive_int(request.POST.get('quantity'), default=0)
+    cart_id = cart_store.get_cart_id(request)
 
     if quantity > 0:
         try:
             product = Product.objects.get(id=product_id)
-            cart[str(product_id)] = min(quantity, max(product.stock, 0))
-        except Product.DoesNotExist:
+            quantity = min(quantity, available_to_promise([product], request.user)[product.id])
+            set_hold(request.user, product, quantity)
+            if quantity > 0:
+                cart_store.set_quantity(cart_id, product_id, quantity)
+            else:
+                cart_store.remove_lines(cart_id, [product_id])
+        except (Product.DoesNotExist, HoldRejected):
             pass
     else:
-        if str(product_id) in cart:
-            del cart[str(product_id)]
-
-    if cart.get(str(product_id)) == 0:
-        del cart[str(product_id)]
-
-    request.session['cart'] = cart
-    request.session.modified = True
+        cart_store.remove_lines(cart_id, [product_id])
+        release_holds(request.user, [product_id])
 
     return redirect('cart')
 
 
 @login_required
-
+@replica_reads
 def buyer_list(request):
-    """Display list of unique buyers based on orders."""
-    # gather distinct buyers from orders
-    buyers = Order.objects.values('buyer_name', 'buyer_email', 'buyer_phone').distinct()
-    return render(request, 'buyer_list.html', {'buyers': buyers})
+    """Display buyers, most recent first, from the Buyer directory."""
+    page = keyset_paginate(
+        Buyer.objects.all(),
+        ('-last_order_at', '-id'),
+        cursor=request.GET.get('after'),
+        page_size=settings.BUYER_PAGE_SIZE,
+    )
+    return render(request, 'buyer_list.html', {'buyers': page.items, 'page': page})
+
+
+def _api_list(request, resource):
+    """Serve one page of a catalog API resource, or a 304 if the client has it."""
+    try:
+        fields = api.parse_fields(resource, request.GET.get('fields'))
+        size = api.page_size(request.GET.get('limit'))
+        cursor = request.GET.get('cursor')
+        if 'changed_since' in request.GET:
+            since = api.parse_since(request.GET['changed_since'])
+            page = api.changes_page(resource, fields, since, cursor=cursor, size=size)
+        else:
+            page = api.list_page(resource, fields, cursor=cursor, size=size)
+    except api.ApiError as exc:
+        return JsonResponse({'success': False, 'message': str(exc)}, status=exc.status)
+
+    last_modified = int(page.last_modified.timestamp()) if page.last_modified else None
+    response = get_conditional_response(request, etag=page.etag, last_modified=last_modified)
+    if response is None:
+        data = api.render_page(resource, fields, page)
+        next_url = None
+        if page.next_cursor:
+            query = request.GET.copy()
+            query['cursor'] = page.next_cursor
+            next_url = request.build_absolute_uri(f'{request.path}?{query.urlencode()}')
+        response = JsonResponse({'next': next_url, **data})
+    response['ETag'] = page.etag
+    if last_modified is not None:
+        response['Last-Modified'] = http_date(last_modified)
+    # clients may keep the page but must revalidate it before use
+    patch_cache_control(response, no_cache=True)
+    return response
+
+
+@require_safe
+@replica_reads
+def api_products(request):
+    """Products as JSON: ?fields=, ?limit=, ?cursor=, ?changed_since= (see core.api)"""
+    return _api_list(request, api.PRODUCTS)
+
+
+@require_safe
+@replica_reads
+def api_suppliers(request):
+    """Suppliers as JSON, with the same parameters as api_products."""
+    return _api_list(request, api.SUPPLIERS)
+
+
+@require_safe
+@permission_required('core.view_order', raise_exception=True)
+def export_orders(request, kind):
+    """Stream orders or order items as CSV/JSONL for accounting.
+
+    Filters: ?from=YYYY-MM-DD&to=YYYY-MM-DD&status=&buyer=; ?format=csv|jsonl.
+    """
+    fmt = request.GET.get('format', 'csv')
+    try:
+        filters = exports.ExportFilters.parse(
+            request.GET.get('from'), request.GET.get('to'), request.GET.get('status'), request.GET.get('buyer'),
+        )
+        chunks = exports.stream_export(kind, fmt, filters)
+    except exports.ExportError as exc:
+        return JsonResponse({'success': False, 'message': str(exc)}, status=400)
+    response = StreamingHttpResponse(chunks, content_type=exports.FORMATS[fmt])
+    response['Content-Disposition'] = f'attachment; filename="{exports.filename(kind, fmt, filters)}"'
+    return response
 
 
 # seller utilities
@@ -199,120 +318,156 @@ def seller_required(view_func):
     def _wrapped(request, *args, **kwargs):
         if not request.user.is_authenticated:
             return redirect('login')
-        if request.user.groups.filter(name='seller').exists():
+        if user_in_group(request.user, 'seller'):
             return view_func(request, *args, **kwargs)
         return HttpResponseForbidden('You must be a seller to access this page.')
     return _wrapped
 
 
+def _parse_day(raw):
+    try:
+        return parse_date(raw or '')
+    except ValueError:
+        return None
+
+
 @seller_required
 def seller_dashboard(request):
-    """Simple seller dashboard listing all products."""
-    products = Product.objects.all()
-    return render(request, 'seller_dashboard.html', {'products': products})
+    """Revenue, units, top sellers and low-stock alerts from the sales rollups."""
+    date_to = _parse_day(request.GET.get('to')) or timezone.localdate()
+    date_from = _parse_day(request.GET.get('from')) or date_to - timedelta(days=29)
+    if date_from > date_to:
+        date_from, date_to = date_to, date_from
+    supplier_id = parse_positive_int(request.GET.get('supplier'), default=None)
+    dashboard = build_dashboard(date_from, date_to, supplier_id=supplier_id)
+    return render(request, 'seller_dashboard.html', {'dashboard': dashboard})
+
+
+def _restock_lines(request):
+    if request.content_type == 'application/json':
+        try:
+            payload = json.loads(request.body or b'null')
+        except ValueError:
+            raise inventory.RestockError('Request body is not valid JSON.')
+        if not isinstance(payload, dict) or not isinstance(payload.get('lines'), list):
+            raise inventory.RestockError('Expected {"lines": [{"sku": ..., "quantity": n}, ...]}.')
+        lines, invalid, limit = [], [], inventory.max_quantity()
+        for number, entry in enumerate(payload['lines'], start=1):
+            entry = entry if isinstance(entry, dict) else {}
+            ref = str(entry.get('sku') or entry.get('product_id') or '').strip()
+            quantity = parse_positive_int(entry.get('quantity'), default=0)
+            if ref and quantity and quantity <= limit:
+                lines.append((number, ref, quantity))
+            else:
+                invalid.append({'line': number, 'ref': ref, 'quantity': entry.get('quantity')})
+        return lines, invalid, payload.get('reference', '')
+    if 'file' in request.FILES:
+        text = request.FILES['file'].read().decode('utf-8-sig', 'replace')
+    elif 'csv' in request.POST:
+        text = request.POST['csv']
+    else:
+        text = request.body.decode('utf-8-sig', 'replace')
+    return (*inventory.parse_lines(text), request.POST.get('reference') or request.GET.get('reference', ''))
 
 
-@login_required
+@require_POST
+@seller_required
+def restock(request):
+    """Apply a shipment: CSV ("sku,quantity" rows, as a body, ``csv`` field or
+    ``file`` upload) or JSON ``{"reference": ..., "lines": [...]}``."""
+    try:
+        lines, invalid, reference = _restock_lines(request)
+        if len(lines) > inventory.max_lines():
+            raise inventory.RestockError(f'Too many lines ({len(lines)}); the limit is {inventory.max_lines()}.')
+        kind = StockMovement.RETURN if request.GET.get('kind') == StockMovement.RETURN else StockMovement.RESTOCK
+        result = inventory.receive_stock(lines, kind=kind, reference=str(reference)[:100], invalid=invalid)
+    except inventory.RestockError as exc:
+        return JsonResponse({'success': False, 'message': str(exc)}, status=400)
+    return JsonResponse({'success': True, **result.as_dict()})
+
 
+@login_required
+@replica_reads
 def buyer_detail(request, email):
     """Show orders placed by a specific buyer identified by email."""
-    orders = Order.objects.filter(buyer_email=email).order_by('-created_at')
-    return render(request, 'buyer_detail.html', {'orders': orders, 'buyer_email': email})
+    buyer = Buyer.objects.filter(email=email).first()
+    page = keyset_paginate(
+        Order.objects.filter(buyer_email=email),
+        ('-created_at', '-id'),
+        cursor=request.GET.get('after'),
+        page_size=settings.BUYER_PAGE_SIZE,
+    )
+    return render(request, 'buyer_detail.html', {
+        'buyer': buyer,
+        'orders': page.items,
+        'page': page,
+        'buyer_email': email,
+    })
 
 
 @login_required
 
 def checkout(request):
     """Checkout page"""
-    cart_items = request.session.get('cart', {})
-
-    products_in_cart, total_price, normalized_cart = _build_cart_snapshot(cart_items)
-    if normalized_cart != cart_items:
-        request.session['cart'] = normalized_cart
-        request.session.modified = True
-    if not products_in_cart:
-        return redirect('product_list')
-
-    if request.method == 'POST':
-        buyer_name = (request.POST.get('buyer_name') or '').strip()
-        buyer_email = (request.POST.get('buyer_email') or '').strip().lower()
-        buyer_phone = (request.POST.get('buyer_phone') or '').strip()
+    cart_id = cart_store.get_cart_id(request)
+    cart_items = cart_store.load_items(cart_id)
+
+    if request.method != 'POST':
+        snapshot = build_cart_snapshot(cart_items)
+        cart_store.save_normalized(cart_id, cart_items, snapshot)
+        if not snapshot:
+            return redirect('product_list')
+        return render(request, 'checkout.html', {
+            'products': snapshot.lines,
+            'total_price': snapshot.total_price,
+        })
 
-        if not buyer_name:
-            return render(request, 'checkout.html', {
-                'products': products_in_cart,
-                'total_price': total_price,
-                'error': 'Buyer name is required.'
-            })
+    buyer_name = (request.POST.get('buyer_name') or '').strip()
+    buyer_email = (request.POST.get('buyer_email') or '').strip().lower()
+    buyer_phone = (request.POST.get('buyer_phone') or '').strip()
 
+    error = None
+    if not buyer_name:
+        error = 'Buyer name is required.'
+    else:
         try:
             validate_email(buyer_email)
         except ValidationError:
-            return render(request, 'checkout.html', {
-                'products': products_in_cart,
-                'total_price': total_price,
-                'error': 'Please enter a valid email address.'
-            })
+            error = 'Please enter a valid email address.'
+
+    if error:
+        snapshot = build_cart_snapshot(cart_items)
+        cart_store.save_normalized(cart_id, cart_items, snapshot)
+        if not snapshot:
+            return redirect('product_list')
+        return render(request, 'checkout.html', {
+            'products': snapshot.lines,
+            'total_price': snapshot.total_price,
+            'error': error,
+        })
 
-        try:
-            with transaction.atomic():
-                cart_product_ids = [item['product'].id for item in products_in_cart]
-                products = Product.objects.select_for_update().filter(id__in=cart_product_ids)
-                products_by_id = {product.id: product for product in products}
-
-                for item in products_in_cart:
-                    current_product = products_by_id.get(item['product'].id)
-                    if current_product is None:
-                        return render(request, 'checkout.html', {
-                            'products': products_in_cart,
-                            'total_price': total_price,
-                            'error': 'One or more products are no longer available.'
-                        })
-                    if current_product.stock < item['quantity']:
-                        return render(request, 'checkout.html', {
-                            'products': products_in_cart,
-                            'total_price': total_price,
-                            'error': f'Insufficient stock for {current_product.name}'
-                        })
-
-                order = Order.objects.create(
-                    buyer_name=buyer_name,
-                    buyer_email=buyer_email,
-                    buyer_phone=buyer_phone,
-                    status='completed'
-                )
-
-                order_items = []
-                for item in products_in_cart:
-                    current_product = products_by_id[item['product'].id]
-                    order_items.append(
-                        OrderItem(
-                            order=order,
-                            product=current_product,
-                            quantity=item['quantity'],
-                            price=current_product.price,
-                        )
-                    )
-                    current_product.stock -= item['quantity']
-                    current_product.save(update_fields=['stock'])
-
-                OrderItem.objects.bulk_create(order_items)
-                order.calculate_total()
-        except (InvalidOperation, ValueError):
-            return render(request, 'checkout.html', {
-                'products': products_in_cart,
-                'total_price': total_price,
-                'error': 'Checkout failed due to invalid cart data.'
-            })
-
-        request.session['cart'] = {}
-        request.session.modified = True
-
-        return render(request, 'order_success.html', {
-            'order': order,
+    try:
+        result = place_order(cart_items, buyer_name, buyer_email, buyer_phone, user=request.user)
+    except EmptyCart:
+        return redirect('product_list')
+    except CheckoutError as exc:
+        error, snapshot = exc.message, exc.snapshot
+    except (InvalidOperation, ValueError):
+        error, snapshot = 'Checkout failed due to invalid cart data.', build_cart_snapshot(cart_items)
+
+    if error:
+        cart_store.save_normalized(cart_id, cart_items, snapshot)
+        return render(request, 'checkout.html', {
+            'products': snapshot.lines,
+            'total_price': snapshot.total_price,
+            'error': error,
         })
 
-    return render(request, 'checkout.html', {
-        'products': products_in_cart,
-        'total_price': total_price
+    cart_store.clear(cart_id)
+
+    response = render(request, 'order_success.html', {
+        'order': result.order,
+        'order_items': result.items,
     })
+    response['Server-Timing'] = f'lock;dur={result.lock_wait_ms:.2f}'
+    return response
@@ -60,6 +60,10 @@ INSTALLED_APPS = [
 
 MIDDLEWARE = [
     'django.middleware.security.SecurityMiddleware',
+    # serves STATIC_ROOT with precompressed variants when SERVE_STATIC is on
+    'core.staticfiles.PrecompressedStaticMiddleware',
+    'core.perf.PerformanceMiddleware',
+    'core.routers.ReplicaPinMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
@@ -72,36 +76,82 @@ ROOT_URLCONF = 'wholeseller.urls'
 
 TEMPLATES = [
     {
-        'BACKEND': 'django.template.backends.django.DjangoTemplates',
+        # DjangoTemplates plus render timing for core.perf.PerformanceMiddleware
+        'BACKEND': 'core.perf.InstrumentedDjangoTemplates',
         'DIRS': [BASE_DIR / 'templates'],  # project-level templates folder
-        'APP_DIRS': True,
         'OPTIONS': {
             'context_processors': [
                 'django.template.context_processors.request',
                 'django.contrib.auth.context_processors.auth',
                 'django.contrib.messages.context_processors.messages',
             ],
+            # always compile each template once per process; the dev server's
+            # autoreloader still clears this cache when a template changes
+            'loaders': [
+                ('django.template.loaders.cached.Loader', [
+                    'django.template.loaders.filesystem.Loader',
+                    'django.template.loaders.app_directories.Loader',
+                ]),
+            ],
         },
     },
 ]
 
+# Per-node template render timing, reported by PerformanceMiddleware (see
+# core.template_profile); costs a little on every node, so leave it off in
+# production
+TEMPLATE_PROFILING = env_bool('TEMPLATE_PROFILING', False)
+# Bump to drop every cached fragment (nav, product cards) after a template change
+TEMPLATE_FRAGMENT_VERSION = os.environ.get('TEMPLATE_FRAGMENT_VERSION', '1')
+NAV_CACHE_TIMEOUT = int(os.environ.get('NAV_CACHE_TIMEOUT', '3600'))
+CATALOG_CARD_CACHE_TIMEOUT = int(os.environ.get('CATALOG_CARD_CACHE_TIMEOUT', '86400'))
+
 WSGI_APPLICATION = 'wholeseller.wsgi.application'
 
 
 # Database
 # Configure to use Supabase Postgres via DATABASE_URL environment variable
 # See https://supabase.com/docs/guides/database/connecting
-# Database
+#
+# Connection handling for PostgreSQL:
+# * DB_POOL=1 keeps a psycopg 3 connection pool per worker process
+#   (DB_POOL_MIN_SIZE..DB_POOL_MAX_SIZE connections, waiting at most
+#   DB_POOL_TIMEOUT seconds for a free one) instead of one persistent
+#   connection per thread.
+# * DB_HEALTH_CHECKS pings a reused or pooled connection before handing it out.
+# * DB_TRANSACTION_POOLER=1 is for transaction-mode poolers such as Supabase's
+#   pgbouncer on port 6543: no server-side cursors. Django already disables
+#   psycopg 3's server-side prepared statements (prepare_threshold=None).
+DB_POOL = env_bool('DB_POOL', False)
+DB_POOL_MIN_SIZE = int(os.environ.get('DB_POOL_MIN_SIZE', '2'))
+DB_POOL_MAX_SIZE = int(os.environ.get('DB_POOL_MAX_SIZE', '10'))
+DB_POOL_TIMEOUT = float(os.environ.get('DB_POOL_TIMEOUT', '10'))
+DB_HEALTH_CHECKS = env_bool('DB_HEALTH_CHECKS', True)
+DB_TRANSACTION_POOLER = env_bool('DB_TRANSACTION_POOLER', False)
+
+
+def database_config(url):
+    config = dj_database_url.parse(
+        url,
+        # pooled connections go back to the pool at the end of each request
+        conn_max_age=0 if DB_POOL else 600,
+        conn_health_checks=DB_HEALTH_CHECKS,
+        disable_server_side_cursors=DB_TRANSACTION_POOLER,
+        ssl_require=url.startswith(('postgres', 'postgresql')),
+    )
+    if DB_POOL and config['ENGINE'] == 'django.db.backends.postgresql':
+        config.setdefault('OPTIONS', {})['pool'] = {
+            'min_size': DB_POOL_MIN_SIZE,
+            'max_size': DB_POOL_MAX_SIZE,
+            'timeout': DB_POOL_TIMEOUT,
+        }
+    return config
+
+
 # If DATABASE_URL is provided (e.g. Supabase connection string), use it. Otherwise fall back to sqlite.
 DATABASE_URL = os.environ.get('DATABASE_URL')
 if DATABASE_URL:
-    DATABASES = {
-        'default': dj_database_url.config(
-            default=DATABASE_URL,
-            conn_max_age=600,
-            ssl_require=True
-        )
-    }
+    DATABASES = {'default': database_config(DATABASE_URL)}
 else:
     DATABASES = {
         'default': {
@@ -110,6 +160,131 @@ else:
         }
     }
 
+# Read replicas: every extra <NAME>_DATABASE_URL env var adds a replica alias
+# <name> (e.g. REPLICA_DATABASE_URL -> "replica"). Views marked with
+# core.routers.replica_reads send their reads there; everything else, and any
+# client that wrote within PRIMARY_PIN_SECONDS, stays on the primary.
+REPLICA_DATABASE_ALIASES = []
+for _name, _url in sorted(os.environ.items()):
+    if _name.endswith('_DATABASE_URL') and _url:
+        _alias = _name[:-len('_DATABASE_URL')].lower()
+        DATABASES[_alias] = database_config(_url)
+        # tests run against the primary's test database only
+        DATABASES[_alias]['TEST'] = {'MIRROR': 'default'}
+        REPLICA_DATABASE_ALIASES.append(_alias)
+
+DATABASE_ROUTERS = ['core.routers.PrimaryReplicaRouter']
+PRIMARY_PIN_SECONDS = int(os.environ.get('PRIMARY_PIN_SECONDS', '5'))
+
+
+# Cache
+# Set REDIS_URL to share cached catalog pages between workers; otherwise each
+# process keeps its own in-memory cache.
+REDIS_URL = os.environ.get('REDIS_URL')
+if REDIS_URL:
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.redis.RedisCache',
+            'LOCATION': REDIS_URL,
+        }
+    }
+else:
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+            'LOCATION': 'wholeseller',
+            # the default of 300 entries would evict product cards before a
+            # single large catalog page was done rendering
+            'OPTIONS': {'MAX_ENTRIES': int(os.environ.get('LOCMEM_CACHE_MAX_ENTRIES', '20000'))},
+        }
+    }
+
+CATALOG_PAGE_SIZE = int(os.environ.get('CATALOG_PAGE_SIZE', '24'))
+SUPPLIER_PAGE_SIZE = int(os.environ.get('SUPPLIER_PAGE_SIZE', '24'))
+CATALOG_CACHE_TIMEOUT = int(os.environ.get('CATALOG_CACHE_TIMEOUT', '300'))
+BUYER_PAGE_SIZE = int(os.environ.get('BUYER_PAGE_SIZE', '50'))
+ROLE_CACHE_TIMEOUT = int(os.environ.get('ROLE_CACHE_TIMEOUT', '3600'))
+
+# Product detail cache (core.product_cache): seconds an entry is fresh, +/- a
+# jitter fraction, how long it may then be served stale while one request
+# rebuilds it, and how long other requests wait for a cold rebuild
+PRODUCT_CACHE_TIMEOUT = int(os.environ.get('PRODUCT_CACHE_TIMEOUT', '300'))
+PRODUCT_CACHE_JITTER = float(os.environ.get('PRODUCT_CACHE_JITTER', '0.1'))
+PRODUCT_CACHE_STALE_TIMEOUT = int(os.environ.get('PRODUCT_CACHE_STALE_TIMEOUT', '600'))
+PRODUCT_CACHE_LOCK_TIMEOUT = int(os.environ.get('PRODUCT_CACHE_LOCK_TIMEOUT', '10'))
+PRODUCT_CACHE_WAIT = float(os.environ.get('PRODUCT_CACHE_WAIT', '0.5'))
+
+# Checkout retries lock/serialization conflicts with jittered backoff (seconds)
+CHECKOUT_MAX_ATTEMPTS = int(os.environ.get('CHECKOUT_MAX_ATTEMPTS', '3'))
+CHECKOUT_RETRY_BASE_DELAY = float(os.environ.get('CHECKOUT_RETRY_BASE_DELAY', '0.05'))
+CHECKOUT_RETRY_MAX_DELAY = float(os.environ.get('CHECKOUT_RETRY_MAX_DELAY', '0.5'))
+
+# Bulk restock (core.inventory): products per UPDATE, and the most lines the
+# restock endpoint accepts in one request (the restock command has no limit)
+RESTOCK_CHUNK_SIZE = int(os.environ.get('RESTOCK_CHUNK_SIZE', '1000'))
+RESTOCK_MAX_LINES = int(os.environ.get('RESTOCK_MAX_LINES', '100000'))
+
+# Cart stock holds: how long a hold lasts and how many counter rows per product
+STOCK_HOLD_TTL_SECONDS = int(os.environ.get('STOCK_HOLD_TTL_SECONDS', '900'))
+STOCK_HOLD_SHARDS = int(os.environ.get('STOCK_HOLD_SHARDS', '8'))
+
+# Quick order pad: most lines accepted in one request
+QUICK_ORDER_MAX_LINES = int(os.environ.get('QUICK_ORDER_MAX_LINES', '1000'))
+
+# JSON catalog API: page sizes, how long the changed_since feed holds back
+# fresh rows, and how long deletions are remembered for it
+API_PAGE_SIZE = int(os.environ.get('API_PAGE_SIZE', '100'))
+API_MAX_PAGE_SIZE = int(os.environ.get('API_MAX_PAGE_SIZE', '500'))
+API_SYNC_SETTLE_SECONDS = float(os.environ.get('API_SYNC_SETTLE_SECONDS', '2'))
+TOMBSTONE_RETENTION_DAYS = int(os.environ.get('TOMBSTONE_RETENTION_DAYS', '30'))
+
+# Order exports: rows fetched per server-side cursor round trip
+EXPORT_CHUNK_SIZE = int(os.environ.get('EXPORT_CHUNK_SIZE', '2000'))
+
+# Admin changelists count exactly up to this many rows, then use the
+# PostgreSQL planner's estimate
+ESTIMATED_COUNT_THRESHOLD = int(os.environ.get('ESTIMATED_COUNT_THRESHOLD', '10000'))
+
+# Seller dashboard rollups: how long hourly buckets are kept (daily ones are
+# kept forever), and which fast movers get a low-stock alert
+SALES_HOURLY_RETENTION_DAYS = int(os.environ.get('SALES_HOURLY_RETENTION_DAYS', '35'))
+LOW_STOCK_CANDIDATES = int(os.environ.get('LOW_STOCK_CANDIDATES', '200'))
+LOW_STOCK_COVER_DAYS = int(os.environ.get('LOW_STOCK_COVER_DAYS', '7'))
+
+# Outbox worker (run_worker): attempts before an event is parked, retry
+# backoff in seconds, and the post-checkout consumers' knobs
+OUTBOX_MAX_ATTEMPTS = int(os.environ.get('OUTBOX_MAX_ATTEMPTS', '8'))
+OUTBOX_RETRY_BASE_DELAY = float(os.environ.get('OUTBOX_RETRY_BASE_DELAY', '1'))
+OUTBOX_RETRY_MAX_DELAY = float(os.environ.get('OUTBOX_RETRY_MAX_DELAY', '300'))
+LOW_STOCK_NOTICE_LEVEL = int(os.environ.get('LOW_STOCK_NOTICE_LEVEL', '10'))
+ORDER_CONFIRMATION_EMAILS = env_bool('ORDER_CONFIRMATION_EMAILS', False)
+DEFAULT_FROM_EMAIL = os.environ.get('DEFAULT_FROM_EMAIL', 'orders@wholeseller.local')
+if DEBUG:
+    EMAIL_BACKEND = 'django.core.mail.backends.console.EmailBackend'
+
+# Serve the catalog and cart endpoints from core.async_views (run under ASGI)
+ASYNC_VIEWS = env_bool('ASYNC_VIEWS', False)
+
+
+# Performance instrumentation (core.perf): fraction of requests to measure,
+# and how many repeats of one SQL statement count as a likely N+1
+PERF_SAMPLE_RATE = float(os.environ.get('PERF_SAMPLE_RATE', '1.0' if DEBUG else '0.05'))
+PERF_DUPLICATE_THRESHOLD = int(os.environ.get('PERF_DUPLICATE_THRESHOLD', '3'))
+
+LOGGING = {
+    'version': 1,
+    'disable_existing_loggers': False,
+    'handlers': {
+        'console': {'class': 'logging.StreamHandler'},
+    },
+    'loggers': {
+        'core': {
+            'handlers': ['console'],
+            'level': os.environ.get('CORE_LOG_LEVEL', 'WARNING' if IS_TEST else 'INFO'),
+        },
+    },
+}
+
 
 # Password validation
 # https://docs.djangoproject.com/en/6.0/ref/settings/#auth-password-validators
@@ -154,6 +329,26 @@ STATIC_URL = 'static/'
 STATICFILES_DIRS = [BASE_DIR / 'static']
 STATIC_ROOT = BASE_DIR / 'staticfiles'
 
+# Content-hashed file names plus .gz/.br variants written by collectstatic
+# (core.staticfiles). Off in development and tests, where files are served
+# straight from the app directories and there is no manifest to read.
+STATIC_MANIFEST = env_bool('STATIC_MANIFEST', not DEBUG and not IS_TEST)
+STORAGES = {
+    'default': {'BACKEND': 'django.core.files.storage.FileSystemStorage'},
+    'staticfiles': {
+        'BACKEND': 'core.staticfiles.CompressedManifestStaticFilesStorage' if STATIC_MANIFEST
+        else 'django.contrib.staticfiles.storage.StaticFilesStorage',
+    },
+}
+
+# Let the app serve STATIC_ROOT itself (core.staticfiles.PrecompressedStaticMiddleware)
+# instead of relying on a front-end web server
+SERVE_STATIC = env_bool('SERVE_STATIC', not DEBUG)
+
+# Cache lifetime in seconds for static files without a content hash in their
+# name; hashed names are cached for a year and marked immutable
+STATIC_MAX_AGE = int(os.environ.get('STATIC_MAX_AGE', '60'))
+
 
 if not DEBUG:
     SECURE_PROXY_SSL_HEADER = ('HTTP_X_FORWARDED_PROTO', 'https')